@@ -47,6 +47,7 @@ from .lib.common_utilities import register as register_common_utilities
 #Menus, Panels, Interface and Icons
 from .interface import CGCOOKIE_OT_retopoflow_panel, CGCOOKIE_OT_retopoflow_menu
 from .preferences import RetopoFlowPreferences
+from .cache import tag_updated_objects, free_mesh_cache
 
 from .lib.classes.logging.logging import OpenLog
 
@@ -75,6 +76,7 @@ def register():
 
     bpy.utils.register_class(RetopoFlowPreferences)
     bpy.app.handlers.scene_update_post.append(check_source_target_objects)
+    bpy.app.handlers.scene_update_post.append(tag_updated_objects)
     bpy.utils.register_class(CGCOOKIE_OT_retopoflow_panel)
     bpy.utils.register_class(CGCOOKIE_OT_retopoflow_menu)
     
@@ -115,6 +117,8 @@ def unregister():
     bpy.utils.unregister_class(CGCOOKIE_OT_retopoflow_panel)
     bpy.utils.unregister_class(CGCOOKIE_OT_retopoflow_menu)
     bpy.app.handlers.scene_update_post.remove(check_source_target_objects)
+    bpy.app.handlers.scene_update_post.remove(tag_updated_objects)
+    free_mesh_cache()
     bpy.utils.unregister_class(RetopoFlowPreferences)
 
     # addon updater unregister
@@ -1,9 +1,22 @@
 #common cache for bmesh and BVH
-from mathutils import Vector
+import os
+import mmap
+import array
+import struct
+import hashlib
+from collections import OrderedDict
 
-from .lib.common_utilities import dprint
+import bpy
+from bpy.app.handlers import persistent
 
-mesh_cache = {}
+from .lib.common_utilities import dprint, get_settings
+from .lib.classes.meshslicer.meshslicer import MeshSlicer
+
+mesh_cache = {}         # active entry: 'valid', 'bme', 'bvh', 'size', and 'slicer' once built
+mesh_cache_entries = OrderedDict()  # fingerprint -> entry, least recently used first
+mesh_cache_stats = {'hits':0, 'misses':0, 'evictions':0}
+mesh_update_tags = {}   # object name -> number of times Blender tagged its data as updated
+other_slicer = None     # (bme, MeshSlicer) for last sliced bmesh that is not cached
 
 contour_cache = {}
 contour_undo_cache = []
@@ -11,35 +24,260 @@ polystrips_undo_cache = [] #TODO, implement this
 polypen_undo_cache = []
 tweak_undo_cache = []
 
-def object_validation(ob):
+# number of vertices sampled by the fast validation checksum
+validation_samples = 4096
+
+def object_vertex_buffer(ob):
+    '''
+    returns flat array of vertex coordinates (x0,y0,z0,x1,...) of object's mesh data
+    '''
+    me = ob.data
+    buf = array.array('f', [0.0]) * (len(me.vertices) * 3)
+    me.vertices.foreach_get('co', buf)
+    return buf
+
+def object_validation(ob, strict=None):
+    '''
+    returns fingerprint of object, used to determine if the cached bmesh/bvh are still valid.
+    fast mode checksums a strided sample of the vertices, while strict mode (preference
+    setting) reduces over every vertex.
+    '''
+    if strict is None:
+        strict = get_settings().validation_mode == 'STRICT'
     me = ob.data
-    # get object data to act as a hash
     counts = (len(me.vertices), len(me.edges), len(me.polygons), len(ob.modifiers))
-    bbox   = (tuple(min(v.co for v in me.vertices)), tuple(max(v.co for v in me.vertices)))
-    vsum   = tuple(sum((v.co for v in me.vertices), Vector((0,0,0))))
-    return (ob.name, counts, bbox, vsum)
+    mods   = tuple((mod.name, mod.type, mod.show_viewport) for mod in ob.modifiers)
+    tag    = mesh_update_tags.get(ob.name, 0)
+    buf    = object_vertex_buffer(ob)
+    if not buf:
+        vcheck = ()
+    elif strict:
+        xs,ys,zs = buf[0::3], buf[1::3], buf[2::3]
+        bbox   = (min(xs), min(ys), min(zs), max(xs), max(ys), max(zs))
+        vsum   = (sum(xs), sum(ys), sum(zs))
+        vcheck = (bbox, vsum)
+    else:
+        step   = max(1, counts[0] // validation_samples) * 3
+        vcheck = hash((tuple(buf[0::step]), tuple(buf[1::step]), tuple(buf[2::step]), tuple(buf[-3:])))
+    return (ob.name, counts, mods, tag, strict, vcheck)
+
+@persistent
+def tag_updated_objects(scene):
+    '''
+    scene_update_post handler that counts data updates per object, so an edited
+    source invalidates the cache even when the sampled fingerprint happens to match
+    '''
+    objects = bpy.data.objects
+    if not getattr(objects, 'is_updated', True): return
+    for ob in objects:
+        if getattr(ob, 'is_updated_data', False):
+            mesh_update_tags[ob.name] = mesh_update_tags.get(ob.name, 0) + 1
+
+def estimate_mesh_cache_size(bme):
+    '''
+    returns rough memory footprint (bytes) of a cached triangulated bmesh and its bvh
+    '''
+    nverts,nedges,nfaces = len(bme.verts), len(bme.edges), len(bme.faces)
+    nloops = nfaces * 3
+    return nverts*96 + nedges*80 + nfaces*112 + nloops*88 + nfaces*64
 
-def is_object_valid(ob):
-    if 'valid' not in mesh_cache: return False
-    return mesh_cache['valid'] == object_validation(ob)
+def is_object_valid(ob, need_bme=True):
+    '''
+    returns True if a valid cache entry exists for ob, making it the active mesh_cache entry.
+    entries built in the background hold only a bvh; they do not count when need_bme is True
+    '''
+    valid = object_validation(ob)
+    entry = mesh_cache if mesh_cache.get('valid') == valid else mesh_cache_entries.get(valid)
+    if not entry or (need_bme and not entry['bme']):
+        mesh_cache_stats['misses'] += 1
+        return False
+    if entry is not mesh_cache:
+        dprint('activating cached mesh for %s' % ob.name)
+        mesh_cache_entries.move_to_end(valid)
+        mesh_cache.clear()
+        mesh_cache.update(entry)
+    mesh_cache_stats['hits'] += 1
+    return True
+
+def free_mesh_cache_entry(valid):
+    entry = mesh_cache_entries.pop(valid)
+    if mesh_cache.get('valid') == valid:
+        mesh_cache.clear()
+    if entry['bme']:
+        entry['bme'].free()
+
+def evict_mesh_cache(keep=None):
+    '''
+    frees least recently used entries until cache fits within size limit (preferences).
+    entry keep (the one just written) is never evicted
+    '''
+    max_size = get_settings().mesh_cache_size * 1024 * 1024
+    total = sum(entry['size'] for entry in mesh_cache_entries.values())
+    for valid in list(mesh_cache_entries.keys()):
+        if total <= max_size: break
+        if valid == keep: continue
+        dprint('evicting cached mesh for %s' % valid[0])
+        total -= mesh_cache_entries[valid]['size']
+        free_mesh_cache_entry(valid)
+        mesh_cache_stats['evictions'] += 1
 
 def write_mesh_cache(orig_ob, bme, bvh):
     dprint('writing mesh cache')
-    mesh_cache['valid'] = object_validation(orig_ob)
-    mesh_cache['bme'] = bme
-    mesh_cache['bvh'] = bvh
+    valid = object_validation(orig_ob)
+    # entries for older versions of this object can never be hit again
+    for old in [old for old in mesh_cache_entries if old[0] == valid[0] and old != valid]:
+        free_mesh_cache_entry(old)
+    size = estimate_mesh_cache_size(bme) if bme else len(orig_ob.data.polygons) * 2 * 64
+    entry = {'valid':valid, 'bme':bme, 'bvh':bvh, 'size':size}
+    mesh_cache_entries[valid] = entry
+    mesh_cache_entries.move_to_end(valid)
+    mesh_cache.clear()
+    mesh_cache.update(entry)
+    evict_mesh_cache(keep=valid)
+    dprint('mesh cache: %d entries, %d hits, %d misses, %d evictions' % (
+        len(mesh_cache_entries), mesh_cache_stats['hits'], mesh_cache_stats['misses'], mesh_cache_stats['evictions']))
+
+def get_mesh_slicer(bme):
+    '''
+    returns MeshSlicer for bme.  slicer of the cached bmesh is built on first use and kept
+    with its cache entry; any other bmesh gets a slicer that is kept until bme changes
+    '''
+    global other_slicer
+    if mesh_cache.get('bme') is bme:
+        slicer = mesh_cache.get('slicer')
+        if not slicer or not slicer.is_valid_for(bme):
+            dprint('building mesh slicer')
+            slicer = MeshSlicer(bme)
+            mesh_cache['slicer'] = slicer
+            entry = mesh_cache_entries.get(mesh_cache['valid'])
+            if entry:
+                entry['slicer'] = slicer
+                entry['size'] += slicer.size()
+        return slicer
+    if not other_slicer or other_slicer[0] is not bme or not other_slicer[1].is_valid_for(bme):
+        other_slicer = (bme, MeshSlicer(bme))
+    return other_slicer[1]
 
 def clear_mesh_cache():
+    '''
+    deactivates the current entry.  the entry stays in the LRU cache so that
+    switching back to its object does not rebuild the bmesh and bvh
+    '''
     dprint('clearing mesh cache')
-    if 'valid' in mesh_cache and mesh_cache['valid']:
-        del mesh_cache['valid']
-
-    if 'bme' in mesh_cache and mesh_cache['bme']:
-        bme_old = mesh_cache['bme']
-        bme_old.free()
-        del mesh_cache['bme']
-
-    if 'bvh' in mesh_cache and mesh_cache['bvh']:
-        bvh_old = mesh_cache['bvh']
-        del bvh_old
-    
+    mesh_cache.clear()
+
+def free_mesh_cache():
+    '''
+    frees every cached bmesh and bvh
+    '''
+    dprint('freeing mesh cache')
+    for valid in list(mesh_cache_entries.keys()):
+        free_mesh_cache_entry(valid)
+    mesh_cache.clear()
+
+
+#########################################################################
+# optional on-disk cache of evaluated source mesh buffers
+# file layout: header, then float32 vertex coords (xyz), then int32 loop vertex
+# indices, polygon loop starts, and polygon loop totals.  files are memory-mapped
+# when read, so BVHTree.FromPolygons can be built without from_object/triangulate
+
+disk_cache_magic  = b'RFDC'
+disk_cache_header = struct.Struct('=4sQQQ')     # magic, nverts, nloops, npolys
+disk_cache_ext    = '.rfdc'
+
+def disk_cache_dir():
+    '''
+    returns directory of disk cache, or None if disk cache is disabled (preferences)
+    '''
+    settings = get_settings()
+    if not settings.disk_cache: return None
+    if settings.disk_cache_location == 'BLEND' and bpy.data.filepath:
+        path = os.path.join(os.path.dirname(bpy.data.filepath), 'retopoflow_cache')
+    else:
+        path = bpy.utils.user_resource('DATAFILES', path='retopoflow_cache')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def modifier_signature(mod):
+    props = mod.bl_rna.properties
+    return tuple((p.identifier, getattr(mod, p.identifier)) for p in props
+                 if p.type in {'BOOLEAN','INT','FLOAT','STRING','ENUM'} and not getattr(p, 'array_length', 0)
+                 and p.identifier != 'rna_type')
+
+def disk_cache_filename(ob):
+    '''
+    returns path of disk cache file for evaluated mesh of ob, or None if disk cache is disabled.
+    key hashes the full vertex coordinate, edge and face index buffers of the mesh together
+    with the full modifier settings, so any edit made between sessions changes the key
+    '''
+    path = disk_cache_dir()
+    if not path: return None
+    me = ob.data
+    edge_verts = array.array('i', [0]) * (len(me.edges) * 2)
+    loop_verts = array.array('i', [0]) * len(me.loops)
+    loop_totals = array.array('i', [0]) * len(me.polygons)
+    me.edges.foreach_get('vertices', edge_verts)
+    me.loops.foreach_get('vertex_index', loop_verts)
+    me.polygons.foreach_get('loop_total', loop_totals)
+    mods = tuple(modifier_signature(mod) for mod in ob.modifiers)
+    h = hashlib.sha1(repr((ob.name, len(me.vertices), len(me.edges), len(me.polygons), mods)).encode('utf-8'))
+    for buf in (object_vertex_buffer(ob), edge_verts, loop_verts, loop_totals):
+        h.update(buf)
+    return os.path.join(path, h.hexdigest() + disk_cache_ext)
+
+def read_disk_cache(filename):
+    '''
+    returns memory-mapped (verts, loop_verts, loop_starts, loop_totals) or None on miss
+    '''
+    if not filename or not os.path.isfile(filename): return None
+    try:
+        with open(filename, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic,nverts,nloops,npolys = disk_cache_header.unpack_from(mm, 0)
+        if magic != disk_cache_magic: return None
+        sizes = (nverts*3*4, nloops*4, npolys*4, npolys*4)
+        if len(mm) != disk_cache_header.size + sum(sizes): return None
+        mv,off,bufs = memoryview(mm),disk_cache_header.size,[]
+        for size,fmt in zip(sizes, 'fiii'):
+            bufs += [mv[off:off+size].cast(fmt)]
+            off += size
+        os.utime(filename)      # mark as recently used
+    except (OSError, ValueError, struct.error) as e:
+        dprint('could not read disk cache %s: %s' % (filename, str(e)))
+        return None
+    return tuple(bufs)
+
+def write_disk_cache(filename, verts, loop_verts, loop_starts, loop_totals, max_size):
+    '''
+    writes buffers to disk cache, then evicts least recently used files beyond max_size bytes
+    '''
+    tmpname = filename + '.tmp'
+    try:
+        with open(tmpname, 'wb') as f:
+            f.write(disk_cache_header.pack(disk_cache_magic, len(verts)//3, len(loop_verts), len(loop_starts)))
+            for buf in (verts, loop_verts, loop_starts, loop_totals):
+                f.write(buf)
+        os.replace(tmpname, filename)
+    except OSError as e:
+        print('RetopoFlow: could not write disk cache %s: %s' % (filename, str(e)))
+        if os.path.exists(tmpname): os.remove(tmpname)
+        return
+    evict_disk_cache(os.path.dirname(filename), max_size, keep=filename)
+
+def evict_disk_cache(path, max_size, keep=None):
+    '''
+    removes least recently used cache files in path until total size is at most max_size bytes
+    '''
+    files = [os.path.join(path, fn) for fn in os.listdir(path) if fn.endswith(disk_cache_ext)]
+    files = sorted((st.st_mtime, st.st_size, fn) for st,fn in ((os.stat(fn),fn) for fn in files))
+    total = sum(size for _,size,_ in files)
+    for _,size,fn in files:
+        if total <= max_size: break
+        if fn == keep: continue
+        try:
+            os.remove(fn)
+            total -= size
+        except OSError:
+            pass
+
@@ -19,46 +19,65 @@ Created by Jonathan Denning and Jonathan Williamson
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
+import time
+import array
 import bpy, blf, bgl, bmesh
 from mathutils.bvhtree import BVHTree
 from bpy_extras.view3d_utils import location_3d_to_region_2d, region_2d_to_vector_3d
 from bpy_extras.view3d_utils import region_2d_to_location_3d, region_2d_to_origin_3d
-from ...common_utilities import bversion, dprint
-from ...common_utilities import invert_matrix, matrix_normal
+from ...common_utilities import bversion, dprint, get_settings
+from ...common_utilities import invert_matrix, matrix_normal, ray_cast_screen_many_bvh
 #from ...common_utilities import ray_cast_region2d_bvh
 from ....cache import is_object_valid, clear_mesh_cache, write_mesh_cache, mesh_cache
+from ....cache import disk_cache_filename, read_disk_cache, write_disk_cache
 
 class BMeshCache():
     '''
     BMeshCache is useful for containing data related to mesh object, such as BMesh, BVH, matrices
     
     Use only with objects that do not change
+
+    When background is True and the object is not cached, only the BVH is built (from the disk
+    cache if enabled and available) and the BMesh is left as None.  The build is done in steps:
+    call update_build() periodically (ex: on modal TIMER events) until is_ready() returns True.
+    Until then, raycast_screen and find_nearest miss.
     '''
     
-    def __init__(self, data, mx=None):
+    def __init__(self, data, mx=None, background=False):
+        self.build_steps    = None
+        self.build_progress = 1.0
+        self.build_result   = None
+        self.build_object   = None
+        
         if type(data) is str:
             data = bpy.data.objects[data]
         
         if type(data) is bpy.types.Object:
             assert data.type == 'MESH', 'Unhandled object type: %s' % data.type
             
-            if not is_object_valid(data):
-                dprint('Creating BMesh from Mesh Object')
-                bme = bmesh.new()
-                bme.from_object(data, bpy.context.scene)
-                # triangulate all faces to ensure planarity and other nice properties
-                dprint('Triangulating BMesh')
-                bmesh.ops.triangulate(bme, faces=bme.faces[:])
-                # create bvh tree for raycasting and snapping
-                dprint('Creating BVH Tree')
-                bvh = BVHTree.FromBMesh(bme)
-                dprint('Writing to mesh cache')
-                clear_mesh_cache()
-                write_mesh_cache(data, bme, bvh)
-            
-            self.bme = mesh_cache['bme']
-            self.bvh = mesh_cache['bvh']
-            self.mx  = data.matrix_world
+            if background and not is_object_valid(data, need_bme=False):
+                self.bme = None
+                self.bvh = None
+                self.mx  = data.matrix_world
+                self.start_background_build(data)
+            else:
+                if not is_object_valid(data):
+                    dprint('Creating BMesh from Mesh Object')
+                    bme = bmesh.new()
+                    bme.from_object(data, bpy.context.scene)
+                    # triangulate all faces to ensure planarity and other nice properties
+                    dprint('Triangulating BMesh')
+                    bmesh.ops.triangulate(bme, faces=bme.faces[:])
+                    # create bvh tree for raycasting and snapping
+                    dprint('Creating BVH Tree')
+                    bvh = BVHTree.FromBMesh(bme)
+                    dprint('Writing to mesh cache')
+                    clear_mesh_cache()
+                    write_mesh_cache(data, bme, bvh)
+                
+                self.bme = mesh_cache['bme']
+                self.bvh = mesh_cache['bvh']
+                self.mx  = data.matrix_world
         
         elif type(data) is bmesh.types.BMesh:
             assert mx, 'Must specify matrix when data is BMesh!'
@@ -70,18 +89,99 @@ class BMeshCache():
         else:
             assert False, 'Unknown data type: %s' % str(type(data))
         
-        self.bvh_raycast = self.bvh.ray_cast
-        self.bvh_nearest = self.bvh.find_nearest if bversion() > '002.076.000' else self.bvh.find
+        if self.bvh: self.set_bvh(self.bvh)
         self.imx = invert_matrix(self.mx)
         self.nmx = matrix_normal(self.mx)
         self.imx3x3 = self.imx.to_3x3()
     
+    def set_bvh(self, bvh):
+        self.bvh = bvh
+        self.bvh_raycast = self.bvh.ray_cast
+        self.bvh_nearest = self.bvh.find_nearest if bversion() > '002.076.000' else self.bvh.find
+    
+    def start_background_build(self, ob):
+        '''
+        extracts coordinate and polygon index buffers of evaluated object (or memory-maps them
+        from disk cache).  the BVH is then built from them in small steps by update_build()
+        '''
+        self.build_progress = 0.0
+        self.build_object = ob
+        filename = disk_cache_filename(ob)
+        bufs = read_disk_cache(filename)
+        if bufs:
+            dprint('Loading buffers from disk cache for background BVH build')
+            filename = None     # already on disk
+        else:
+            dprint('Extracting buffers for background BVH build')
+            me = ob.to_mesh(scene=bpy.context.scene, apply_modifiers=True, settings='PREVIEW')
+            verts = array.array('f', [0.0]) * (len(me.vertices) * 3)
+            loop_verts = array.array('i', [0]) * len(me.loops)
+            loop_starts = array.array('i', [0]) * len(me.polygons)
+            loop_totals = array.array('i', [0]) * len(me.polygons)
+            me.vertices.foreach_get('co', verts)
+            me.loops.foreach_get('vertex_index', loop_verts)
+            me.polygons.foreach_get('loop_start', loop_starts)
+            me.polygons.foreach_get('loop_total', loop_totals)
+            bpy.data.meshes.remove(me)
+            bufs = (verts, loop_verts, loop_starts, loop_totals)
+        self.build_progress = 0.1
+        
+        max_size = get_settings().disk_cache_size * 1024 * 1024
+        self.build_steps = self.background_build(*(bufs + (filename, max_size)))
+    
+    def background_build(self, verts, loop_verts, loop_starts, loop_totals, filename, max_size, chunk=65536):
+        '''
+        generator that builds the BVH one step per next().  buffer conversion is split into
+        chunks, but BVHTree.FromPolygons is a single step that blocks until the tree is built.
+        buffers are written to disk cache at filename (if given) once BVH is built
+        '''
+        npolys = len(loop_starts)
+        polys = []
+        for i0 in range(0, npolys, chunk):
+            polys.extend(loop_verts[s:s+t] for s,t in zip(loop_starts[i0:i0+chunk], loop_totals[i0:i0+chunk]))
+            self.build_progress = 0.1 + 0.4 * min(npolys, i0+chunk) / npolys
+            yield
+        coords = []
+        for i0 in range(0, len(verts), chunk*3):
+            i1 = i0 + chunk*3
+            coords.extend(zip(verts[i0:i1:3], verts[i0+1:i1:3], verts[i0+2:i1:3]))
+            self.build_progress = 0.5 + 0.1 * min(len(verts), i1) / len(verts)
+            yield
+        # FromPolygons triangulates ngons itself
+        self.build_result = BVHTree.FromPolygons(coords, polys)
+        if filename:
+            self.build_progress = 0.9
+            yield
+            write_disk_cache(filename, verts, loop_verts, loop_starts, loop_totals, max_size)
+        self.build_progress = 1.0
+    
+    def update_build(self, max_time=0.02):
+        '''
+        advances BVH build for about max_time seconds (call on modal TIMER events).
+        swaps in BVH once build is finished.  returns True if BVH is ready
+        '''
+        if not self.build_steps: return self.bvh is not None
+        t_end = time.time() + max_time
+        for _ in self.build_steps:
+            if time.time() >= t_end: return False
+        self.build_steps = None
+        dprint('Background BVH build finished')
+        self.set_bvh(self.build_result)
+        self.build_result = None
+        clear_mesh_cache()
+        write_mesh_cache(self.build_object, None, self.bvh)
+        return True
+    
+    def is_ready(self):
+        return self.bvh is not None
+    
     def __del__(self):
         #self.bme.free()  # do NOT free! may be shared!
         del self.bme
         del self.bvh
     
     def raycast_screen(self, loc2d, rgn, r3d):
+        if not self.bvh: return (None, None)
         o,d = region_2d_to_origin_3d(rgn, r3d, loc2d),region_2d_to_vector_3d(rgn, r3d, loc2d)
         back = 0 if r3d.is_perspective else 100
         p3d,n3d,idx,dist = self.bvh_raycast(self.imx * (o-d*back), self.imx3x3 * d)
@@ -89,7 +189,22 @@ class BMeshCache():
         n3d = self.nmx * n3d if n3d else None
         return (p3d, n3d)
     
+    def raycast_screen_many(self, points2d, rgn, r3d):
+        '''
+        batched raycast_screen: view matrices are inverted and rays transformed once for all points.
+        returns lists (p3ds, n3ds, idxs), with None entries for misses
+        '''
+        if not self.bvh:
+            nones = [None] * len(points2d)
+            return (nones, list(nones), list(nones))
+        hits = ray_cast_screen_many_bvh(rgn, r3d, points2d, self.bvh, self.mx)
+        p3ds = [hit[0] if hit else None for hit in hits]
+        n3ds = [hit[1] if hit else None for hit in hits]
+        idxs = [hit[2] if hit else None for hit in hits]
+        return (p3ds, n3ds, idxs)
+    
     def find_nearest(self, loc3d):
+        if not self.bvh: return (None, None, float('inf'))
         p3d,n3d,idx,dist = self.bvh_nearest(self.imx * loc3d)
         p3d = self.mx * p3d if p3d else None
         n3d = self.nmx * n3d if n3d else None
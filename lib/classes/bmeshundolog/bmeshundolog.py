@@ -0,0 +1,197 @@
+'''
+Copyright (C) 2017 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning and Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+class BMeshUndoLog():
+    '''
+    BMeshUndoLog records edits of a BMesh as undo steps that hold only the elements the edits
+    touched, so taking a step does not copy or walk the whole mesh.
+
+    push() opens a step.  Before edges or faces around some verts are created, split, or removed,
+    the verts are reported with touch().  The first time a vert is touched in a step, its
+    coordinate, normal, and linked edges and faces are stored.  Verts created in the step are
+    reported with created(), and verts that are only moved with moved().  undo() removes the
+    elements now around the touched and created verts, then rebuilds the stored ones and restores
+    stored coordinates and normals.
+
+    Verts are identified by ids kept in an int layer, so records stay valid when undo rebuilds a
+    removed vert.  Other custom data (uvs, etc.) is not recorded.
+    '''
+
+    layer_name = 'rf_undo_id'
+
+    def __init__(self, bme, steps):
+        self.bme = bme
+        self.steps = steps      # list of undo steps, oldest first
+        self.remove_layer(bme)
+        self.layer = bme.verts.layers.int.new(self.layer_name)
+        self.verts_by_id = {}
+        self.next_id = 1
+
+    def remove_layer(self, bme):
+        ''' removes id layer from bme (ex: from a copy that is written back to a mesh) '''
+        layers = bme.verts.layers.int
+        if self.layer_name in layers: layers.remove(layers[self.layer_name])
+
+    def new_id(self, bmv):
+        i,self.next_id = self.next_id,self.next_id+1
+        bmv[self.layer] = i
+        self.verts_by_id[i] = bmv
+        return i
+
+    def vid(self, bmv):
+        i = bmv[self.layer]
+        # edge_split copies the layer of an existing vert into the new vert
+        if not i or self.verts_by_id.get(i) != bmv: i = self.new_id(bmv)
+        return i
+
+    def vert(self, i):
+        bmv = self.verts_by_id.get(i)
+        return bmv if bmv is not None and bmv.is_valid else None
+
+    def edge_key(self, bme):
+        i0,i1 = self.vid(bme.verts[0]),self.vid(bme.verts[1])
+        return (i0,i1) if i0 < i1 else (i1,i0)
+
+    def face_key(self, bmf):
+        ''' vert ids of face, rotated to start with smallest id (winding is kept) '''
+        l = [self.vid(bmv) for bmv in bmf.verts]
+        i = l.index(min(l))
+        return tuple(l[i:] + l[:i])
+
+    def find_edge(self, key):
+        bmv0,bmv1 = self.vert(key[0]),self.vert(key[1])
+        if not bmv0 or not bmv1: return None
+        return next((bme for bme in bmv0.link_edges if bme.other_vert(bmv0) == bmv1), None)
+
+    def find_face(self, key):
+        bmv0 = self.vert(key[0])
+        if not bmv0: return None
+        return next((bmf for bmf in bmv0.link_faces if self.face_key(bmf) == key), None)
+
+    def step_size(self, step):
+        ''' returns rough memory footprint of step (bytes) '''
+        return 256 + 48 * sum(len(step[k]) for k in ('verts','region','edges','faces','created'))
+
+    def push(self, kind, sel, depth, max_size=0):
+        '''
+        opens a new step.  sel is selection (lbmv, lbme, lbmf), restored when step is undone.
+        kind 'move' marks steps that only move verts; with a memory limit (max_size bytes) set,
+        consecutive 'move' steps are merged while no elements were created or removed
+        '''
+        top = self.steps[-1] if self.steps else None
+        if max_size and kind == 'move' and top and top['kind'] == 'move' and not top['region'] and not top['created']:
+            return
+        lbmv,lbme,lbmf = [[elem for elem in lelem if elem.is_valid] for lelem in sel]
+        sel = ([self.vid(bmv) for bmv in lbmv], [self.edge_key(bme) for bme in lbme], [self.face_key(bmf) for bmf in lbmf])
+        self.steps.append({
+            'kind':    kind,
+            'sel':     sel,
+            'verts':   {},      # vert id -> (co, normal) at start of step
+            'region':  set(),   # ids of touched verts
+            'edges':   set(),   # keys of edges around region at start of step
+            'faces':   set(),   # keys of faces around region at start of step
+            'created': set(),   # ids of verts created in step
+            })
+        while len(self.steps) > depth:
+            self.steps.pop(0)
+        while max_size and len(self.steps) > 1 and sum(self.step_size(step) for step in self.steps) > max_size:
+            self.steps.pop(0)
+
+    def store_vert(self, step, bmv, i):
+        if i not in step['verts'] and i not in step['created']:
+            step['verts'][i] = (bmv.co.copy(), bmv.normal.copy())
+
+    def moved(self, lbmv):
+        ''' report verts before they are moved '''
+        if not self.steps: return
+        step = self.steps[-1]
+        for bmv in lbmv:
+            self.store_vert(step, bmv, self.vid(bmv))
+
+    def touch(self, lbmv):
+        ''' report verts before edges or faces around them are created, split, or removed '''
+        if not self.steps: return
+        step = self.steps[-1]
+        region,created = step['region'],step['created']
+        for bmv in lbmv:
+            i = self.vid(bmv)
+            if i in region or i in created: continue
+            self.store_vert(step, bmv, i)
+            # elements linked to verts already in region were stored (or created) with those verts
+            for bme in bmv.link_edges:
+                key = self.edge_key(bme)
+                if key[0] not in region and key[1] not in region and key[0] not in created and key[1] not in created:
+                    step['edges'].add(key)
+            for bmf in bmv.link_faces:
+                key = self.face_key(bmf)
+                if not any(j in region or j in created for j in key):
+                    step['faces'].add(key)
+            region.add(i)
+
+    def created(self, bmv):
+        ''' report vert after it is created '''
+        i = self.new_id(bmv)
+        if self.steps: self.steps[-1]['created'].add(i)
+
+    def undo(self):
+        '''
+        reverts edits of newest step and removes it.  returns (lbmv, sel), where lbmv are the verts
+        around the reverted edits and sel is the selection (lbmv, lbme, lbmf) stored with the step,
+        or None if there is nothing to undo
+        '''
+        if not self.steps: return None
+        step = self.steps.pop()
+        bme = self.bme
+        
+        region = [self.vert(i) for i in step['region'] | step['created']]
+        region = [bmv for bmv in region if bmv]
+        edges = {self.edge_key(bme_):bme_ for bmv in region for bme_ in bmv.link_edges}
+        faces = {self.face_key(bmf):bmf for bmv in region for bmf in bmv.link_faces}
+        for key,bmf in faces.items():
+            if key not in step['faces'] and bmf.is_valid: bme.faces.remove(bmf)
+        for key,bme_ in edges.items():
+            if key not in step['edges'] and bme_.is_valid: bme.edges.remove(bme_)
+        for i in step['created']:
+            bmv = self.vert(i)
+            if bmv: bme.verts.remove(bmv)
+        
+        lbmv = []
+        for i,(co,no) in step['verts'].items():
+            bmv = self.vert(i)
+            if not bmv:
+                bmv = bme.verts.new(co)
+                bmv[self.layer] = i
+                self.verts_by_id[i] = bmv
+            bmv.co = co
+            bmv.normal = no
+            lbmv.append(bmv)
+        for key in step['edges']:
+            if key not in edges: bme.edges.new([self.vert(i) for i in key])
+        for key in step['faces']:
+            if key not in faces: bme.faces.new([self.vert(i) for i in key]).normal_update()
+        
+        lv,le,lf = step['sel']
+        sel = (
+            [bmv for bmv in map(self.vert, lv) if bmv],
+            [bme_ for bme_ in map(self.find_edge, le) if bme_],
+            [bmf for bmf in map(self.find_face, lf) if bmf],
+            )
+        return (lbmv, sel)
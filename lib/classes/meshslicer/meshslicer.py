@@ -0,0 +1,324 @@
+'''
+Copyright (C) 2017 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning and Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from mathutils import Vector
+from ...common_utilities import numpy
+
+class MeshSlicer():
+    '''
+    MeshSlicer intersects a static BMesh with planes.  The BMesh is flattened once into arrays
+    of vertex coordinates and edge/face indices, so that slicing computes the signed distance of
+    every vertex in one (NumPy-vectorized, if available) pass, finds crossing edges by sign
+    change, and chains them into ordered loops through edge-to-face adjacency.
+
+    Vertices lying exactly on the plane count as being in front of it, so every face that the
+    plane crosses has an even number of crossing edges and loops are always well formed.
+    All coordinates are in local space of the BMesh.
+
+    walk() finds only the loop through a given face by walking the adjacency lists face to face,
+    computing signed distances just for the verts it visits.
+    '''
+
+    def __init__(self, bme):
+        bme.verts.index_update()
+        bme.edges.index_update()
+        bme.faces.index_update()
+        self.counts = (len(bme.verts), len(bme.edges), len(bme.faces))
+
+        cos = [tuple(bmv.co) for bmv in bme.verts]
+        self.vert_cos = cos
+        self.edge_verts = [(bme_.verts[0].index, bme_.verts[1].index) for bme_ in bme.edges]
+        self.edge_faces = [tuple(bmf.index for bmf in bme_.link_faces) for bme_ in bme.edges]
+        self.face_edges = [tuple(bme_.index for bme_ in bmf.edges) for bmf in bme.faces]
+
+        if numpy:
+            self.coords = numpy.array(cos, dtype=numpy.float64).reshape((-1,3))
+            self.edges_np = numpy.array(self.edge_verts, dtype=numpy.int32).reshape((-1,2))
+        else:
+            self.coords = [Vector(co) for co in cos]
+
+    def is_valid_for(self, bme):
+        return self.counts == (len(bme.verts), len(bme.edges), len(bme.faces))
+
+    def size(self):
+        '''
+        returns rough memory footprint (bytes)
+        '''
+        nv,ne,nf = self.counts
+        return nv*(24 + 72) + ne*(8 + 120) + nf*(80 + 24*3)
+
+    def signed_distances(self, pt, no):
+        '''
+        returns signed distance (scaled by length of no) of every vertex to plane (pt,no)
+        '''
+        if numpy:
+            return self.coords.dot(numpy.array(no[:3])) - no.dot(pt)
+        d = no.dot(pt)
+        return [no.dot(co) - d for co in self.coords]
+
+    def crossing_edges(self, dists):
+        '''
+        returns dict of edge index to intersection point for edges whose verts are on
+        opposite sides of plane, given signed distances of verts
+        '''
+        if numpy:
+            E = self.edges_np
+            D0,D1 = dists[E[:,0]],dists[E[:,1]]
+            lei = numpy.nonzero((D0 >= 0.0) != (D1 >= 0.0))[0]
+            if not len(lei): return {}
+            d0,d1 = D0[lei],D1[lei]
+            t = (d0 / (d0 - d1))[:,None]
+            C0,C1 = self.coords[E[lei,0]],self.coords[E[lei,1]]
+            P = C0 + (C1 - C0) * t
+            return {ei:Vector(p) for ei,p in zip(lei.tolist(), P.tolist())}
+        coords,crosses = self.coords,{}
+        for ei,(i0,i1) in enumerate(self.edge_verts):
+            d0,d1 = dists[i0],dists[i1]
+            if (d0 >= 0.0) == (d1 >= 0.0): continue
+            co0,co1 = coords[i0],coords[i1]
+            crosses[ei] = co0 + (co1 - co0) * (d0 / (d0 - d1))
+        return crosses
+
+    def chain_loops(self, crosses):
+        '''
+        returns list of (edge indices, cyclic) of crossing edges chained into ordered loops.
+        crossing edges of a face are paired in the order they appear around the face
+        '''
+        face_edges,edge_faces = self.face_edges,self.edge_faces
+        neighbors = {ei:[] for ei in crosses}
+        for fi in {fi for ei in crosses for fi in edge_faces[ei]}:
+            lei = [ei for ei in face_edges[fi] if ei in crosses]
+            for ei0,ei1 in zip(lei[0::2], lei[1::2]):
+                neighbors[ei0].append(ei1)
+                neighbors[ei1].append(ei0)
+
+        def walk(ei):
+            chain = [ei]
+            seen.add(ei)
+            while True:
+                ei = next((n for n in neighbors[ei] if n not in seen), None)
+                if ei is None: return chain
+                chain.append(ei)
+                seen.add(ei)
+
+        loops,seen = [],set()
+        # open chains start at an end (crossing edge with only one neighbor)
+        for ei,lnei in neighbors.items():
+            if ei in seen or len(lnei) > 1: continue
+            loops.append((walk(ei), False))
+        for ei in neighbors:
+            if ei in seen: continue
+            chain = walk(ei)
+            loops.append((chain, len(chain) > 2 and chain[0] in neighbors[chain[-1]]))
+        return loops
+
+    def slice(self, pt, no):
+        '''
+        returns list of (verts, cyclic) for every loop where plane (pt,no) cuts mesh
+        '''
+        crosses = self.crossing_edges(self.signed_distances(pt, no))
+        return [([crosses[ei] for ei in chain], cyclic) for chain,cyclic in self.chain_loops(crosses)]
+
+    def walk(self, pt, no, seed_index, epsilon=0.0, prev=None):
+        '''
+        returns (verts, cyclic, chain) of the loop where plane (pt,no) cuts mesh through face
+        seed_index.  if plane misses seed face, it is shifted along no to just cross it.
+        walks that reach a boundary or non-manifold edge end there, giving an open loop.
+        returns (None, None, None) if seed face could not be cut.
+
+        chain records the crossed edges and faces of the loop.  passing the chain of the
+        previous walk as prev (ex: while a cut is dragged) re-uses it: only the parts of the
+        loop whose crossing edges changed are walked again, and a full walk is done only if
+        the loop cannot be repaired that way
+        '''
+        return self.walk_cut(PlaneCut(self, pt, no), seed_index, epsilon, prev=prev)
+
+    def walk_cut(self, cut, seed_index, epsilon, prev=None):
+        chain = None
+        if prev and cut.crosses_face(seed_index):
+            chain = self.repair_chain(cut, prev, seed_index)
+        if not chain:
+            chain = self.walk_chain(cut, seed_index, epsilon)
+        if not chain: return (None, None, None)
+        edges,faces,cyclic = chain
+        return ([cut.point(ei) for ei in edges], cyclic, chain)
+
+    def next_crossing(self, cut, fi, ei_from, co_from):
+        '''
+        returns edge of face fi other than ei_from where plane crosses (farthest from co_from)
+        '''
+        lei = [ei for ei in self.face_edges[fi] if ei != ei_from and cut.crossing(ei)]
+        if not lei: return None
+        if len(lei) == 1: return lei[0]
+        return max(lei, key=lambda ei: (cut.point(ei) - co_from).length)
+
+    def other_face(self, ei, fi):
+        return next((f for f in self.edge_faces[ei] if f != fi), None)
+
+    def walk_chain(self, cut, seed_index, epsilon):
+        '''
+        returns chain (edges, faces, cyclic) found by walking from seed face both ways.
+        faces[i] is face between edges[i] and edges[i+1] (wrapping around if cyclic)
+        '''
+        # make sure that plane crosses seed face.  verts on plane count as in front, so plane
+        # must move past nearest vert (halfway to next nearest, if epsilon does not say how far)
+        ld = [cut.dist(vi) for vi in self.face_verts(seed_index)]
+        if all(d >= 0.0 for d in ld):
+            dmin = min(ld)
+            dnext = min((d for d in ld if d > dmin), default=dmin)
+            cut.shift(dmin + (epsilon or (dnext - dmin) / 2))
+        elif all(d < 0.0 for d in ld):
+            cut.shift(max(ld) - epsilon)
+
+        lei = [ei for ei in self.face_edges[seed_index] if cut.crossing(ei)]
+        if len(lei) < 2: return None
+        if len(lei) > 2:
+            # find two farthest points
+            lei = max(((ei0,ei1) for i,ei0 in enumerate(lei) for ei1 in lei[i+1:]), key=lambda e: (cut.point(e[0]) - cut.point(e[1])).length)
+
+        def walk_from(fi_from, ei_from):
+            edges,faces = [ei_from],[]
+            visited = {fi_from: 0}      # face -> index of edge through which walk left face
+            fi = self.other_face(ei_from, fi_from)
+            while fi is not None:
+                ei = self.next_crossing(cut, fi, edges[-1], cut.point(edges[-1]))
+                if ei is None: break
+                edges.append(ei)
+                faces.append(fi)
+                fi_next = self.other_face(ei, fi)
+                if fi_next in visited:
+                    # looped; clip off tail if loop is P-shaped.  fi_next closes loop
+                    # between its last edge and the edge through which walk left fi_next
+                    j = visited[fi_next]
+                    return (edges[j:], faces[j:] + [fi_next], True)
+                if fi_next is not None: visited[fi_next] = len(edges)
+                fi = fi_next
+            return (edges, faces, False)                                # hit end
+
+        # start walking one way around mesh
+        edges0,faces0,looped = walk_from(seed_index, lei[0])
+        if looped: return (edges0, faces0, True)
+
+        # did not loop around, so walk the other way and combine
+        edges1,faces1,looped = walk_from(seed_index, lei[1])
+        if looped: return (edges1, faces1, True)
+        return (edges0[::-1] + edges1, faces0[::-1] + [seed_index] + faces1, False)
+
+    def repair_chain(self, cut, prev, seed_index, max_steps=1000):
+        '''
+        returns chain of prev updated for plane of cut, or None if loop changed too much.
+        edges of prev that still cross are kept; runs of edges that no longer cross are
+        re-walked from the last kept edge until the walk rejoins a later kept edge
+        '''
+        edges,faces,cyclic = prev
+        n = len(edges)
+        ok = [cut.crossing(ei) for ei in edges]
+        if not any(ok): return None
+        if not (ok[0] and ok[-1]):
+            if not cyclic: return None                                  # ends of open loop moved
+            i0 = ok.index(True)
+            edges,faces,ok = edges[i0:]+edges[:i0],faces[i0:]+faces[:i0],ok[i0:]+ok[:i0]
+        # kept edges must still be paired through their face
+        face_edges = self.face_edges
+        for i in range(n if cyclic else n-1):
+            if ok[i] and ok[(i+1)%n] and len(face_edges[faces[i]]) > 3:
+                if sum(1 for ei in face_edges[faces[i]] if cut.crossing(ei)) != 2: return None
+
+        kept = {ei:i for i,ei in enumerate(edges) if ok[i]}
+        if cyclic: kept[edges[0]] = n                                   # rejoining start closes loop
+        new_edges,new_faces = [edges[0]],[]
+        i,steps = 1,0
+        while i < (n+1 if cyclic else n):
+            if ok[i%n]:
+                new_faces.append(faces[i-1])
+                if i < n: new_edges.append(edges[i])
+                i += 1
+                continue
+            # re-walk from last kept edge through face that previously followed it
+            ei_from,fi,seen = new_edges[-1],faces[i-1],set()
+            while True:
+                steps += 1
+                if steps > max_steps or fi is None or fi in seen: return None
+                seen.add(fi)
+                ei = self.next_crossing(cut, fi, ei_from, cut.point(ei_from))
+                if ei is None: return None
+                new_faces.append(fi)
+                m = kept.get(ei)
+                if m is not None:
+                    if m < i: return None                               # walked backwards
+                    if m < n: new_edges.append(ei)
+                    i = m + 1
+                    break
+                new_edges.append(ei)
+                fi,ei_from = self.other_face(ei, fi),ei
+
+        if seed_index not in new_faces: return None                     # not the loop at seed
+        return (new_edges, new_faces, cyclic)
+
+    def face_verts(self, fi):
+        return {vi for ei in self.face_edges[fi] for vi in self.edge_verts[ei]}
+
+
+class PlaneCut():
+    '''
+    signed distances of verts of a MeshSlicer to a plane and intersection points of its edges,
+    computed on demand and memoised
+    '''
+
+    def __init__(self, slicer, pt, no):
+        self.slicer = slicer
+        self.no = (no[0], no[1], no[2])
+        self.d0 = no.dot(pt)
+        self.dists = {}
+        self.points = {}
+
+    def shift(self, offset):
+        '''
+        moves plane along its normal by offset
+        '''
+        self.d0 += offset
+        self.dists = {}
+        self.points = {}
+
+    def dist(self, vi):
+        d = self.dists.get(vi)
+        if d is None:
+            x,y,z = self.slicer.vert_cos[vi]
+            nx,ny,nz = self.no
+            d = self.dists[vi] = nx*x + ny*y + nz*z - self.d0
+        return d
+
+    def crossing(self, ei):
+        vi0,vi1 = self.slicer.edge_verts[ei]
+        return (self.dist(vi0) >= 0.0) != (self.dist(vi1) >= 0.0)
+
+    def crosses_face(self, fi):
+        ld = [self.dist(vi) for vi in self.slicer.face_verts(fi)]
+        return any(d >= 0.0 for d in ld) and any(d < 0.0 for d in ld)
+
+    def point(self, ei):
+        p = self.points.get(ei)
+        if p is None:
+            vi0,vi1 = self.slicer.edge_verts[ei]
+            a,b = self.dist(vi0),self.dist(vi1)
+            co0,co1 = Vector(self.slicer.vert_cos[vi0]),Vector(self.slicer.vert_cos[vi1])
+            p = self.points[ei] = co0 + (co1 - co0) * (a / (a - b))
+        return p
@@ -0,0 +1,115 @@
+'''
+Copyright (C) 2017 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning and Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+from mathutils import Vector
+from mathutils.kdtree import KDTree
+
+class BMeshSpatialIndex():
+    '''
+    BMeshSpatialIndex answers proximity queries (verts, edges, faces near a 3D point) over a
+    BMesh that is being edited, using KD-trees of vert positions, edge midpoints and face centers.
+
+    Trees are built lazily on the first query after dirty().  Edits in between do not rebuild them:
+    verts that are created or moved, or whose edges or faces are created, split or removed, are
+    reported with update_verts().  They are kept in a small pending set that is checked linearly,
+    along with their edges and faces, until pending grows past max_pending.  Removed elements are
+    dropped from the results, so removing needs no rebuild either.
+
+    Queries return candidates only; callers still compute exact distances.
+    '''
+
+    def __init__(self, bme, max_pending=256):
+        self.bme = bme
+        self.max_pending = max_pending
+        self.is_dirty = True
+        self.pending = set()
+
+    def replace_target_bmesh(self, bme):
+        self.bme = bme
+        self.dirty()
+
+    def dirty(self):
+        self.is_dirty = True
+
+    def update_verts(self, lbmv):
+        '''
+        report verts that were created or moved, or whose linked edges or faces changed
+        '''
+        self.pending.update(lbmv)
+        if len(self.pending) > self.max_pending: self.dirty()
+
+    def clean(self):
+        if not self.is_dirty: return
+        bme = self.bme
+
+        self.verts = list(bme.verts)
+        self.edges = list(bme.edges)
+        self.faces = list(bme.faces)
+
+        self.kd_verts = KDTree(len(self.verts))
+        for i,bmv in enumerate(self.verts):
+            self.kd_verts.insert(bmv.co, i)
+        self.kd_verts.balance()
+
+        # edges and faces are indexed by their centers, with the largest
+        # center-to-vert distance as padding for range queries
+        self.kd_edges = KDTree(len(self.edges))
+        self.edge_radius = 0.0
+        for i,bme_ in enumerate(self.edges):
+            co0,co1 = bme_.verts[0].co, bme_.verts[1].co
+            self.kd_edges.insert((co0 + co1) * 0.5, i)
+            self.edge_radius = max(self.edge_radius, (co1 - co0).length * 0.5)
+        self.kd_edges.balance()
+
+        self.kd_faces = KDTree(len(self.faces))
+        self.face_radius = 0.0
+        for i,bmf in enumerate(self.faces):
+            ctr = bmf.calc_center_median()
+            self.kd_faces.insert(ctr, i)
+            self.face_radius = max([self.face_radius] + [(bmv.co - ctr).length for bmv in bmf.verts])
+        self.kd_faces.balance()
+
+        self.pending = set()
+        self.is_dirty = False
+
+    def pending_verts(self):
+        return [bmv for bmv in self.pending if bmv.is_valid]
+
+    def verts_near(self, co, radius):
+        if radius == float('inf'): return list(self.bme.verts)
+        self.clean()
+        lbmv = {self.verts[i] for _,i,_ in self.kd_verts.find_range(co, radius)}
+        lbmv.update(self.pending_verts())
+        return [bmv for bmv in lbmv if bmv.is_valid]
+
+    def edges_near(self, co, radius):
+        if radius == float('inf'): return list(self.bme.edges)
+        self.clean()
+        lbme = {self.edges[i] for _,i,_ in self.kd_edges.find_range(co, radius + self.edge_radius)}
+        for bmv in self.pending_verts(): lbme.update(bmv.link_edges)
+        return [bme for bme in lbme if bme.is_valid]
+
+    def faces_near(self, co, radius):
+        if radius == float('inf'): return list(self.bme.faces)
+        self.clean()
+        lbmf = {self.faces[i] for _,i,_ in self.kd_faces.find_range(co, radius + self.face_radius)}
+        for bmv in self.pending_verts(): lbmf.update(bmv.link_faces)
+        return [bmf for bmf in lbmf if bmf.is_valid]
@@ -0,0 +1,218 @@
+'''
+Copyright (C) 2017 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning and Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import sys
+import copy
+import collections
+import itertools
+from mathutils import Vector, Matrix
+
+# undo ids are unique across all stores, so objects restored from an old snapshot
+# never collide with objects created since
+undo_uids = itertools.count(1)
+
+def undo_touch(*objs):
+    '''
+    marks objects as changed since the last snapshot, so the next snapshot walks them again
+    '''
+    for obj in objs:
+        if obj is not None: obj.__dict__.pop('_undo_clean', None)
+
+class UndoTracked():
+    '''
+    base for undo units (see UndoSnapshots) that are marked changed whenever one of their
+    attributes is assigned.  changes made in place (ex: appending to a list attribute) still
+    need an undo_touch
+    '''
+    undo_unit = True
+
+    def __setattr__(self, name, value):
+        self.__dict__.pop('_undo_clean', None)
+        object.__setattr__(self, name, value)
+
+class UndoSnapshots():
+    '''
+    UndoSnapshots takes snapshots of a graph of objects (instances of the given classes)
+    with structural sharing between consecutive snapshots.
+
+    Each object is frozen into an immutable record (attributes with vectors, lists, dicts and
+    references to other objects converted into tuples).  A value (vector, list, etc.) that is
+    referenced more than once is frozen once, and restored as one object, so aliasing is kept
+    as with deepcopy.  When a value is unchanged since the previous snapshot, its previous
+    frozen value is reused, and when a whole record is unchanged, the previous record is reused,
+    so memory per snapshot grows only with the data an action changed.  Restoring a snapshot
+    builds new objects, leaving the snapshot untouched.
+
+    Instances of classes with undo_unit set are units: a unit owns the objects reached through
+    it that are not units themselves.  Once a unit is walked it is marked clean, and while it
+    stays clean the next snapshot reuses the records of the unit and the objects it owns
+    without walking them.  Any edit to a unit or to an object it owns must mark the unit as
+    changed with undo_touch (UndoTracked does that for attribute assignments).
+
+    A class can list derived attributes in undo_transient (name -> factory).  They are not
+    frozen, and restored objects get a fresh value from the factory.
+    '''
+
+    def __init__(self, classes):
+        self.classes = tuple(classes)
+        self.latest = {}        # uid -> record of the most recent snapshot taken or restored
+        self.values = {}        # id(value) -> (value, frozen value) of the most recent snapshot
+        self.units = {}         # uid -> (records, values, referenced units) of each unit when last walked
+
+    def uid(self, obj):
+        uid = obj.__dict__.get('_undo_uid')
+        if uid is None:
+            uid = next(undo_uids)
+            obj.__dict__['_undo_uid'] = uid
+        return uid
+
+    def freeze(self, val, queue, memo):
+        if val is None or isinstance(val, (bool, int, float, str)): return val
+        if isinstance(val, self.classes):
+            queue.append(val)
+            return ('r', self.uid(val))
+        key = id(val)
+        if key in memo: return memo[key][1]
+        if   isinstance(val, Vector): fval = ('v', tuple(val))
+        elif isinstance(val, Matrix): fval = ('m', tuple(tuple(row) for row in val))
+        elif isinstance(val, list):   fval = ('l', tuple(self.freeze(v, queue, memo) for v in val))
+        elif isinstance(val, tuple):  fval = ('t', tuple(self.freeze(v, queue, memo) for v in val))
+        elif isinstance(val, set):    fval = ('s', tuple(self.freeze(v, queue, memo) for v in val))
+        elif isinstance(val, dict):   fval = ('d', tuple((self.freeze(k, queue, memo), self.freeze(v, queue, memo)) for k,v in val.items()))
+        else:                         fval = ('x', copy.deepcopy(val))
+        prev = self.values.get(key)
+        if prev and prev[0] is val and prev[1] == fval: fval = prev[1]
+        memo[key] = (val, fval)
+        return fval
+
+    def thaw(self, val, objs, memo):
+        if not isinstance(val, tuple): return val
+        t,v = val
+        if t == 'r': return objs[v]
+        if t == 't': return tuple(self.thaw(x, objs, memo) for x in v)
+        key = id(val)
+        if key in memo: return memo[key][0]
+        if   t == 'v': obj = Vector(v)
+        elif t == 'm': obj = Matrix(v)
+        elif t == 'l': obj = [self.thaw(x, objs, memo) for x in v]
+        elif t == 's': obj = set(self.thaw(x, objs, memo) for x in v)
+        elif t == 'd': obj = {self.thaw(k, objs, memo):self.thaw(x, objs, memo) for k,x in v}
+        else:          obj = copy.deepcopy(v)
+        memo[key] = (obj, val)
+        return obj
+
+    def record(self, obj, queue, memo):
+        '''
+        returns record of obj, reusing the previous record if obj is unchanged
+        '''
+        uid = self.uid(obj)
+        skip = getattr(obj, 'undo_transient', {})
+        items = tuple((k, self.freeze(v, queue, memo)) for k,v in obj.__dict__.items() if not k.startswith('_undo_') and k not in skip)
+        prev = self.latest.get(uid)
+        if prev and prev[0] is type(obj):
+            if prev[1] == items: return prev
+            pitems = dict(prev[1])
+            size = sum(record_size(v) for k,v in items if v is not pitems.get(k))
+        else:
+            size = record_size(items)
+        return (type(obj), items, size)
+
+    def take_unit(self, unit, memo):
+        '''
+        walks unit and the objects it owns.  returns (records, values, referenced units)
+        '''
+        records,values,refs = {},{},[]
+        lmemo = collections.ChainMap(values, memo)
+        queue = [unit]
+        while queue:
+            obj = queue.pop()
+            if obj is not unit and getattr(obj, 'undo_unit', False):
+                refs.append(obj)
+                continue
+            uid = self.uid(obj)
+            if uid in records: continue
+            records[uid] = self.record(obj, queue, lmemo)
+        unit.__dict__['_undo_clean'] = True
+        return (records, values, refs)
+
+    def take(self, root):
+        '''
+        returns snapshot of root (an object or a container of objects) and all objects reachable from it
+        '''
+        records = {}
+        units = {}
+        queue = []
+        memo = {}
+        froot = self.freeze(root, queue, memo)
+        while queue:
+            obj = queue.pop()
+            uid = self.uid(obj)
+            if uid in records: continue
+            if not getattr(obj, 'undo_unit', False):
+                records[uid] = self.record(obj, queue, memo)
+                continue
+            unit = self.units.get(uid)
+            if not unit or not obj.__dict__.get('_undo_clean'):
+                unit = self.take_unit(obj, memo)
+            urecords,uvalues,urefs = units[uid] = unit
+            records.update(urecords)
+            memo.update(uvalues)
+            queue.extend(urefs)
+        self.latest = records
+        self.values = memo
+        self.units = units
+        return {'root': froot, 'records': records}
+
+    def restore(self, snapshot):
+        '''
+        returns new root built from snapshot
+        '''
+        records = snapshot['records']
+        objs = {uid:cls.__new__(cls) for uid,(cls,_,_) in records.items()}
+        memo = {}
+        for uid,(cls,items,_) in records.items():
+            d = objs[uid].__dict__
+            d.update((k, self.thaw(v, objs, memo)) for k,v in items)
+            d.update((k, factory()) for k,factory in getattr(cls, 'undo_transient', {}).items())
+            d['_undo_uid'] = uid
+        root = self.thaw(snapshot['root'], objs, memo)
+        self.latest = records
+        self.values = {id(obj):(obj, fval) for obj,fval in memo.values()}
+        self.units = {}         # restored units are not marked clean, so next snapshot walks them
+        return root
+
+def record_size(val):
+    '''
+    returns approximate memory (bytes) of frozen value
+    '''
+    if isinstance(val, tuple): return sys.getsizeof(val) + sum(record_size(v) for v in val)
+    return sys.getsizeof(val)
+
+def snapshots_size(snapshots):
+    '''
+    returns approximate memory (bytes) of list of snapshots, counting shared records once.
+    a changed record only counts its own attribute values, not those shared with an older record
+    '''
+    seen = {}
+    for snapshot in snapshots:
+        for record in snapshot['records'].values():
+            seen[id(record)] = record[2]
+    return sum(seen.values())
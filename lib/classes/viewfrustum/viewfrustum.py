@@ -0,0 +1,85 @@
+'''
+Copyright (C) 2017 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning and Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+def points_bbox(points, pad=0.0):
+    '''
+    returns axis-aligned bounding box ((minx,miny,minz),(maxx,maxy,maxz)) of points,
+    grown by pad in every direction, or None if there are no points
+    '''
+    points = [p for p in points if p is not None]
+    if not points: return None
+    xs,ys,zs = [p[0] for p in points],[p[1] for p in points],[p[2] for p in points]
+    return ((min(xs)-pad, min(ys)-pad, min(zs)-pad), (max(xs)+pad, max(ys)+pad, max(zs)+pad))
+
+def bbox_union(bboxes):
+    '''
+    returns bounding box containing all bboxes, or None if any of them is None (unknown)
+    '''
+    bboxes = list(bboxes)
+    if not bboxes or any(bbox is None for bbox in bboxes): return None
+    return (
+        tuple(min(bbox[0][i] for bbox in bboxes) for i in range(3)),
+        tuple(max(bbox[1][i] for bbox in bboxes) for i in range(3)),
+        )
+
+class ViewFrustum():
+    '''
+    ViewFrustum tests world space bounding boxes against the clipping planes of a 3D view,
+    so that drawing code can skip elements that are entirely off-screen.
+
+    The test is conservative: boxes near a corner of the frustum may be reported visible even
+    though they are not, but a box that is at least partly in view is never culled.  Unknown
+    boxes (None) are always visible.
+    '''
+
+    def __init__(self):
+        self.view_key = None
+        self.planes = []
+
+    def update_view(self, r3d):
+        '''
+        call before testing boxes.  recomputes planes only if view has changed
+        '''
+        persmat = r3d.perspective_matrix
+        key = tuple(tuple(row) for row in persmat)
+        if key == self.view_key: return
+        self.view_key = key
+        r0,r1,r2,r3 = key
+        # clip space: -w <= x,y,z <= w  =>  (r3 +/- ri) . (x,y,z,1) >= 0
+        self.planes = [tuple(a + s * b for a,b in zip(r3, ri)) for ri in (r0,r1,r2) for s in (1.0,-1.0)]
+
+    def bbox_visible(self, bbox, mirror_x=False):
+        '''
+        returns False only if bbox is entirely outside the view frustum.
+        mirror_x tests the box mirrored across the x=0 plane
+        '''
+        if bbox is None: return True
+        (x0,y0,z0),(x1,y1,z1) = bbox
+        if mirror_x: x0,x1 = -x1,-x0
+        for a,b,c,d in self.planes:
+            # test corner of box furthest along plane normal
+            x = x1 if a >= 0 else x0
+            y = y1 if b >= 0 else y0
+            z = z1 if c >= 0 else z0
+            if a*x + b*y + c*z + d < 0: return False
+        return True
+
+view_frustum = ViewFrustum()
@@ -0,0 +1,117 @@
+'''
+Copyright (C) 2017 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning and Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import sys
+from mathutils import Vector
+from ...common_utilities import invert_matrix, numpy
+
+class VisibilityCache():
+    '''
+    VisibilityCache determines whether world space points are occluded by a source mesh (bvh)
+    in the current view.
+
+    Points outside the view frustum or with back-facing normals are culled before any ray is
+    cast, and results are kept until the view changes (see update_view), so repeated hover
+    events within one unchanged view reuse them.  Results are keyed by coordinate, so moved
+    points are tested again.
+    '''
+
+    def __init__(self, bvh, mx, offset=0.01, max_results=100000):
+        self.bvh_raycast = bvh.ray_cast
+        self.mx = mx
+        self.imx = invert_matrix(mx)
+        self.offset = offset            # distance (local space) to step off surface before casting
+        self.max_results = max_results
+        self.view_key = None
+        self.results = {}
+
+    def update_view(self, r3d):
+        '''
+        call before testing points.  drops cached results if view has changed
+        '''
+        persmat = r3d.perspective_matrix
+        key = tuple(tuple(row) for row in persmat)
+        if key == self.view_key and len(self.results) < self.max_results: return
+        self.view_key = key
+        self.results = {}
+        self.persmat = persmat.copy()
+        self.is_persp = r3d.is_perspective
+        viewinv = r3d.view_matrix.inverted()
+        self.eye = viewinv.translation.copy()
+        self.view_dir = viewinv.col[2].xyz.normalized()     # points toward viewer
+        self.eye_local = self.imx * self.eye
+        self.view_dir_local = (self.imx.to_3x3() * self.view_dir).normalized()
+
+    def clear(self):
+        self.results = {}
+
+    def in_frustum(self, co):
+        x,y,z,w = self.persmat * Vector((co[0], co[1], co[2], 1.0))
+        return w > 0 and -w <= x <= w and -w <= y <= w and -w <= z <= w
+
+    def is_backfacing(self, co, no):
+        if not no or no.length_squared == 0: return False
+        to_eye = (self.eye - co) if self.is_persp else self.view_dir
+        return no.dot(to_eye) < 0
+
+    def raycast_visible(self, co):
+        v = self.imx * co
+        if self.is_persp:
+            v2v = self.eye_local - v
+            v2vl = v2v.length
+            if v2vl <= self.offset: return True
+            v2v /= v2vl
+            dist = v2vl - self.offset
+        else:
+            v2v = self.view_dir_local
+            dist = sys.float_info.max
+        return self.bvh_raycast(v + v2v * self.offset, v2v, dist)[0] is None
+
+    def is_visible(self, co, no=None):
+        key = (co[0], co[1], co[2])
+        vis = self.results.get(key)
+        if vis is None:
+            vis = self.in_frustum(co) and not self.is_backfacing(co, no) and self.raycast_visible(co)
+            self.results[key] = vis
+        return vis
+
+    def visible_many(self, cos, nos=None):
+        '''
+        returns list of booleans indicating whether each point in cos is visible.
+        frustum and back-face culling is done in bulk when NumPy is available
+        '''
+        if nos is None: nos = [None] * len(cos)
+        keys = [(co[0], co[1], co[2]) for co in cos]
+        results = self.results
+        ltest = [i for i,key in enumerate(keys) if key not in results]
+        if ltest and numpy:
+            P = numpy.array([keys[i] + (1.0,) for i in ltest])
+            C = P.dot(numpy.array(self.persmat).T)
+            W = C[:,3:4]
+            culled = ~((W[:,0] > 0) & (numpy.abs(C[:,:3]) <= W).all(axis=1))
+            for i,c in zip(ltest, culled.tolist()):
+                if c: results[keys[i]] = False
+        for i in ltest:
+            if keys[i] in results: continue
+            co,no = cos[i],nos[i]
+            vis = self.in_frustum(co) and not self.is_backfacing(co, no) and self.raycast_visible(co)
+            results[keys[i]] = vis
+        return [results[key] for key in keys]
@@ -28,7 +28,7 @@ from bpy_extras.view3d_utils import region_2d_to_location_3d, region_2d_to_origi
 from mathutils import Vector, Matrix, Quaternion
 from mathutils.bvhtree import BVHTree
 from .common_shader import Shader
-from .common_utilities import invert_matrix, matrix_normal
+from .common_utilities import invert_matrix, matrix_normal, find_nearest_many_bvh
 
 import math
 
@@ -99,6 +99,33 @@ void main() {
 }
 '''
 
+# same as shaderVertSource, but vertex positions and normals come from
+# attribute arrays (buffers) rather than from glVertex/glNormal calls
+shaderVertSourceBuffers = '''
+#version 110
+
+attribute vec3 vco;
+attribute vec3 vnorm;
+attribute float offset;
+attribute float dotoffset;
+
+varying vec4 vPosition;
+varying vec3 vNormal;
+varying float vOffset;
+varying float vDotOffset;
+
+void main() {
+    vec4 vertex = vec4(vco, 1.0);
+    gl_Position = gl_ModelViewProjectionMatrix * vertex;
+    gl_FrontColor = gl_Color;
+    
+    vPosition = gl_ModelViewMatrix * vertex;
+    vNormal = normalize(gl_NormalMatrix * vnorm);
+    vOffset = offset;
+    vDotOffset = dotoffset;
+}
+'''
+
 def setupBMeshShader(shader):
     spc,r3d = bpy.context.space_data,bpy.context.space_data.region_3d
     shader.assign('perspective', r3d.view_perspective != 'ORTHO')
@@ -107,6 +134,14 @@ def setupBMeshShader(shader):
 
 bmeshShader = Shader(shaderVertSource, shaderFragSource, setupBMeshShader)
 
+# buffer rendering needs vertex buffer objects and generic vertex attribute arrays
+bufferRenderSupported = all(hasattr(bgl, fn) for fn in [
+    'glGenBuffers', 'glDeleteBuffers', 'glBindBuffer', 'glBufferData',
+    'glVertexAttribPointer', 'glEnableVertexAttribArray', 'glDisableVertexAttribArray',
+    'glDrawArrays', 'glDrawElements', 'GL_ARRAY_BUFFER', 'GL_ELEMENT_ARRAY_BUFFER', 'GL_DYNAMIC_DRAW',
+    ])
+bmeshBufferShader = Shader(shaderVertSourceBuffers, shaderFragSource, setupBMeshShader) if bufferRenderSupported else None
+
 
 
 def glColor(color):
@@ -120,14 +155,14 @@ def glSetDefaultOptions(opts=None):
     bgl.glDisable(bgl.GL_LIGHTING)
     bgl.glEnable(bgl.GL_DEPTH_TEST)
 
-def glSetOptions(prefix, opts):
+def glSetOptions(prefix, opts, shader=bmeshShader):
     if opts == None: return
     prefix = '%s '%prefix if prefix else ''
     #if '%sdepth'%prefix in opts: bgl.glDepthRange(*opts['%sdepth'%prefix])
     if '%soffset'%prefix in opts:
-        bmeshShader.assign('offset', opts['%soffset'%prefix])
+        shader.assign('offset', opts['%soffset'%prefix])
     if '%sdotoffset'%prefix in opts:
-        bmeshShader.assign('dotoffset', opts['%sdotoffset'%prefix])
+        shader.assign('dotoffset', opts['%sdotoffset'%prefix])
     if '%scolor'%prefix in opts: glColor(opts['%scolor'%prefix])
     if '%swidth'%prefix in opts: bgl.glLineWidth(opts['%swidth'%prefix])
     if '%ssize'%prefix  in opts: bgl.glPointSize(opts['%ssize'%prefix])
@@ -136,42 +171,79 @@ def glSetOptions(prefix, opts):
         bgl.glEnable(bgl.GL_LINE_STIPPLE)
 
 
+# display lists used to replay geometry for mirrored drawing (see glDrawMirrored).
+# key -> (display list, geometry version); key None is recompiled on every call
+mirrorLists = {}
+
+def glIsCompilingList():
+    if not hasattr(bgl, 'GL_LIST_INDEX'): return True
+    buf = bgl.Buffer(bgl.GL_INT, 1)
+    bgl.glGetIntegerv(bgl.GL_LIST_INDEX, buf)
+    return buf[0] != 0
+
+def glDrawMirrored(fnDraw, prefix, opts, key=None, version=None):
+    '''
+    calls fnDraw to emit geometry.  if opts has 'mirror x', the geometry is drawn again mirrored
+    across x with the '<prefix> mirror' options, by replaying it under a scale(-1,1,1) matrix
+    rather than emitting it a second time.  when called while a display list is being compiled
+    (lists cannot be nested), geometry is emitted again under the mirror matrix instead.
+    with a key, the compiled geometry is kept, and later calls with the same key and version
+    call it instead of calling fnDraw
+    '''
+    mirror = opts and opts.get('mirror x', False)
+    if not mirror:
+        fnDraw()
+        bgl.glDisable(bgl.GL_LINE_STIPPLE)
+        return
+    cached = mirrorLists.get(key)
+    replay = True
+    if key is not None and cached and cached[1] == version:
+        bgl.glCallList(cached[0])
+    elif not glIsCompilingList():
+        mirrorList = cached[0] if cached else bgl.glGenLists(1)
+        bgl.glNewList(mirrorList, bgl.GL_COMPILE_AND_EXECUTE)
+        fnDraw()
+        bgl.glEndList()
+        mirrorLists[key] = (mirrorList, version)
+    else:
+        replay = False
+        fnDraw()
+    bgl.glDisable(bgl.GL_LINE_STIPPLE)
+    glSetOptions('%s mirror' % prefix, opts)
+    bgl.glPushMatrix()
+    bgl.glScalef(-1.0, 1.0, 1.0)
+    bgl.glFrontFace(bgl.GL_CW)          # mirroring flips winding
+    if replay:
+        bgl.glCallList(mirrorLists[key][0])
+    else:
+        fnDraw()
+    bgl.glFrontFace(bgl.GL_CCW)
+    bgl.glPopMatrix()
+    bgl.glDisable(bgl.GL_LINE_STIPPLE)
+
+
 def glDrawBMFace(bmf, opts=None, enableShader=True):
     glDrawBMFaces([bmf], opts=opts, enableShader=enableShader)
 
-def glDrawBMFaces(lbmf, opts=None, enableShader=True):
+def glDrawBMFaces(lbmf, opts=None, enableShader=True, key=None, version=None):
     glSetOptions('poly', opts)
     if enableShader: bmeshShader.enable()
     
     dn = opts['normal'] if opts and 'normal' in opts else 0.0
-    bgl.glBegin(bgl.GL_TRIANGLES)
-    for bmf in lbmf:
-        bgl.glNormal3f(*bmf.normal)
-        bmv0 = bmf.verts[0]
-        for bmv1,bmv2 in zip(bmf.verts[1:-1],bmf.verts[2:]):
-            if bmf.smooth: bgl.glNormal3f(*bmv0.normal)
-            bgl.glVertex3f(*(bmv0.co)) #+bmv0.normal*dn))
-            if bmf.smooth: bgl.glNormal3f(*bmv1.normal)
-            bgl.glVertex3f(*(bmv1.co)) #+bmv1.normal*dn))
-            if bmf.smooth: bgl.glNormal3f(*bmv2.normal)
-            bgl.glVertex3f(*(bmv2.co)) #+bmv2.normal*dn))
-    bgl.glEnd()
-    bgl.glDisable(bgl.GL_LINE_STIPPLE)
-    if opts and opts.get('mirror x', False):
-        glSetOptions('poly mirror', opts)
+    def draw():
         bgl.glBegin(bgl.GL_TRIANGLES)
         for bmf in lbmf:
-            bgl.glNormal3f(-bmf.normal.x, bmf.normal.y, bmf.normal.z)
+            bgl.glNormal3f(*bmf.normal)
             bmv0 = bmf.verts[0]
             for bmv1,bmv2 in zip(bmf.verts[1:-1],bmf.verts[2:]):
-                if bmf.smooth: bgl.glNormal3f(-bmv0.normal.x, bmv0.normal.y, bmv0.normal.z)
-                bgl.glVertex3f(-bmv0.co.x, bmv0.co.y, bmv0.co.z)
-                if bmf.smooth: bgl.glNormal3f(-bmv1.normal.x, bmv1.normal.y, bmv1.normal.z)
-                bgl.glVertex3f(-bmv1.co.x, bmv1.co.y, bmv1.co.z)
-                if bmf.smooth: bgl.glNormal3f(-bmv2.normal.x, bmv2.normal.y, bmv2.normal.z)
-                bgl.glVertex3f(-bmv2.co.x, bmv2.co.y, bmv2.co.z)
+                if bmf.smooth: bgl.glNormal3f(*bmv0.normal)
+                bgl.glVertex3f(*(bmv0.co)) #+bmv0.normal*dn))
+                if bmf.smooth: bgl.glNormal3f(*bmv1.normal)
+                bgl.glVertex3f(*(bmv1.co)) #+bmv1.normal*dn))
+                if bmf.smooth: bgl.glNormal3f(*bmv2.normal)
+                bgl.glVertex3f(*(bmv2.co)) #+bmv2.normal*dn))
         bgl.glEnd()
-        bgl.glDisable(bgl.GL_LINE_STIPPLE)
+    glDrawMirrored(draw, 'poly', opts, key=key, version=version)
     
     if enableShader: bmeshShader.disable()
 
@@ -184,32 +256,21 @@ def glDrawBMFaceVerts(bmf, opts=None, enableShader=True):
 def glDrawBMEdge(bme, opts=None, enableShader=True):
     glDrawBMEdges([bme], opts=opts, enableShader=enableShader)
 
-def glDrawBMEdges(lbme, opts=None, enableShader=True):
+def glDrawBMEdges(lbme, opts=None, enableShader=True, key=None, version=None):
     if opts and 'line width' in opts and opts['line width'] <= 0.0: return
     glSetOptions('line', opts)
     if enableShader: bmeshShader.enable()
     dn = opts['normal'] if opts and 'normal' in opts else 0.0
-    bgl.glBegin(bgl.GL_LINES)
-    for bme in lbme:
-        bmv0,bmv1 = bme.verts
-        bgl.glNormal3f(*bmv0.normal)
-        bgl.glVertex3f(*(bmv0.co+bmv0.normal*dn))
-        bgl.glNormal3f(*bmv1.normal)
-        bgl.glVertex3f(*(bmv1.co+bmv1.normal*dn))
-    bgl.glEnd()
-    bgl.glDisable(bgl.GL_LINE_STIPPLE)
-    if opts and opts.get('mirror x', False):
-        glSetOptions('line mirror', opts)
+    def draw():
         bgl.glBegin(bgl.GL_LINES)
         for bme in lbme:
             bmv0,bmv1 = bme.verts
-            co0,co1 = bmv0.co,bmv1.co
-            bgl.glNormal3f(-bmv0.normal.x, bmv0.normal.y, bmv0.normal.z)
-            bgl.glVertex3f(-co0.x, co0.y, co0.z)
-            bgl.glNormal3f(-bmv1.normal.x, bmv1.normal.y, bmv1.normal.z)
-            bgl.glVertex3f(-co1.x, co1.y, co1.z)
+            bgl.glNormal3f(*bmv0.normal)
+            bgl.glVertex3f(*(bmv0.co+bmv0.normal*dn))
+            bgl.glNormal3f(*bmv1.normal)
+            bgl.glVertex3f(*(bmv1.co+bmv1.normal*dn))
         bgl.glEnd()
-        bgl.glDisable(bgl.GL_LINE_STIPPLE)
+    glDrawMirrored(draw, 'line', opts, key=key, version=version)
     if enableShader: bmeshShader.disable()
 
 def glDrawBMEdgeVerts(bme, opts=None, enableShader=True):
@@ -218,29 +279,37 @@ def glDrawBMEdgeVerts(bme, opts=None, enableShader=True):
 def glDrawBMVert(bmv, opts=None, enableShader=True):
     glDrawBMVerts([bmv], opts=opts, enableShader=enableShader)
 
-def glDrawBMVerts(lbmv, opts=None, enableShader=True):
+def glDrawBMVerts(lbmv, opts=None, enableShader=True, key=None, version=None):
     if opts and 'point size' in opts and opts['point size'] <= 0.0: return
     glSetOptions('point', opts)
     if enableShader: bmeshShader.enable()
     dn = opts['normal'] if opts and 'normal' in opts else 0.0
-    bgl.glBegin(bgl.GL_POINTS)
-    for bmv in lbmv:
-        bgl.glNormal3f(*bmv.normal)
-        bgl.glVertex3f(*(bmv.co+bmv.normal*dn))
-    bgl.glEnd()
-    bgl.glDisable(bgl.GL_LINE_STIPPLE)
-    if opts and opts.get('mirror x', False):
-        glSetOptions('point mirror', opts)
+    def draw():
         bgl.glBegin(bgl.GL_POINTS)
         for bmv in lbmv:
-            bgl.glNormal3f(-bmv.normal.x, bmv.normal.y, bmv.normal.z)
-            bgl.glVertex3f(-bmv.co.x, bmv.co.y, bmv.co.z)
+            bgl.glNormal3f(*bmv.normal)
+            bgl.glVertex3f(*(bmv.co+bmv.normal*dn))
         bgl.glEnd()
-        bgl.glDisable(bgl.GL_LINE_STIPPLE)
+    glDrawMirrored(draw, 'point', opts, key=key, version=version)
     if enableShader: bmeshShader.disable()
 
 
 class BMeshRender():
+    '''
+    BMeshRender draws a BMesh with bmeshShader.
+
+    When bgl supports it, the mesh is packed into vertex buffers (triangles, verts, edge indices)
+    that are drawn with glDrawArrays/glDrawElements.  Otherwise, or if buffer rendering fails, a
+    display list is compiled with glDrawBMFaces/glDrawBMEdges/glDrawBMVerts.
+
+    dirty() forces a full rebuild.  Verts that only moved can be reported with dirty_verts();
+    if the topology is unchanged, only the buffer ranges of those verts and their faces are
+    rewritten on the next draw.
+    '''
+    
+    # set to False for all instances if buffer rendering fails
+    use_buffers = bufferRenderSupported
+    
     def __init__(self, target_obj, target_mx=None, source_bvh=None, source_mx=None):
         if type(target_obj) is bpy.types.Object:
             print('Creating BMeshRender for ' + target_obj.name)
@@ -264,32 +333,71 @@ class BMeshRender():
         
         self.is_dirty = True
         self.calllist = bgl.glGenLists(1)
+        self.calllist_mirror = None     # mirror setting the display list was compiled with
+        self.buffers = {}       # name -> buffer object id
+        self.counts = {}        # name -> number of vertices / indices
+        self.dirty_bmverts = set()
+        self.loose_normals = {}     # loose vert -> (co, normal snapped to source) at time of lookup
+        self.built = None       # (nverts, nedges, nfaces, dn) of last full buffer build
+        self.face_tri_start = []    # face index -> first float of face in 'tri co'/'tri no'
     
     def replace_target_bmesh(self, target_bmesh):
         self.tar_bmesh = target_bmesh
         self.is_dirty = True
+        self.dirty_bmverts = set()
+        self.loose_normals = {}
     
     def __del__(self):
         if self.calllist:
             bgl.glDeleteLists(self.calllist, 1)
             self.calllist = None
+        if self.buffers:
+            ids = list(self.buffers.values())
+            bgl.glDeleteBuffers(len(ids), bgl.Buffer(bgl.GL_INT, len(ids), ids))
+            self.buffers = {}
     
     def dirty(self):
         self.is_dirty = True
     
+    def dirty_verts(self, lbmv):
+        '''
+        report verts that moved since last draw (topology must be unchanged)
+        '''
+        self.dirty_bmverts.update(lbmv)
+    
+    def snap_loose_normals(self, lbmv):
+        '''
+        sets normals of loose verts to normal of nearest source surface.
+        normals are cached, so only verts that moved since their last lookup are looked up again
+        '''
+        cache = self.loose_normals
+        lquery = [bmv for bmv in lbmv if bmv not in cache or cache[bmv][0] != bmv.co]
+        nearest = find_nearest_many_bvh(self.src_bvh, self.src_mx, [bmv.co for bmv in lquery])
+        for bmv,hit in zip(lquery, nearest):
+            cache[bmv] = (bmv.co.copy(), hit[1].normalized() if hit else bmv.normal.copy())
+        for bmv in lbmv:
+            bmv.normal = cache[bmv][1]
+    
+    def update_normals(self):
+        if not self.src_bvh: return
+        # normal_update() will destroy normals of verts not connected to faces :(
+        self.tar_bmesh.normal_update()
+        lbmv = [bmv for bmv in self.tar_bmesh.verts if not bmv.link_faces]
+        # drop verts that were removed or are no longer loose
+        self.loose_normals = {bmv:self.loose_normals[bmv] for bmv in lbmv if bmv in self.loose_normals}
+        self.snap_loose_normals(lbmv)
+    
     def clean(self, opts=None):
-        if not self.is_dirty: return
+        # mirrored geometry is compiled into the display list, so it is rebuilt when mirroring changes
+        mirror = bool(opts and opts.get('mirror x', False))
+        if not self.is_dirty and not self.dirty_bmverts and mirror == self.calllist_mirror: return
         
         # make not dirty first in case bad things happen while drawing
         self.is_dirty = False
+        self.dirty_bmverts = set()
+        self.calllist_mirror = mirror
         
-        if self.src_bvh:
-            # normal_update() will destroy normals of verts not connected to faces :(
-            self.tar_bmesh.normal_update()
-            for bmv in self.tar_bmesh.verts:
-                if len(bmv.link_faces) != 0: continue
-                _,n,_,_ = self.src_bvh.find_nearest(self.src_imx * bmv.co)
-                bmv.normal = (self.src_mxnorm * n).normalized()
+        self.update_normals()
         
         bgl.glNewList(self.calllist, bgl.GL_COMPILE)
         # do not change attribs if they're not set
@@ -303,7 +411,188 @@ class BMeshRender():
         bgl.glPopMatrix()
         bgl.glEndList()
     
+    def upload_buffer(self, name, target, gltype, data):
+        if name not in self.buffers:
+            buf = bgl.Buffer(bgl.GL_INT, 1)
+            bgl.glGenBuffers(1, buf)
+            self.buffers[name] = buf[0]
+        self.counts[name] = len(data)
+        if not data: return
+        bgl.glBindBuffer(target, self.buffers[name])
+        bgl.glBufferData(target, len(data) * 4, bgl.Buffer(gltype, len(data), data), bgl.GL_DYNAMIC_DRAW)
+        bgl.glBindBuffer(target, 0)
+    
+    def update_buffer(self, name, target, gltype, runs):
+        '''
+        rewrites parts of buffer.  runs is a list of (start, data), with start counted in values
+        '''
+        merged = []
+        for start,data in sorted(runs, key=lambda run: run[0]):
+            if merged and merged[-1][0] + len(merged[-1][1]) == start:
+                merged[-1][1].extend(data)
+            else:
+                merged.append((start, list(data)))
+        bgl.glBindBuffer(target, self.buffers[name])
+        for start,data in merged:
+            bgl.glBufferSubData(target, start * 4, len(data) * 4, bgl.Buffer(gltype, len(data), data))
+        bgl.glBindBuffer(target, 0)
+    
+    def face_tri_data(self, bmf):
+        '''
+        returns positions and normals of face, fan triangulated (same as glDrawBMFaces)
+        '''
+        tri_co,tri_no = [],[]
+        lbmv = bmf.verts
+        lco = [bmv.co for bmv in lbmv]
+        lno = [bmv.normal for bmv in lbmv] if bmf.smooth else [bmf.normal] * len(lbmv)
+        for i in range(1, len(lbmv)-1):
+            for j in (0, i, i+1):
+                tri_co.extend(lco[j])
+                tri_no.extend(lno[j])
+        return tri_co,tri_no
+    
+    def clean_buffers(self, opts=None):
+        bme = self.tar_bmesh
+        dn = opts['normal'] if opts and 'normal' in opts else 0.0
+        built = (len(bme.verts), len(bme.edges), len(bme.faces), dn)
+        
+        if not self.is_dirty:
+            if not self.dirty_bmverts: return
+            if built == self.built and hasattr(bgl, 'glBufferSubData'):
+                self.clean_buffers_verts()
+                return
+        
+        # make not dirty first in case bad things happen while packing
+        self.is_dirty = False
+        self.dirty_bmverts = set()
+        self.built = built
+        
+        self.update_normals()
+        
+        tri_co,tri_no = [],[]
+        self.face_tri_start = []
+        bme.faces.index_update()
+        for bmf in bme.faces:
+            self.face_tri_start.append(len(tri_co))
+            co,no = self.face_tri_data(bmf)
+            tri_co.extend(co)
+            tri_no.extend(no)
+        
+        bme.verts.index_update()
+        vert_co = [c for bmv in bme.verts for c in (bmv.co + bmv.normal * dn)]
+        vert_no = [c for bmv in bme.verts for c in bmv.normal]
+        edge_idx = [bmv.index for bmed in bme.edges for bmv in bmed.verts]
+        
+        self.upload_buffer('tri co', bgl.GL_ARRAY_BUFFER, bgl.GL_FLOAT, tri_co)
+        self.upload_buffer('tri no', bgl.GL_ARRAY_BUFFER, bgl.GL_FLOAT, tri_no)
+        self.upload_buffer('vert co', bgl.GL_ARRAY_BUFFER, bgl.GL_FLOAT, vert_co)
+        self.upload_buffer('vert no', bgl.GL_ARRAY_BUFFER, bgl.GL_FLOAT, vert_no)
+        self.upload_buffer('edge idx', bgl.GL_ELEMENT_ARRAY_BUFFER, bgl.GL_INT, edge_idx)
+    
+    def clean_buffers_verts(self):
+        '''
+        rewrites buffer ranges of moved verts (dirty_bmverts) and of faces whose positions or normals depend on them
+        '''
+        lbmv = [bmv for bmv in self.dirty_bmverts if bmv.is_valid]
+        self.dirty_bmverts = set()
+        dn = self.built[3]
+        
+        # moved verts change normals of their faces, and so the normals of all verts of those faces
+        sbmf = {bmf for bmv in lbmv for bmf in bmv.link_faces}
+        sbmv = set(lbmv) | {bmv for bmf in sbmf for bmv in bmf.verts}
+        if self.src_bvh:
+            for bmf in sbmf: bmf.normal_update()
+            for bmv in sbmv:
+                if bmv.link_faces: bmv.normal_update()
+            self.snap_loose_normals([bmv for bmv in sbmv if not bmv.link_faces])
+            # smooth faces around those verts are shaded with the updated vert normals
+            sbmf |= {bmf for bmv in sbmv for bmf in bmv.link_faces if bmf.smooth}
+        
+        tri_co,tri_no = [],[]
+        for bmf in sbmf:
+            start = self.face_tri_start[bmf.index]
+            co,no = self.face_tri_data(bmf)
+            tri_co.append((start, co))
+            tri_no.append((start, no))
+        vert_co = [(bmv.index * 3, bmv.co + bmv.normal * dn) for bmv in sbmv]
+        vert_no = [(bmv.index * 3, bmv.normal) for bmv in sbmv]
+        
+        self.update_buffer('tri co', bgl.GL_ARRAY_BUFFER, bgl.GL_FLOAT, tri_co)
+        self.update_buffer('tri no', bgl.GL_ARRAY_BUFFER, bgl.GL_FLOAT, tri_no)
+        self.update_buffer('vert co', bgl.GL_ARRAY_BUFFER, bgl.GL_FLOAT, vert_co)
+        self.update_buffer('vert no', bgl.GL_ARRAY_BUFFER, bgl.GL_FLOAT, vert_no)
+    
+    def bind_buffers(self, co, no):
+        shader = bmeshBufferShader
+        for name,var in [(co,'vco'), (no,'vnorm')]:
+            bgl.glBindBuffer(bgl.GL_ARRAY_BUFFER, self.buffers[name])
+            bgl.glVertexAttribPointer(shader.shaderVars[var]['location'], 3, bgl.GL_FLOAT, bgl.GL_FALSE, 0, 0)
+    
+    def draw_buffers_pass(self, suffix, opts):
+        shader = bmeshBufferShader
+        ntris,nverts,nedges = self.counts['tri co'] // 3, self.counts['vert co'] // 3, self.counts['edge idx']
+        
+        glSetOptions('poly' + suffix, opts, shader=shader)
+        if ntris:
+            self.bind_buffers('tri co', 'tri no')
+            bgl.glDrawArrays(bgl.GL_TRIANGLES, 0, ntris)
+        bgl.glDisable(bgl.GL_LINE_STIPPLE)
+        
+        self.bind_buffers('vert co', 'vert no')
+        
+        if not (opts and 'line width' in opts and opts['line width'] <= 0.0):
+            glSetOptions('line' + suffix, opts, shader=shader)
+            if nedges:
+                bgl.glBindBuffer(bgl.GL_ELEMENT_ARRAY_BUFFER, self.buffers['edge idx'])
+                bgl.glDrawElements(bgl.GL_LINES, nedges, bgl.GL_UNSIGNED_INT, 0)
+                bgl.glBindBuffer(bgl.GL_ELEMENT_ARRAY_BUFFER, 0)
+            bgl.glDisable(bgl.GL_LINE_STIPPLE)
+        
+        if not (opts and 'point size' in opts and opts['point size'] <= 0.0):
+            glSetOptions('point' + suffix, opts, shader=shader)
+            if nverts: bgl.glDrawArrays(bgl.GL_POINTS, 0, nverts)
+            bgl.glDisable(bgl.GL_LINE_STIPPLE)
+    
+    def draw_buffers(self, opts=None):
+        shader = bmeshBufferShader
+        lco,lno = shader.shaderVars['vco']['location'], shader.shaderVars['vnorm']['location']
+        assert lco >= 0 and lno >= 0, 'Buffer shader attributes not found'
+        
+        glSetDefaultOptions(opts=opts)
+        bgl.glPushMatrix()
+        bgl.glMultMatrixf(self.bglMatrix)
+        bgl.glEnableVertexAttribArray(lco)
+        bgl.glEnableVertexAttribArray(lno)
+        try:
+            self.draw_buffers_pass('', opts)
+            if opts and opts.get('mirror x', False):
+                bgl.glScalef(-1.0, 1.0, 1.0)
+                bgl.glFrontFace(bgl.GL_CW)          # mirroring flips winding
+                try:
+                    self.draw_buffers_pass(' mirror', opts)
+                finally:
+                    bgl.glFrontFace(bgl.GL_CCW)
+        finally:
+            bgl.glDisableVertexAttribArray(lco)
+            bgl.glDisableVertexAttribArray(lno)
+            bgl.glBindBuffer(bgl.GL_ARRAY_BUFFER, 0)
+            bgl.glDepthRange(0, 1)
+            bgl.glPopMatrix()
+    
     def draw(self, opts=None):
+        if BMeshRender.use_buffers:
+            try:
+                self.clean_buffers(opts=opts)
+                bmeshBufferShader.enable()
+                self.draw_buffers(opts=opts)
+                return
+            except Exception as e:
+                print('RetopoFlow: buffer rendering failed, falling back to display lists: ' + str(e))
+                BMeshRender.use_buffers = False
+                self.is_dirty = True
+            finally:
+                bmeshBufferShader.disable()
+        
         try:
             self.clean(opts=opts)
             bmeshShader.enable()
@@ -312,4 +601,3 @@ class BMeshRender():
             pass
         finally:
             bmeshShader.disable()
-
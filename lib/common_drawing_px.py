@@ -35,7 +35,80 @@ from mathutils import Vector, Matrix, Quaternion
 from mathutils.geometry import intersect_line_plane, intersect_point_line, distance_point_to_plane, intersect_line_line_2d, intersect_line_line
 from bpy_extras.view3d_utils import location_3d_to_region_2d, region_2d_to_vector_3d, region_2d_to_location_3d, region_2d_to_origin_3d
 
-from .common_utilities import dprint
+from .common_utilities import dprint, numpy
+
+
+class ProjectionCache():
+    '''
+    ProjectionCache projects lists of 3D points to region 2D coordinates
+    (same results as location_3d_to_region_2d) in one batch per list.
+
+    A result is kept only if the caller supplies both a key (names the point list) and a
+    version (changes whenever the points change).  The version is trusted as is; the points
+    are not compared or copied.  All results are dropped when the view (perspective matrix
+    or region size) changes.
+    '''
+
+    def __init__(self):
+        self.persmat = None
+        self.size = None
+        self.entries = {}
+
+    def update_view(self, region, r3d):
+        persmat,size = r3d.perspective_matrix,(region.width, region.height)
+        if size == self.size and persmat == self.persmat: return
+        self.persmat = persmat.copy()
+        self.size = size
+        self.entries = {}
+        self.rows = [tuple(row) for row in persmat]
+        self.half = (region.width / 2.0, region.height / 2.0)
+
+    def project_batch(self, points):
+        hw,hh = self.half
+        if numpy and len(points) > 8:
+            P = numpy.ones((len(points), 4))
+            P[:,:3] = [tuple(pt)[:3] for pt in points]
+            C = P.dot(numpy.array(self.rows).T)
+            W = C[:,3]
+            valid = W > 0.0
+            W[~valid] = 1.0
+            X = hw + hw * C[:,0] / W
+            Y = hh + hh * C[:,1] / W
+            return [Vector((x,y)) if v else None for x,y,v in zip(X.tolist(), Y.tolist(), valid.tolist())]
+        (r0,r1,_,r3) = self.rows
+        l = []
+        for pt in points:
+            x,y,z = pt[0],pt[1],pt[2]
+            w = r3[0]*x + r3[1]*y + r3[2]*z + r3[3]
+            if w <= 0.0:
+                l.append(None)
+                continue
+            l.append(Vector((
+                hw + hw * (r0[0]*x + r0[1]*y + r0[2]*z + r0[3]) / w,
+                hh + hh * (r1[0]*x + r1[1]*y + r1[2]*z + r1[3]) / w,
+                )))
+        return l
+
+    def project(self, points, key=None, version=None):
+        '''
+        returns list of 2D region coordinates (None for points behind the view).
+        points can be any iterable; on a cache hit it is not consumed
+        '''
+        if key is None or version is None: return self.project_batch(list(points))
+        entry = self.entries.get(key)
+        if entry and entry[0] == version: return entry[1]
+        points2d = self.project_batch(list(points))
+        self.entries[key] = (version, points2d)
+        return points2d
+
+projection_cache = ProjectionCache()
+
+def project_3dpoints(context, points_3d, key=None, version=None):
+    '''
+    projects 3D points to region of context, using the shared projection cache
+    '''
+    projection_cache.update_view(context.region, context.space_data.region_3d)
+    return projection_cache.project(points_3d, key=key, version=version)
 
 
 
@@ -70,15 +143,16 @@ def draw_points(context, points, color, size):
     return
 
 
-def draw_3d_points(context, points, color, size):
+def draw_3d_points(context, points, color, size, key=None, version=None):
     '''
     draw a bunch of dots
     args:
         points: a list of tuples representing x,y SCREEN coordinate eg [(10,30),(11,31),...]
         color: tuple (r,g,b,a)
         size: integer? maybe a float
+        key, version: see ProjectionCache
     '''
-    points_2d = [location_3d_to_region_2d(context.region, context.space_data.region_3d, loc) for loc in points]
+    points_2d = project_3dpoints(context, points, key=key, version=version)
 
     bgl.glColor4f(*color)
     bgl.glPointSize(size)
@@ -102,15 +176,16 @@ def draw_circle(context, c,n,r,col,step=10):
     p3d = [c+x*math.cos(i*d2r)+y*math.sin(i*d2r) for i in range(0,360+step,step)]
     draw_polyline_from_3dpoints(context, p3d, col, 1, "GL_LINE_SMOOTH")
 
-def draw_3d_points(context, points, color, size):
+def draw_3d_points(context, points, color, size, key=None, version=None):
     '''
     draw a bunch of dots
     args:
         points: a list of tuples representing x,y SCREEN coordinate eg [(10,30),(11,31),...]
         color: tuple (r,g,b,a)
         size: integer? maybe a float
+        key, version: see ProjectionCache
     '''
-    points_2d = [location_3d_to_region_2d(context.region, context.space_data.region_3d, loc) for loc in points]
+    points_2d = project_3dpoints(context, points, key=key, version=version)
 
     bgl.glColor4f(*color)
     bgl.glPointSize(size)
@@ -157,7 +232,7 @@ def draw_polyline_from_points(context, points, color, thickness, LINE_TYPE):
       
     return
 
-def draw_polyline_from_3dpoints(context, points_3d, color, thickness, LINE_TYPE):
+def draw_polyline_from_3dpoints(context, points_3d, color, thickness, LINE_TYPE, key=None, version=None):
     '''
     a simple way to draw a line
     slow...becuase it must convert to screen every time
@@ -168,9 +243,10 @@ def draw_polyline_from_3dpoints(context, points_3d, color, thickness, LINE_TYPE)
         color: tuple (r,g,b,a)
         thickness: integer? maybe a float
         LINE_TYPE:  eg...bgl.GL_LINE_STIPPLE or 
+        key, version: see ProjectionCache
     '''
     
-    points = [location_3d_to_region_2d(context.region, context.space_data.region_3d, loc) for loc in points_3d]
+    points = project_3dpoints(context, points_3d, key=key, version=version)
     
     if LINE_TYPE == "GL_LINE_STIPPLE":  
         bgl.glLineStipple(4, 0x5555)  #play with this later
@@ -192,7 +268,7 @@ def draw_polyline_from_3dpoints(context, points_3d, color, thickness, LINE_TYPE)
         bgl.glLineWidth(1)
     return
 
-def draw_quads_from_3dpoints(context, points_3d, color):
+def draw_quads_from_3dpoints(context, points_3d, color, key=None, version=None):
     '''
     a simple way to draw a set of quads
     slow...becuase it must convert to screen every time
@@ -201,9 +277,10 @@ def draw_quads_from_3dpoints(context, points_3d, color):
     args:
         points_3d: a list of tuples as x,y,z
         color: tuple (r,g,b,a)
+        key, version: see ProjectionCache
     '''
     
-    points = [location_3d_to_region_2d(context.region, context.space_data.region_3d, loc) for loc in points_3d]
+    points = project_3dpoints(context, points_3d, key=key, version=version)
     
     bgl.glEnable(bgl.GL_BLEND)
     bgl.glColor4f(*color)
@@ -281,9 +358,9 @@ def round_box(minx, miny, maxx, maxy, rad, corners = [True, True, True, True]):
     
     
     return verts
-def draw_bmedge(context, bmedge, mx, thickness, color):
+def draw_bmedge(context, bmedge, mx, thickness, color, key=None, version=None):
     '''
     simple wrapper to drawp a bmedge
     '''
     points = [mx * bmedge.verts[0].co, mx*bmedge.verts[1].co]
-    draw_polyline_from_3dpoints(context, points, color, thickness, 'GL_LINE_SMOOTH')
+    draw_polyline_from_3dpoints(context, points, color, thickness, 'GL_LINE_SMOOTH', key=key, version=version)
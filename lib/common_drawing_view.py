@@ -7,7 +7,98 @@ import bpy
 import bgl
 import blf
 
-def draw3d_polyline(context, points, color, thickness, LINE_TYPE):
+
+class DrawBatch():
+    '''
+    DrawBatch collects primitives over a frame, grouped by style (color, line width or point
+    size, stipple).  flush() draws each style bucket with one glBegin/glEnd, ordered so GL
+    state changes only between buckets.  Unstippled polylines are stored as line segments so
+    that all polylines of a style go in one glBegin/glEnd.  Stippled polylines are kept whole
+    and drawn as separate line strips, so the stipple pattern runs along each polyline instead
+    of restarting at every segment.
+
+    Callers opt in by passing a batch to the draw3d_* functions, then calling flush().
+    Primitives are drawn with the same depth ranges and GL state as the unbatched functions,
+    but fills are drawn before lines and lines before points.
+    '''
+
+    def __init__(self):
+        self.buckets = {}
+
+    def add(self, kind, style, coords):
+        self.buckets.setdefault((kind,) + style, []).extend(coords)
+
+    def add_lines(self, lpoints, color, thickness, LINE_TYPE, closed=False):
+        stipple = LINE_TYPE == "GL_LINE_STIPPLE"
+        coords = []
+        for points in lpoints:
+            points = list(points)
+            if closed and points: points.append(points[0])
+            if stipple:
+                coords.append(points)
+                continue
+            for p0,p1 in zip(points[:-1], points[1:]):
+                coords += [p0, p1]
+        self.add('strips' if stipple else 'lines', (stipple, thickness, tuple(color)), coords)
+
+    def add_quads(self, lpoints, color):
+        coords = []
+        for points in lpoints:
+            points = list(points)
+            # GL_QUADS ignores leftover verts of an unbatched call; drop them so they do not shift other quads
+            coords += points[:len(points) - len(points) % 4]
+        self.add('quads', (tuple(color),), coords)
+
+    def flush(self, context):
+        if not self.buckets: return
+        ortho = context.space_data.region_3d.view_perspective == 'ORTHO'
+        bgl.glEnable(bgl.GL_BLEND)
+        state = None
+        for kind,mode in [('quads',bgl.GL_QUADS), ('lines',bgl.GL_LINES), ('strips',bgl.GL_LINE_STRIP), ('points',bgl.GL_POINTS)]:
+            keys = sorted(k for k in self.buckets if k[0] == kind)
+            if not keys: continue
+            if kind == 'quads':
+                bgl.glDepthRange(0.0, 0.9999 if ortho else 0.999)
+            else:
+                bgl.glDepthRange(0.0, 0.9997 if ortho else 0.997)
+            if kind == 'points': state = None
+            for key in keys:
+                if kind in {'lines','strips'}:
+                    _,stipple,thickness,color = key
+                    if not state or state[0] != stipple:
+                        if stipple:
+                            bgl.glLineStipple(4, 0x5555)
+                            bgl.glEnable(bgl.GL_LINE_STIPPLE)
+                        else:
+                            bgl.glDisable(bgl.GL_LINE_STIPPLE)
+                    if not state or state[1] != thickness: bgl.glLineWidth(thickness)
+                    state = (stipple, thickness)
+                elif kind == 'points':
+                    _,size,color = key
+                    if state != size: bgl.glPointSize(size)
+                    state = size
+                else:
+                    _,color = key
+                bgl.glColor4f(*color)
+                if kind == 'strips':
+                    for points in self.buckets[key]:
+                        bgl.glBegin(mode)
+                        for coord in points: bgl.glVertex3f(*coord)
+                        bgl.glEnd()
+                    continue
+                bgl.glBegin(mode)
+                for coord in self.buckets[key]: bgl.glVertex3f(*coord)
+                bgl.glEnd()
+        bgl.glDisable(bgl.GL_LINE_STIPPLE)
+        bgl.glLineWidth(1)
+        bgl.glPointSize(1.0)
+        self.buckets = {}
+
+
+def draw3d_polyline(context, points, color, thickness, LINE_TYPE, batch=None):
+    if batch:
+        batch.add_lines([points], color, thickness, LINE_TYPE)
+        return
     if context.region_data.view_perspective == 'ORTHO':
         bias = 0.9997
     else:
@@ -28,7 +119,10 @@ def draw3d_polyline(context, points, color, thickness, LINE_TYPE):
         bgl.glDisable(bgl.GL_LINE_STIPPLE)
         bgl.glEnable(bgl.GL_BLEND)  # back to uninterrupted lines  
 
-def draw3d_closed_polylines(context, lpoints, color, thickness, LINE_TYPE):
+def draw3d_closed_polylines(context, lpoints, color, thickness, LINE_TYPE, batch=None):
+    if batch:
+        batch.add_lines(lpoints, color, thickness, LINE_TYPE, closed=True)
+        return
     if context.space_data.region_3d.view_perspective == 'ORTHO':
         bias = 0.9997
     else:
@@ -51,7 +145,7 @@ def draw3d_closed_polylines(context, lpoints, color, thickness, LINE_TYPE):
         bgl.glDisable(bgl.GL_LINE_STIPPLE)
         bgl.glEnable(bgl.GL_BLEND)  # back to uninterrupted lines
 
-def draw3d_arrow(context, pfrom, pto, normal, color, thickness, LINE_TYPE):
+def draw3d_arrow(context, pfrom, pto, normal, color, thickness, LINE_TYPE, batch=None):
     pdiff = pto - pfrom
     l = pdiff.length
     hd = l * 0.10
@@ -61,6 +155,10 @@ def draw3d_arrow(context, pfrom, pto, normal, color, thickness, LINE_TYPE):
     pto0 = pto - pdir * hd + portho * hw
     pto1 = pto - pdir * hd - portho * hw
     
+    if batch:
+        batch.add_lines([[pfrom, pto], [pto0, pto], [pto1, pto]], color, thickness, LINE_TYPE)
+        return
+    
     if context.space_data.region_3d.view_perspective == 'ORTHO':
         bias = 0.9997
     else:
@@ -84,7 +182,10 @@ def draw3d_arrow(context, pfrom, pto, normal, color, thickness, LINE_TYPE):
     if LINE_TYPE == "GL_LINE_STIPPLE":
         bgl.glDisable(bgl.GL_LINE_STIPPLE)
 
-def draw3d_quad(context, points, color):
+def draw3d_quad(context, points, color, batch=None):
+    if batch:
+        batch.add_quads([points], color)
+        return
     if context.space_data.region_3d.view_perspective == 'ORTHO':
         bias = 0.9999
     else:
@@ -96,7 +197,10 @@ def draw3d_quad(context, points, color):
     for coord in points: bgl.glVertex3f(*coord)
     bgl.glEnd()
     
-def draw3d_quads(context, lpoints, color):
+def draw3d_quads(context, lpoints, color, batch=None):
+    if batch:
+        batch.add_quads(lpoints, color)
+        return
     if context.space_data.region_3d.view_perspective == 'ORTHO':
         bias = 0.9999
     else:
@@ -110,7 +214,10 @@ def draw3d_quads(context, lpoints, color):
             bgl.glVertex3f(*coord)
     bgl.glEnd()
     
-def draw3d_points(context, points, color, size):
+def draw3d_points(context, points, color, size, batch=None):
+    if batch:
+        batch.add('points', (size, tuple(color)), points)
+        return
     if context.space_data.region_3d.view_perspective == 'ORTHO':
         bias = 0.9997
     else:
@@ -22,9 +22,19 @@ Created by Jonathan Denning, Jonathan Williamson, and Patrick Moore
 import bgl
 import bpy
 import re
+import hashlib
+
+
+# compiled shaders and linked programs, keyed by hash of their sources.  shared by all
+# Shader instances, so identical sources are only compiled and linked once per session
+shader_registry = {}
+
+def source_key(*sources):
+    return hashlib.sha1('\0'.join(sources).encode('utf-8')).hexdigest()
 
 
 class Shader():
+    
     @staticmethod
     def shader_compile(shader):
         '''
@@ -40,45 +50,65 @@ class Shader():
         log = ''.join(chr(v) for v in bufLog.to_list() if v)
         return log
     
-    def __init__(self, srcVertex, srcFragment, funcStart=None):
-        self.shaderProg = bgl.glCreateProgram()
-        self.shaderVert = bgl.glCreateShader(bgl.GL_VERTEX_SHADER)
-        self.shaderFrag = bgl.glCreateShader(bgl.GL_FRAGMENT_SHADER)
-        
-        bgl.glShaderSource(self.shaderVert, srcVertex)
-        bgl.glShaderSource(self.shaderFrag, srcFragment)
-        
-        print('RetopoFlow Shader Info')
-        logv = self.shader_compile(self.shaderVert)
-        logf = self.shader_compile(self.shaderFrag)
-        
-        if len(logv.strip()):
-            print('  vert log:\n' + '\n'.join(('    '+l) for l in logv.splitlines()))
-        if len(logf.strip()):
-            print('  frag log:\n' + '\n'.join(('    '+l) for l in logf.splitlines()))
-        
-        bgl.glAttachShader(self.shaderProg, self.shaderVert)
-        bgl.glAttachShader(self.shaderProg, self.shaderFrag)
-        
-        bgl.glLinkProgram(self.shaderProg)
-        
-        self.shaderVars = {}
+    @staticmethod
+    def get_shader(shaderType, src):
+        key = source_key(str(shaderType), src)
+        if key not in shader_registry:
+            shader = bgl.glCreateShader(shaderType)
+            bgl.glShaderSource(shader, src)
+            log = Shader.shader_compile(shader)
+            if len(log.strip()):
+                name = 'vert' if shaderType == bgl.GL_VERTEX_SHADER else 'frag'
+                print('  %s log:\n' % name + '\n'.join(('    '+l) for l in log.splitlines()))
+            shader_registry[key] = shader
+        return shader_registry[key]
+    
+    @staticmethod
+    def parse_vars(srcVertex, srcFragment):
+        '''
+        returns list of (qualifier, type, name) of attributes and uniforms
+        '''
         lvars = [l for l in srcVertex.splitlines() if l.startswith('in ')]
         lvars += [l for l in srcVertex.splitlines() if l.startswith('attribute ')]
         lvars += [l for l in srcVertex.splitlines() if l.startswith('uniform ')]
         lvars += [l for l in srcFragment.splitlines() if l.startswith('uniform ')]
+        parsed = []
         for l in lvars:
             m = re.match('^(?P<qualifier>[^ ]+) +(?P<type>[^ ]+) +(?P<name>[^ ;]+)', l)
             assert m
             m = m.groupdict()
-            q,t,n = m['qualifier'],m['type'],m['name']
-            locate = bgl.glGetAttribLocation if q in {'in','attribute'} else bgl.glGetUniformLocation
-            if n in self.shaderVars: continue
-            self.shaderVars[n] = {
-                'qualifier': q,
-                'type': t,
-                'location': locate(self.shaderProg, n),
-                }
+            parsed.append((m['qualifier'], m['type'], m['name']))
+        return parsed
+    
+    def __init__(self, srcVertex, srcFragment, funcStart=None):
+        key = source_key(srcVertex, srcFragment)
+        
+        print('RetopoFlow Shader Info')
+        if key not in shader_registry:
+            shaderVert = self.get_shader(bgl.GL_VERTEX_SHADER, srcVertex)
+            shaderFrag = self.get_shader(bgl.GL_FRAGMENT_SHADER, srcFragment)
+            
+            shaderProg = bgl.glCreateProgram()
+            bgl.glAttachShader(shaderProg, shaderVert)
+            bgl.glAttachShader(shaderProg, shaderFrag)
+            bgl.glLinkProgram(shaderProg)
+            
+            shaderVars = {}
+            for q,t,n in self.parse_vars(srcVertex, srcFragment):
+                locate = bgl.glGetAttribLocation if q in {'in','attribute'} else bgl.glGetUniformLocation
+                if n in shaderVars: continue
+                shaderVars[n] = {
+                    'qualifier': q,
+                    'type': t,
+                    'location': locate(shaderProg, n),
+                    }
+            # setters are shared by all instances of program, as they track its uniform values
+            shaderSetters = {n:self.create_setter(shaderVars, n) for n in shaderVars}
+            shader_registry[key] = (shaderProg, shaderVert, shaderFrag, shaderVars, shaderSetters)
+        else:
+            print('  reusing compiled program')
+        
+        self.shaderProg,self.shaderVert,self.shaderFrag,self.shaderVars,self.setters = shader_registry[key]
         
         print('  attribs: ' + ', '.join(k for k in self.shaderVars if self.shaderVars[k]['qualifier'] in {'in','attribute'}))
         print('  uniforms: ' + ', '.join(k for k in self.shaderVars if self.shaderVars[k]['qualifier'] in {'uniform'}))
@@ -87,25 +117,40 @@ class Shader():
     
     # https://www.opengl.org/sdk/docs/man/html/glVertexAttrib.xhtml
     # https://www.khronos.org/opengles/sdk/docs/man/xhtml/glUniform.xml
-    def assign(self, varName, varValue):
-        assert varName in self.shaderVars, 'Variable %s not found' % varName
-        v = self.shaderVars[varName]
+    @staticmethod
+    def create_setter(shaderVars, varName):
+        '''
+        returns callable that sets variable.  uniforms are part of program state, so setting
+        a uniform to the value it already has is skipped
+        '''
+        v = shaderVars[varName]
         q,l,t = v['qualifier'],v['location'],v['type']
-        # print(varName + '=' + str(varValue))
         if q in {'in','attribute'}:
             if t == 'float':
-                bgl.glVertexAttrib1f(l, varValue)
-            else:
-                assert False, 'Unhandled type %s for attrib %s' % (t, varName)
-        elif q in {'uniform'}:
+                return lambda varValue: bgl.glVertexAttrib1f(l, varValue)
+            def unhandled(varValue): assert False, 'Unhandled type %s for attrib %s' % (t, varName)
+            return unhandled
+        if q in {'uniform'}:
             if t == 'float':
-                bgl.glUniform1f(l, varValue)
+                fn,conv = bgl.glUniform1f,float
             elif t == 'bool':
-                bgl.glUniform1i(l, 1 if varValue else 0)
+                fn,conv = bgl.glUniform1i,lambda varValue: 1 if varValue else 0
             else:
-                assert False, 'Unhandled type %s for uniform %s' % (t, varName)
-        else:
-            assert False, 'Unhandled qualifier %s for variable %s' % (q, varName)
+                def unhandled(varValue): assert False, 'Unhandled type %s for uniform %s' % (t, varName)
+                return unhandled
+            last = [None]
+            def set_uniform(varValue):
+                varValue = conv(varValue)
+                if last[0] == varValue: return
+                last[0] = varValue
+                fn(l, varValue)
+            return set_uniform
+        def unhandled(varValue): assert False, 'Unhandled qualifier %s for variable %s' % (q, varName)
+        return unhandled
+    
+    def assign(self, varName, varValue):
+        assert varName in self.setters, 'Variable %s not found' % varName
+        self.setters[varName](varValue)
     
     def useFor(self,funcCallback):
         try:
@@ -115,7 +160,7 @@ class Shader():
         except Exception as e:
             print('ERROR WITH USING SHADER: ' + str(e))
         finally:
-            bgl.glUseProgram(0)
+            self.disable()
     
     def enable(self):
         try:
@@ -123,9 +168,8 @@ class Shader():
             if self.funcStart: self.funcStart(self)
         except Exception as e:
             print('Error with using shader: ' + str(e))
-            bgl.glUseProgram(0)
+            self.disable()
     
     def disable(self):
         bgl.glUseProgram(0)
 
-
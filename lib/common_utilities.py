@@ -29,10 +29,15 @@ import os
 import sys
 import inspect
 import math
+import bisect
 import time
 import itertools
 import linecache
 import traceback
+try:
+    import numpy
+except ImportError:
+    numpy = None
 from mathutils import Vector, Matrix, Quaternion
 from mathutils.geometry import intersect_point_line, intersect_line_plane
 from mathutils.geometry import distance_point_to_plane, intersect_line_line_2d, intersect_line_line
@@ -319,6 +324,111 @@ def matrix_normal(mat):
     return d[smat]
 
 
+def region_2d_to_rays_3d(region, rv3d, screen_coords):
+    '''
+    batched version of region_2d_to_origin_3d and region_2d_to_vector_3d.
+    view matrices are inverted once for all coords.
+    returns (origins, directions), each a list of (x,y,z) tuples in world space
+    '''
+    if not screen_coords: return ([], [])
+    w,h = region.width, region.height
+    viewinv = rv3d.view_matrix.inverted()
+    persinv = rv3d.perspective_matrix.inverted()
+    is_persp = rv3d.is_perspective
+    clip_off = rv3d.view_perspective != 'CAMERA'
+    
+    if numpy:
+        pts = numpy.array([(x,y) for x,y in screen_coords], dtype=numpy.float64)
+        ndc = numpy.empty((len(pts), 4))
+        ndc[:,0] = 2.0 * pts[:,0] / w - 1.0
+        ndc[:,1] = 2.0 * pts[:,1] / h - 1.0
+        ndc[:,2] = -0.5
+        ndc[:,3] = 1.0
+        M = numpy.array(persinv)
+        if is_persp:
+            eye = numpy.array(viewinv.translation)
+            P = ndc.dot(M.T)
+            vecs = P[:,:3] / P[:,3:4] - eye
+            vecs /= numpy.sqrt((vecs*vecs).sum(axis=1))[:,None]
+            origs = numpy.tile(eye, (len(vecs),1))
+        else:
+            origs = ndc[:,0:1]*M[:3,0] + ndc[:,1:2]*M[:3,1] + M[:3,3]
+            if clip_off: origs = origs - M[:3,2]
+            vec = numpy.array(-viewinv.col[2].xyz.normalized())
+            vecs = numpy.tile(vec, (len(origs),1))
+        return (list(map(tuple, origs.tolist())), list(map(tuple, vecs.tolist())))
+    
+    if is_persp:
+        eye = viewinv.translation.copy()
+        persinv_w = persinv[3].xyz
+        persinv_ww = persinv[3][3]
+        origs,vecs = [],[]
+        for x,y in screen_coords:
+            out = Vector((2.0*x/w - 1.0, 2.0*y/h - 1.0, -0.5))
+            vec = ((persinv * out) / (out.dot(persinv_w) + persinv_ww)) - eye
+            vec.normalize()
+            origs.append(eye[:])
+            vecs.append(vec[:])
+        return (origs, vecs)
+    
+    c0,c1,t = persinv.col[0].xyz, persinv.col[1].xyz, persinv.translation
+    if clip_off: t = t - persinv.col[2].xyz
+    vec = (-viewinv.col[2].xyz.normalized())[:]
+    origs = [(c0*(2.0*x/w - 1.0) + c1*(2.0*y/h - 1.0) + t)[:] for x,y in screen_coords]
+    return (origs, [vec]*len(origs))
+
+def ray_cast_screen_many_bvh(region, rv3d, screen_coords, bvh, mx, back=100, flip_ortho=False):
+    '''
+    casts a ray through each screen coord into bvh (local space of mx).
+    rays start back units behind the view origin when view is orthographic.
+    returns list with (world_coord, world_normal, face_index) for each hit or None for each miss
+    '''
+    origs,vecs = region_2d_to_rays_3d(region, rv3d, screen_coords)
+    if not origs: return []
+    imx,nmx = invert_matrix(mx), matrix_normal(mx)
+    back = 0 if rv3d.is_perspective else back
+    sign = -1 if (flip_ortho and not rv3d.is_perspective) else 1
+    
+    if numpy:
+        # transform rays to local space in bulk
+        M = numpy.array(imx)
+        O = numpy.array(origs) - (sign * back) * numpy.array(vecs)
+        D = numpy.array(vecs).dot(M[:3,:3].T) * sign
+        O = O.dot(M[:3,:3].T) + M[:3,3]
+        rays = zip(O.tolist(), D.tolist())
+    else:
+        imx3x3 = imx.to_3x3()
+        rays = ((imx * (Vector(o) - (sign*back)*Vector(d)), imx3x3 * Vector(d) * sign) for o,d in zip(origs,vecs))
+    
+    ray_cast = bvh.ray_cast
+    hits = []
+    for o,d in rays:
+        p,n,i,_ = ray_cast(o, d)
+        hits.append(None if i is None else (mx*p, nmx*n, i))
+    return hits
+
+def find_nearest_many_bvh(bvh, mx, coords):
+    '''
+    finds nearest point in bvh (local space of mx) to each world coord.
+    returns list with (world_coord, world_normal, face_index) for each found point or None
+    '''
+    if not coords: return []
+    imx,nmx = invert_matrix(mx), matrix_normal(mx)
+    
+    if numpy:
+        # transform coords to local space in bulk
+        M = numpy.array(imx)
+        lcos = (numpy.array([tuple(co) for co in coords]).dot(M[:3,:3].T) + M[:3,3]).tolist()
+    else:
+        lcos = [imx * Vector(co) for co in coords]
+    
+    find_nearest = bvh.find_nearest
+    nearest = []
+    for co in lcos:
+        p,n,i,_ = find_nearest(co)
+        nearest.append(None if p is None else (mx*p, nmx*n, i))
+    return nearest
+
 def ray_cast_region2d_bvh(region, rv3d, screen_coord, bvh, mx, settings):
     '''
     performs ray casting on object given region, rv3d, and coords wrt region.
@@ -375,28 +485,18 @@ def ray_cast_path_bvh(context, bvh, mx, screen_coords, trim = False):
     '''
     rgn  = context.region
     rv3d = context.space_data.region_3d
-    imx = invert_matrix(mx)
-    r2d_origin = region_2d_to_origin_3d
-    r2d_vector = region_2d_to_vector_3d
-    
-    rays = [(r2d_origin(rgn, rv3d, co),r2d_vector(rgn, rv3d, co).normalized()) for co in screen_coords]
-    back = 0 if rv3d.is_perspective else 1
-    mult = 100 #* (1 if rv3d.is_perspective else -1)
-    bver = '%03d.%03d.%03d' % (bpy.app.version[0],bpy.app.version[1],bpy.app.version[2])
-    if (bver < '002.072.000') and not rv3d.is_perspective: mult *= -1
-    
-    sten = [(imx*(o-back*mult*d), imx*(o+mult*d)) for o,d in rays]
-    hits = [bvh.ray_cast(st,(en-st)) for st,en in sten]
+    flip = bversion() < '002.072.000'
+    hits = ray_cast_screen_many_bvh(rgn, rv3d, screen_coords, bvh, mx, flip_ortho=flip)
     
     if trim:  #will return list up to the first missed ray cast
         world_coords = []
         for hit in hits:
-            if hit[2] != None:
-                world_coords += [mx*hit[0]]
+            if hit:
+                world_coords += [hit[0]]
             else:
                 break
     else:
-        world_coords = [mx*hit[0] for hit in hits if hit[2] != None]
+        world_coords = [hit[0] for hit in hits if hit]
     
     return world_coords
 
@@ -458,21 +558,9 @@ def ray_cast_stroke_bvh(context, bvh, mx, stroke):
     '''
     rgn  = context.region
     rv3d = context.space_data.region_3d
-    imx = invert_matrix(mx)
-    
-    r2d_origin = region_2d_to_origin_3d
-    r2d_vector = region_2d_to_vector_3d
-    
-    rays = [(r2d_origin(rgn, rv3d, co),r2d_vector(rgn, rv3d, co).normalized()) for co,_ in stroke]
-    
-    back = 0 if rv3d.is_perspective else 1
-    mult = 100 #* (1 if rv3d.is_perspective else -1)
-
-    if (bversion() < '002.072.000') and not rv3d.is_perspective: mult *= -1
-    
-    sten = [(imx*(o-back*mult*d), imx*(o+mult*d)) for o,d in rays]
-    hits = [bvh.ray_cast(st,(en-st)) for st,en in sten]
-    world_stroke = [(mx*hit[0],stroke[i][1])  for i,hit in enumerate(hits) if hit[2] != None]
+    flip = bversion() < '002.072.000'
+    hits = ray_cast_screen_many_bvh(rgn, rv3d, [co for co,_ in stroke], bvh, mx, flip_ortho=flip)
+    world_stroke = [(hit[0],stroke[i][1])  for i,hit in enumerate(hits) if hit]
     
     return world_stroke
 
@@ -487,22 +575,9 @@ def raycast_stroke_bvh_norm(context, bvh, mx, stroke):
     '''
     rgn  = context.region
     rv3d = context.space_data.region_3d
-    imx = invert_matrix(mx)
-    timx = imx.transposed()
-    
-    r2d_origin = region_2d_to_origin_3d
-    r2d_vector = region_2d_to_vector_3d
-    
-    rays = [(r2d_origin(rgn, rv3d, co),r2d_vector(rgn, rv3d, co).normalized()) for co,_ in stroke]
-    
-    back = 0 if rv3d.is_perspective else 1
-    mult = 100 #* (1 if rv3d.is_perspective else -1)
-
-    if (bversion() < '002.072.000') and not rv3d.is_perspective: mult *= -1
-    
-    sten = [(imx*(o-back*mult*d), imx*(o+mult*d)) for o,d in rays]
-    hits = [bvh.ray_cast(st,(en-st)) for st,en in sten]
-    world_stroke = [(mx*hit[0],(timx*vec3_to_vec4(hit[1])).to_3d(),stroke[i][1])  for i,hit in enumerate(hits) if hit[2] != None]
+    flip = bversion() < '002.072.000'
+    hits = ray_cast_screen_many_bvh(rgn, rv3d, [co for co,_ in stroke], bvh, mx, flip_ortho=flip)
+    world_stroke = [(hit[0],hit[1],stroke[i][1])  for i,hit in enumerate(hits) if hit]
     
     return world_stroke
 
@@ -729,6 +804,12 @@ def space_evenly_on_path(verts, edges, segments, shift = 0, debug = False):  #pr
                 
     return
         new_verts - list of new Vert Locations type list[Mathutils.Vector]
+        new_eds - list of index pairs connecting new_verts
+    
+    cumulative lengths are built once as a prefix sum, and each new vert is found by
+    bisecting it, so cost is O(nverts + segments * log(nverts)).  there is no NumPy path:
+    converting the Vectors to an array costs more than the whole resample
+    (see tools/benchmark_space_evenly.py)
     '''
     
     if len(verts) < 2:
@@ -749,83 +830,41 @@ def space_evenly_on_path(verts, edges, segments, shift = 0, debug = False):  #pr
         if shift != 0: #not PEP but it shows that we want shift = 0
             print('not shifting because this is not a cyclic vert chain')
             shift = 0
-   
-    #calc_length
-    arch_len = 0
-    cumulative_lengths = [0]#TODO, make this the right size and dont append
-    for i in range(0,len(verts)-1):
-        v0 = verts[i]
-        v1 = verts[i+1]
-        V = v1-v0
-        arch_len += V.length
-        cumulative_lengths.append(arch_len)
-        
-    if cyclic:
-        v0 = verts[-1]
-        v1 = verts[0]
-        V = v1-v0
-        arch_len += V.length
-        cumulative_lengths.append(arch_len)
-        #print(cumulative_lengths)
-    
-    #identify vert indicies of import
-    #this will be the largest vert which lies at
-    #no further than the desired fraction of the curve
-    
-    #initialze new vert array and seal the end points
+    
+    nverts = len(verts)
+    
+    #arc length at which each new vert lies, wrapped into [0,arch_len]
+    #cyclic chains get a new vert at the start of the loop (plus shift), while
+    #open chains keep their end points
     if cyclic:
-        new_verts = [[None]]*(segments)
-        #new_verts[0] = verts[0]
-            
+        fractions = [(i + shift) / segments for i in range(segments)]
     else:
-        new_verts = [[None]]*(segments + 1)
-        new_verts[0] = verts[0]
-        new_verts[-1] = verts[-1]
-    
-    
-    n = 0 #index to save some looping through the cumulative lengths list
-          #now we are leaving it 0 becase we may end up needing the beginning of the loop last
-          #and if we are subdividing, we may hit the same cumulative lenght several times.
-          #for now, use the slow and generic way, later developsomething smarter.
-    for i in range(0,segments- 1 + cyclic * 1):
-        desired_length_raw = (i + 1 + cyclic * -1)/segments * arch_len + shift * arch_len / segments
-        #print('the length we desire for the %i segment is %f compared to the total length which is %f' % (i, desired_length_raw, arch_len))
+        fractions = [(i + 1) / segments for i in range(segments - 1)]
+    
+    lengths = [(v1 - v0).length for v0,v1 in zip(verts[:-1], verts[1:])]
+    if cyclic: lengths.append((verts[0] - verts[-1]).length)
+    cumulative_lengths = [0] + list(itertools.accumulate(lengths))
+    arch_len = cumulative_lengths[-1]
+    pts = []
+    for f in fractions:
+        desired_length = f * arch_len
         #like a mod function, but for non integers?
-        if desired_length_raw > arch_len:
-            desired_length = desired_length_raw - arch_len       
-        elif desired_length_raw < 0:
-            desired_length = arch_len + desired_length_raw #this is the end, + a negative number
-        else:
-            desired_length = desired_length_raw
-
-        #find the original vert with the largets legnth
-        #not greater than the desired length
-        #I used to set n = J after each iteration
-        for j in range(n, len(verts)+1):
-
-            if cumulative_lengths[j] > desired_length:
-                #print('found a greater length at vert %i' % j)
-                #this was supposed to save us some iterations so that
-                #we don't have to start at the beginning each time....
-                #if j >= 1:
-                    #n = j - 1 #going one back allows us to space multiple verts on one edge
-                #else:
-                    #n = 0
-                break
-
+        if desired_length > arch_len: desired_length -= arch_len
+        elif desired_length < 0:      desired_length += arch_len
+        #index of first cumulative length greater than desired length
+        j = min(bisect.bisect_right(cumulative_lengths, desired_length), nverts)
         extra = desired_length - cumulative_lengths[j-1]
-        if j == len(verts):
-            new_verts[i + 1 + cyclic * -1] = verts[j-1] + extra * (verts[0]-verts[j-1]).normalized()
-        else:
-            new_verts[i + 1 + cyclic * -1] = verts[j-1] + extra * (verts[j]-verts[j-1]).normalized()
+        pts.append(verts[j-1] + extra * (verts[j % nverts] - verts[j-1]).normalized())
     
-    eds = []
+    if cyclic:
+        new_verts = pts
+    else:
+        new_verts = [verts[0]] + pts + [verts[-1]]
     
-    for i in range(0,len(new_verts)-1):
-        eds.append((i,i+1))
+    eds = [(i,i+1) for i in range(len(new_verts)-1)]
     if cyclic:
         #close the loop
-        eds.append((i+1,0))
+        eds.append((len(new_verts)-1,0))
     if debug:
         print(cumulative_lengths)
         print(arch_len)
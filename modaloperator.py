@@ -38,10 +38,17 @@ from . import key_maps
 from .lib import common_utilities
 from .lib.common_utilities import print_exception, showErrorMessage
 
+# events that never change what the tool draws
+events_noredraw = {'TIMER', 'TIMER0', 'TIMER1', 'TIMER2', 'TIMER_JOBS', 'TIMER_AUTOSAVE', 'TIMER_REPORT', 'TIMERREGION', 'NONE', 'WINDOW_DEACTIVATE'}
+
 class ModalOperator(Operator):
 
     initialized = False
     
+    # when False, mouse movement in the main state redraws only if an FSM handler reports
+    # a change by calling tag_redraw() (ex: the hovered element changed)
+    redraw_on_mousemove = True
+    
     def initialize(self, helpText=None, FSM=None):
         # create a log file for error writing
         if 'RetopoFlow_log' not in bpy.data.texts:
@@ -239,7 +246,9 @@ class ModalOperator(Operator):
             if eventd['type'] == 'MOUSEMOVE':  #mouse movement/hovering
                 #update brush and brush size
                 x,y = eventd['mouse']
+                was_hovered = self.help_box.is_hovered
                 self.help_box.hover(x,y)
+                if self.help_box.is_hovered != was_hovered: self.tag_redraw()
 
         # handle general waiting
         nmode = self.FSM['wait'](context, eventd)
@@ -265,6 +274,11 @@ class ModalOperator(Operator):
         self.footer = ''
         self.footer_last = ''
         
+        self.redraw_requested = True
+        self.redraw_pending   = False
+        self.redraw_last      = 0.0
+        self.redraw_timer     = None
+        
         try:
             self.start(context)
         except:
@@ -279,8 +293,45 @@ class ModalOperator(Operator):
             self.handle_exception()
         SpaceView3D.draw_handler_remove(self.cb_pv_handle, "WINDOW")
         SpaceView3D.draw_handler_remove(self.cb_pp_handle, "WINDOW")
+        self.remove_redraw_timer(context)
         context.area.header_text_set()
 
+    ####################################################################
+    # Redraw scheduling
+
+    def tag_redraw(self):
+        '''
+        FSM handlers call this to report that something drawn by the tool has changed
+        '''
+        self.redraw_requested = True
+
+    def remove_redraw_timer(self, context):
+        if self.redraw_timer:
+            context.window_manager.event_timer_remove(self.redraw_timer)
+            self.redraw_timer = None
+
+    def schedule_redraw(self, context):
+        '''
+        coalesces redraw requests so that the area is redrawn at most redraw_fps times per
+        second (preferences).  a deferred redraw is flushed by a timer, which is removed once
+        nothing is pending so that an idle tool does not keep waking up
+        '''
+        if self.redraw_requested:
+            self.redraw_requested = False
+            self.redraw_pending = True
+        if not self.redraw_pending:
+            self.remove_redraw_timer(context)
+            return
+        fps = self.settings.redraw_fps
+        interval = 1.0 / fps if fps > 0 else 0.0
+        curtime = time.time()
+        if curtime - self.redraw_last >= interval:
+            context.area.tag_redraw()
+            self.redraw_last = curtime
+            self.redraw_pending = False
+        elif not self.redraw_timer:
+            self.redraw_timer = context.window_manager.event_timer_add(interval, context.window)
+
     def modal(self, context, event):
         '''
         Called by Blender while our tool is running modal.
@@ -291,9 +342,8 @@ class ModalOperator(Operator):
 
         if not context.area: return {'RUNNING_MODAL'}
 
-        context.area.tag_redraw()       # force redraw
-
         eventd = self.get_event_details(context, event)
+        fsm_mode = self.fsm_mode
 
         self.cur_pos  = eventd['mouse']
         try:
@@ -305,6 +355,16 @@ class ModalOperator(Operator):
 
         if nmode == 'wait': nmode = 'main'
 
+        # redraw on state transitions, while in a tool state, on input other than mouse
+        # movement, and on anything the handlers report
+        if nmode or fsm_mode != 'main':
+            self.tag_redraw()
+        elif eventd['type'] in {'MOUSEMOVE', 'INBETWEEN_MOUSEMOVE'}:
+            if self.redraw_on_mousemove: self.tag_redraw()
+        elif eventd['type'] not in events_noredraw:
+            self.tag_redraw()
+        self.schedule_redraw(context)
+
         self.is_navigating = (nmode == 'nav')
         if nmode == 'nav':
             return {'PASS_THROUGH'}     # pass events (mouse,keyboard,etc.) on to region
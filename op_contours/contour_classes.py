@@ -23,6 +23,7 @@ Created by Patrick Moore
 import copy
 import math
 import time
+import itertools
 from mathutils import Vector, Quaternion
 from mathutils.geometry import intersect_point_line, intersect_line_plane
 from mathutils.bvhtree import BVHTree
@@ -40,10 +41,15 @@ from ..lib import common_utilities, common_drawing_px, common_drawing_view
 from ..lib.common_utilities import get_source_object, get_target_object, setup_target_object, showErrorMessage
 from ..lib.common_utilities import bversion, simple_circle
 from ..lib.common_mesh import edge_loops_from_bmedges
+from ..lib.classes.undosnapshot.undosnapshot import UndoSnapshots, undo_touch
+from ..lib.classes.viewfrustum.viewfrustum import view_frustum, points_bbox, bbox_union
 from ..cache import mesh_cache, contour_undo_cache, object_validation, is_object_valid, write_mesh_cache, clear_mesh_cache
 
 #from development.cgc-retopology import contour_utilities
 
+# versions of cut series geometry, for the projection cache of common_drawing_px
+draw_versions = itertools.count(1)
+
 class Contours(object):
     def __init__(self,context, settings):
         self.settings = settings
@@ -56,6 +62,10 @@ class Contours(object):
         self.cut_paths = []
         self.sketch = []
         
+        # undo snapshots share unchanged cut series, cut lines and geometry between levels.
+        # cut series are undo units, so every edit to a series must call its changed()
+        self.undo_snapshots = UndoSnapshots((ContourCutSeries, ContourCutLine, ContourControlPoint, ExistingVertList))
+        
         self.mode = 'loop'
         self.hover_target = None
         self.sel_loop = None
@@ -260,9 +270,9 @@ class Contours(object):
                 return
         
         print('undo: ' + action)    
-        cut_data = copy.deepcopy(self.cut_paths)
-        #perhaps I don't even need to copy this?
-        state = copy.deepcopy(ContourStatePreserver(self))
+        cut_data = self.undo_snapshots.take(self.cut_paths)
+        #state only holds mode and indices, no need to copy it
+        state = ContourStatePreserver(self)
         contour_undo_cache.append((cut_data, state, action))
             
         if len(contour_undo_cache) > self.settings.undo_depth:
@@ -272,8 +282,16 @@ class Contours(object):
         if len(contour_undo_cache) > 0:
             cut_data, op_state, action = contour_undo_cache.pop()
             
-            self.cut_paths = cut_data
+            self.cut_paths = self.undo_snapshots.restore(cut_data)
             op_state.push_state(self)
+            
+            #selection is not part of snapshots, so reapply it
+            if self.sel_path:
+                self.sel_path.do_select(self.settings)
+                if self.mode == 'loop':
+                    self.sel_path.unhighlight(self.settings)
+            if self.sel_loop:
+                self.sel_loop.do_select(self.settings)
         
     def new_path_from_draw(self,context,settings):
         '''
@@ -302,6 +320,7 @@ class Contours(object):
             merge_ring = self.snap[1]
             
             path.snap_merge_into_other(merge_series, merge_ring, context, mesh_cache['bme'], mesh_cache['bvh'], self.mx)
+            merge_series.changed()
             
             return merge_series
 
@@ -409,6 +428,7 @@ class Contours(object):
                 for path in self.cut_paths:
                     if path.insert_new_cut(context, mesh_cache['bme'], mesh_cache['bvh'], self.mx, self.sel_loop, search = settings.search_factor):
                         #the cut belongs to the series now
+                        path.changed()
                         path.connect_cuts_to_make_mesh(mesh_cache['bvh'], self.mx)
                         path.seg_lock = True
                         path.do_select(settings)
@@ -638,6 +658,7 @@ class Contours(object):
     
     def segment_shift(self,context, up = True, s = 0.05):
         self.create_undo_snapshot('PATH_SHIFT')     
+        self.sel_path.changed()
         for cut in self.sel_path.cuts:
             cut.shift += (-1 + 2 * up) * s
             cut.simplify_cross(self.sel_path.ring_segments)
@@ -649,6 +670,7 @@ class Contours(object):
         if n < 3: return
         if not path.seg_lock:
             self.create_undo_snapshot('PATH_SEGMENTS')
+            path.changed()
             path.segments = n
             path.create_cut_nodes(context)
             path.snap_to_object(mesh_cache['bvh'], self.mx, raw = False, world = False, cuts = True)
@@ -661,6 +683,7 @@ class Contours(object):
         if method not in {'PATH_NORMAL','CENTER_MASS','ENDPOINT'}: return
         
         self.create_undo_snapshot('SMOOTH')
+        self.sel_path.changed()
         if method == 'PATH_NORMAL':
             #path.smooth_normals
             self.sel_path.average_normals(context, mesh_cache['bme'], mesh_cache['bvh'], self.mx)
@@ -734,6 +757,7 @@ class Contours(object):
         
         for path in self.cut_paths:
             if self.sel_loop in path.cuts:
+                path.changed()
                 path.connect_cuts_to_make_mesh(mesh_cache['bvh'], self.mx)
                 path.update_backbone(context, mesh_cache['bme'], mesh_cache['bvh'], self.mx, self.sel_loop, insert = False)
         
@@ -747,6 +771,7 @@ class Contours(object):
         for path in self.cut_paths:
             if self.sel_loop in path.cuts:
                 if not path.ring_lock:
+                    path.changed()
                     old_segments = path.ring_segments
                     path.ring_segments = n
                         
@@ -778,6 +803,7 @@ class Contours(object):
         #act = 'FORWARD'
         #act = 'BACKWARD'
             
+        self.sel_path.changed()
         self.sel_path.align_cut(self.sel_loop, mode = act, fine_grain = True)
         self.sel_loop.simplify_cross(self.sel_path.ring_segments)
         
@@ -800,6 +826,7 @@ class Contours(object):
             for path in self.cut_paths:
                 if loop in path.cuts:
                     if len(path.cuts) > 1 or len(path.cuts) == 1 and path.existing_head:
+                        path.changed()
                         path.remove_cut(context, mesh_cache['bme'], mesh_cache['bvh'], self.mx, loop)
                         if path not in update_paths:
                             update_paths.add(path)
@@ -832,6 +859,8 @@ class Contours(object):
         '''
         if undo:
             self.create_undo_snapshot('ROTATE')
+        #the widget edits the selected loop until the next snapshot
+        self.sel_path.changed()
         
         #TODO...if CoM is off screen, then what?
         x,y = eventd['mouse']
@@ -853,6 +882,8 @@ class Contours(object):
         '''
         if undo:
             self.create_undo_snapshot('LOOP_SLIDE')
+        #the widget edits the selected loop until the next snapshot
+        self.sel_path.changed()
         
         x,y = eventd['mouse']
         self.cut_line_widget = CutLineManipulatorWidget(context, self.settings, 
@@ -871,6 +902,8 @@ class Contours(object):
         widget already exists
         '''
         self.create_undo_snapshot('WIDGET_TRANSFORM')
+        #the widget edits the selected loop until the next snapshot
+        self.sel_path.changed()
         self.cut_line_widget.derive_screen(eventd['context'])
         
     def widget_transform(self,context,settings, eventd):
@@ -878,6 +911,7 @@ class Contours(object):
         x,y = eventd['mouse']
         shft = eventd['shift']
         self.cut_line_widget.user_interaction(context, x, y, shift = shft)
+        self.sel_path.changed()
         
         self.sel_loop.cut_object(context, mesh_cache['bme'], mesh_cache['bvh'], self.mx)
         self.sel_loop.simplify_cross(self.sel_path.ring_segments)
@@ -890,6 +924,7 @@ class Contours(object):
 
     def widget_cancel(self,context):
         self.cut_line_widget.cancel_transform()
+        self.sel_path.changed()
         self.sel_loop.cut_object(context, mesh_cache['bme'], mesh_cache['bvh'], self.mx)
         self.sel_loop.simplify_cross(self.sel_path.ring_segments)
         self.sel_loop.update_com()  
@@ -900,6 +935,7 @@ class Contours(object):
     def draw_post_pixel(self,context):
 
         r3d = context.space_data.region_3d
+        view_frustum.update_view(r3d)
         if context.space_data.use_occlude_geometry:
             new_matrix = [v for l in r3d.view_matrix for v in l]
             #if new_matrix != self.last_matrix:
@@ -918,6 +954,7 @@ class Contours(object):
             else:
                 interact = False
             
+            if not view_frustum.bbox_visible(c_cut.bbox): continue
             c_cut.draw2d(context, self.settings)#,three_dimensional = self.navigating, interacting = interact)
     
             if c_cut.verts_simple != [] and self.settings.show_cut_indices:
@@ -934,6 +971,7 @@ class Contours(object):
             
         if len(self.cut_paths):
             for path in self.cut_paths:
+                if not view_frustum.bbox_visible(path.get_bbox()): continue
                 path.draw2d(context, path = False, nodes = self.settings.show_nodes, rings = True, follows = True, backbone = self.settings.show_backbone    )
                 
         if len(self.snap_circle):
@@ -941,12 +979,28 @@ class Contours(object):
 
     def draw_post_view(self,context):
         if len(self.cut_paths):
+            # batch primitives of all paths, so each style is drawn once
+            batch = common_drawing_view.DrawBatch()
+            view_frustum.update_view(context.space_data.region_3d)
             for path in self.cut_paths:
-                path.draw3d(context, self.obj_orig.matrix_world)
+                if not view_frustum.bbox_visible(path.get_bbox()): continue
+                path.draw3d(context, self.obj_orig.matrix_world, batch=batch)
+            batch.flush(context)
         
         return
     
 class ContourCutSeries(object):  #TODO:  nomenclature consistency. Segment, SegmentCuts, SegmentCutSeries?
+    
+    # undo snapshots reuse a series and its cuts until it is marked changed (see changed).
+    # selection and highlight change without snapshots, so they are left out and reapplied
+    undo_unit = True
+    undo_transient = {
+        'select': bool,
+        'is_highlighted': bool,
+        'line_thickness': lambda: common_utilities.get_settings().line_thick,
+        'draw_version': lambda: next(draw_versions),
+        }
+    
     def __init__(self, context, raw_points,
                  segments = 5,  #TODO:  Rename for nomenclature consistency
                  ring_segments = 10, #TDOD: nomenclature consistency
@@ -1001,6 +1055,15 @@ class ContourCutSeries(object):  #TODO:  nomenclature consistency. Segment, Segm
         
         ###DRAWING SETTINGS###
         self.line_thickness = settings.line_thick + 1
+        self.draw_version = next(draw_versions)
+    
+    def changed(self):
+        '''
+        call when the series or its cuts are edited, so that undo snapshots
+        and cached screen projections pick up the edit
+        '''
+        self.draw_version = next(draw_versions)
+        undo_touch(self)
     
     def do_select(self,settings):
         self.select = True
@@ -2296,6 +2359,14 @@ class ContourCutSeries(object):  #TODO:  nomenclature consistency. Segment, Segm
         merge_series.backbone_from_cuts(context,bme,bvh,mx)
         merge_series.connect_cuts_to_make_mesh(bvh, mx)
         #merge_series.update_visibility(context,ob)
+    
+    def get_bbox(self):
+        '''
+        returns world space bounding box of cut series as union of its cuts' bounding boxes
+        (all geometry of series lies between cuts), or None if not known
+        '''
+        rings = self.cuts + [ring for ring in (self.existing_head, self.existing_tail) if ring]
+        return bbox_union(ring.bbox for ring in rings)
         
     def draw2d(self,context, path = True, nodes = True, rings = True, follows = True, backbone = True):
         
@@ -2308,14 +2379,16 @@ class ContourCutSeries(object):  #TODO:  nomenclature consistency. Segment, Segm
 
         #TODO:  Debug if None in self.world path.  How could this happen?       
         if path and self.world_path != [] and None not in self.world_path:
-            common_drawing_px.draw_3d_points(context, self.world_path, (1,.5,0,1), 3)
+            common_drawing_px.draw_3d_points(context, self.world_path, (1,.5,0,1), 3, key=(id(self), 'path'), version=self.draw_version)
        
         if nodes and len(self.cut_points):
-            common_drawing_px.draw_3d_points(context, self.cut_points, (0,1,.5,1), 2)
+            common_drawing_px.draw_3d_points(context, self.cut_points, (0,1,.5,1), 2, key=(id(self), 'nodes'), version=self.draw_version)
          
         if rings:
             if len(self.cuts):
+                view_frustum.update_view(context.space_data.region_3d)
                 for cut in self.cuts:
+                    if not view_frustum.bbox_visible(cut.bbox): continue
                     cut.draw2d(context, settings, three_dimensional = True, interacting = False)
                     
             if self.existing_head:
@@ -2325,12 +2398,13 @@ class ContourCutSeries(object):  #TODO:  nomenclature consistency. Segment, Segm
                 self.existing_tail.draw2d(context, settings, three_dimensional = True, interacting = False)
         
         if backbone and len(self.backbone):
-            for vertebra3d in self.backbone:
+            for i, vertebra3d in enumerate(self.backbone):
                 common_drawing_px.draw_3d_points(context, vertebra3d, 
                                                           (.2,.2,1, 1), 
-                                                          3)
+                                                          3,
+                                                          key=(id(self), 'backbone', i), version=self.draw_version)
 
-    def draw3d(self,context, mx):
+    def draw3d(self,context, mx, batch=None):
         settings = common_utilities.get_settings()
         region,r3d = context.region,context.space_data.region_3d
         
@@ -2345,20 +2419,22 @@ class ContourCutSeries(object):  #TODO:  nomenclature consistency. Segment, Segm
         #faces
         for f in self.faces:
             pts = [mx * self.verts[i] for i in f]    
-            common_drawing_view.draw3d_quad(context,pts, color_fill)
+            common_drawing_view.draw3d_quad(context,pts, color_fill, batch=batch)
         
         #edges    
         for follow in self.follow_lines:
-            common_drawing_view.draw3d_polyline(context, follow, color_border, self.line_thickness,"GL_LINE_STIPPLE" )
+            common_drawing_view.draw3d_polyline(context, follow, color_border, self.line_thickness,"GL_LINE_STIPPLE", batch=batch)
         
+        view_frustum.update_view(r3d)
         for cut in self.cuts:
-            cut.draw3d(context,settings)
+            if not view_frustum.bbox_visible(cut.bbox): continue
+            cut.draw3d(context,settings, batch=batch)
 
         if self.existing_head:
-            self.existing_head.draw3d(context, settings)
+            self.existing_head.draw3d(context, settings, batch=batch)
                 
         if self.existing_tail:
-            self.existing_tail.draw3d(context, settings)
+            self.existing_tail.draw3d(context, settings, batch=batch)
         
 class ContourControlPoint(object):
     
@@ -2455,6 +2531,7 @@ class ExistingVertList(object):
          
         self.plane_no = None  #TODO best fit plane?
         self.vert_inds_sorted = vert_inds_sorted
+        self.bbox = points_bbox(self.verts_simple)
         
         self.derive_normal()
     
@@ -2617,7 +2694,7 @@ class ExistingVertList(object):
                         blf.position(0, loc[0], loc[1], 0)
                         blf.draw(0, str(i))    
                       
-    def draw3d(self,context,settings):
+    def draw3d(self,context,settings, batch=None):
         stroke_color = settings.theme_colors_active[settings.theme]
         mesh_color = settings.theme_colors_mesh[settings.theme]
         
@@ -2625,17 +2702,21 @@ class ExistingVertList(object):
         thick = settings.line_thick
         
         if 0 in self.eds_simple[-1]:
-            common_drawing_view.draw3d_closed_polylines(context, [self.verts_simple], mesh_color, thick,'GL_LINE_STIPPLE')
+            common_drawing_view.draw3d_closed_polylines(context, [self.verts_simple], mesh_color, thick,'GL_LINE_STIPPLE', batch=batch)
         else:
-            common_drawing_view.draw3d_polyline(context, self.verts_simple, mesh_color, thick,'GL_LINE_STIPPLE')
+            common_drawing_view.draw3d_polyline(context, self.verts_simple, mesh_color, thick,'GL_LINE_STIPPLE', batch=batch)
         
         #draw the vertices
-        common_drawing_view.draw3d_points(context,self.verts_simple, mesh_color, settings.vert_size)
+        common_drawing_view.draw3d_points(context,self.verts_simple, mesh_color, settings.vert_size, batch=batch)
          
         
         
 class ContourCutLine(object): 
     
+    # warm start data is rebuilt by the next cut, and selection is reapplied after undo,
+    # so both are left out of undo snapshots
+    undo_transient = {'slice_warm': dict, 'select': bool, 'is_highlighted': bool}
+    
     def __init__(self, x, y, line_width = 3):
         
         self.desc = "CUT_LINE"
@@ -2681,6 +2762,12 @@ class ContourCutLine(object):
         #variable used to shift loop beginning on high res loop
         self.shift = 0
         self.int_shift = 0
+        
+        #world space bounding box of cut, for view culling
+        self.bbox = None
+        
+        #previous loop of this cut, so that re-cutting while dragging is warm started
+        self.slice_warm = {}
 
         
     def update_screen_coords(self,context):
@@ -2777,7 +2864,7 @@ class ContourCutLine(object):
                     blf.position(0, loc[0], loc[1], 0)
                     blf.draw(0, str(i))
     
-    def draw3d(self,context,settings):
+    def draw3d(self,context,settings, batch=None):
         stroke_color = settings.theme_colors_active[settings.theme]
         mesh_color = settings.theme_colors_mesh[settings.theme]
         
@@ -2792,12 +2879,12 @@ class ContourCutLine(object):
             thick = settings.line_thick
         
         if 0 in self.eds_simple[-1]:
-            common_drawing_view.draw3d_closed_polylines(context, [self.verts_simple], color, thick,'GL_LINE_STIPPLE')
+            common_drawing_view.draw3d_closed_polylines(context, [self.verts_simple], color, thick,'GL_LINE_STIPPLE', batch=batch)
         else:
-            common_drawing_view.draw3d_polyline(context, self.verts_simple, color, thick,'GL_LINE_STIPPLE')
+            common_drawing_view.draw3d_polyline(context, self.verts_simple, color, thick,'GL_LINE_STIPPLE', batch=batch)
         
         #draw the vertices
-        common_drawing_view.draw3d_points(context,self.verts_simple, color, settings.vert_size)
+        common_drawing_view.draw3d_points(context,self.verts_simple, color, settings.vert_size, batch=batch)
          
     def hit_object(self, context, bvh, mx, method = 'VIEW'):
         settings = common_utilities.get_settings()
@@ -2853,6 +2940,7 @@ class ContourCutLine(object):
                 self.seed_face_index = None
                 self.verts = []
                 self.verts_simple = []
+                self.bbox = None
                 print('Did not hit!')
             
             return self.plane_pt
@@ -2900,6 +2988,7 @@ class ContourCutLine(object):
                 self.seed_face_index = None
                 self.verts = []
                 self.verts_simple = []
+                self.bbox = None
                 print('aim better')
                 
             return self.plane_pt
@@ -2922,13 +3011,14 @@ class ContourCutLine(object):
         settings = common_utilities.get_settings()
         meth = settings.new_method
         if pt and pno:
-            cross = contour_utilities.cross_section_seed(bme, mx, pt, pno, indx, debug = True, method = meth)   
+            cross = contour_utilities.cross_section_seed(bme, mx, pt, pno, indx, debug = True, method = meth, warm = self.slice_warm)   
             if cross and cross[0] and cross[1]:
                 self.verts = [mx*v for v in cross[0]]
                 self.edges = cross[1]   
         else:
             self.verts = []
             self.edges = []
+        self.update_bbox()
         
     def simplify_cross(self,segments):
         if self.verts !=[] and self.edges != []:
@@ -2936,6 +3026,13 @@ class ContourCutLine(object):
             
             if self.int_shift:
                 self.verts_simple = contour_utilities.list_shift(self.verts_simple, self.int_shift)
+        self.update_bbox()
+    
+    def update_bbox(self):
+        '''
+        recomputes world space bounding box of high and low res cut verts
+        '''
+        self.bbox = points_bbox(self.verts + self.verts_simple)
             
     def update_com(self):
         if self.verts_simple != []:
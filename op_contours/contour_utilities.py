@@ -36,6 +36,11 @@ import bpy
 from bpy_extras import view3d_utils
 from bpy_extras.view3d_utils import location_3d_to_region_2d, region_2d_to_vector_3d, region_2d_to_location_3d, region_2d_to_origin_3d
 
+# Common imports
+from ..cache import get_mesh_slicer
+from ..lib.common_utilities import space_evenly_on_path
+
+
 def perp_vector_point_line(pt1, pt2, ptn):
     '''
     Vector bwettn pointn and line between point1
@@ -411,7 +416,7 @@ def calculate_best_plane(locs):
 def cross_section(bme, mx, point, normal, debug = True):
     '''
     Takes a mesh and associated world matrix of the object and returns a cross secion in local
-    space.
+    space.  Every loop where the plane cuts the mesh is returned, each in order.
     
     Args:
         mesh: Blender BMesh
@@ -420,18 +425,7 @@ def cross_section(bme, mx, point, normal, debug = True):
         normal:  plane normal direction (type Mathutisl.Vector)
     '''
     
-    times = []
-    times.append(time.time())
-    #bme = bmesh.new()
-    #bme.from_mesh(me)
-    #bme.normal_update()
-    
-    #if debug:
-        #n = len(times)
-        #times.append(time.time())
-        #print('succesfully created bmesh in %f sec' % (times[n]-times[n-1]))
-    verts =[]
-    eds = []
+    start = time.time()
     
     #convert point and normal into local coords
     #in the mesh into world space.This saves 2*(Nverts -1) matrix multiplications
@@ -439,73 +433,18 @@ def cross_section(bme, mx, point, normal, debug = True):
     pt = imx * point
     no = imx.to_3x3() * normal  #local normal
     
-    edge_mapping = {}  #perhaps we should use bmesh becaus it stores the great cycles..answer yup
-    
-    for ed in bme.edges:
-        
-        A = ed.verts[0].co
-        B = ed.verts[1].co
-        V = B - A
-        
-        proj = V.project(no).length
-        
-        #perp to normal = parallel to plane
-        #only calc 2nd projection if necessary
-        if proj == 0:
-            
-            #make sure not coplanar
-            p_to_A = A - pt
-            a_proj = p_to_A.project(no).length
-            
-            if a_proj == 0:
-               
-                edge_mapping[len(verts)] = ed.link_faces
-                verts.append(1/2 * (A +B)) #put a midpoing since both are coplanar
-
-        else:
-            
-            #this handles the one point on plane case
-            v = intersect_line_plane(A,B,pt,no)
-           
-            if v:
-                check = intersect_point_line(v.to_3d(),A.to_3d(),B.to_3d())
-                if check[1] >= 0 and check[1] <= 1:
-                    
-                                             
-                    
-                    #the vert coord index    =  the face indices it came from
-                    edge_mapping[len(verts)] = [f.index for f in ed.link_faces]
-                    verts.append(v)
+    verts = []
+    eds = []
+    for loop_verts, cyclic in get_mesh_slicer(bme).slice(pt, no):
+        i0,n = len(verts),len(loop_verts)
+        verts += loop_verts
+        eds += [(i0+i, i0+i+1) for i in range(n-1)]
+        if cyclic: eds += [(i0, i0+n-1)]
     
     if debug:
-        n = len(times)
-        times.append(time.time())
-        print('calced intersections %f sec' % (times[n]-times[n-1]))
-       
-    #iterate through smartly to create edge keys          
-    for i in range(0,len(verts)):
-        a_faces = set(edge_mapping[i])
-        for m in range(i,len(verts)):
-            if m != i:
-                b_faces = set(edge_mapping[m])
-                if a_faces & b_faces:
-                    eds.append((i,m))
+        print('calced cross section %f sec' % (time.time()-start))
     
-    if debug:
-        n = len(times)
-        times.append(time.time())
-        #print('calced connectivity %f sec' % (times[n]-times[n-1]))
-        
     if len(verts):
-        #new_me = bpy.data.meshes.new('Cross Section')
-        #new_me.from_pydata(verts,eds,[])
-        
-    
-        #if debug:
-            #n = len(times)
-            #times.append(time.time())
-            #print('Total Time: %f sec' % (times[-1]-times[0]))
-            
         return (verts, eds)
     else:
         return None
@@ -902,131 +841,6 @@ def vert_cycle(vert, pt, no, prev_eds, verts):#, connection):
                         #return the vert to repeat the vert cycle
                         return element
 
-def space_evenly_on_path(verts, edges, segments, shift = 0, debug = False):  #prev deved for Open Dental CAD
-    '''
-    Gives evenly spaced location along a string of verts
-    Assumes that nverts > nsegments
-    Assumes verts are ORDERED along path
-    Assumes edges are ordered coherently
-    Yes these are lazy assumptions, but the way I build my data
-    guarantees these assumptions so deal with it.
-    
-    args:
-        verts - list of vert locations type Mathutils.Vector
-        eds - list of index pairs type tuple(integer) eg (3,5).
-              should look like this though [(0,1),(1,2),(2,3),(3,4),(4,0)]     
-        segments - number of segments to divide path into
-        shift - for cyclic verts chains, shifting the verts along 
-                the loop can provide better alignment with previous
-                loops.  This should be -1 to 1 representing a percentage of segment length.
-                Eg, a shift of .5 with 8 segments will shift the verts 1/16th of the loop length
-                
-    return
-        new_verts - list of new Vert Locations type list[Mathutils.Vector]
-    '''
-    
-    if len(verts) < 2:
-        print('this is crazy, there are not enough verts to do anything!')
-        return verts
-        
-    if segments >= len(verts):
-        print('more segments requested than original verts')
-        
-     
-    #determine if cyclic or not, first vert same as last vert
-    if 0 in edges[-1]:
-        cyclic = True
-        
-    else:
-        cyclic = False
-        #zero out the shift in case the vert chain insn't cyclic
-        if shift != 0: #not PEP but it shows that we want shift = 0
-            print('not shifting because this is not a cyclic vert chain')
-            shift = 0
-   
-    #calc_length
-    arch_len = 0
-    cumulative_lengths = [0]#TODO, make this the right size and dont append
-    for i in range(0,len(verts)-1):
-        v0 = verts[i]
-        v1 = verts[i+1]
-        V = v1-v0
-        arch_len += V.length
-        cumulative_lengths.append(arch_len)
-        
-    if cyclic:
-        v0 = verts[-1]
-        v1 = verts[0]
-        V = v1-v0
-        arch_len += V.length
-        cumulative_lengths.append(arch_len)
-        #print(cumulative_lengths)
-    
-    #identify vert indicies of import
-    #this will be the largest vert which lies at
-    #no further than the desired fraction of the curve
-    
-    #initialze new vert array and seal the end points
-    if cyclic:
-        new_verts = [[None]]*(segments)
-        #new_verts[0] = verts[0]
-            
-    else:
-        new_verts = [[None]]*(segments + 1)
-        new_verts[0] = verts[0]
-        new_verts[-1] = verts[-1]
-    
-    
-    n = 0 #index to save some looping through the cumulative lengths list
-          #now we are leaving it 0 becase we may end up needing the beginning of the loop last
-          #and if we are subdividing, we may hit the same cumulative lenght several times.
-          #for now, use the slow and generic way, later developsomething smarter.
-    for i in range(0,segments- 1 + cyclic * 1):
-        desired_length_raw = (i + 1 + cyclic * -1)/segments * arch_len + shift * arch_len / segments
-        #print('the length we desire for the %i segment is %f compared to the total length which is %f' % (i, desired_length_raw, arch_len))
-        #like a mod function, but for non integers?
-        if desired_length_raw > arch_len:
-            desired_length = desired_length_raw - arch_len       
-        elif desired_length_raw < 0:
-            desired_length = arch_len + desired_length_raw #this is the end, + a negative number
-        else:
-            desired_length = desired_length_raw
-
-        #find the original vert with the largets legnth
-        #not greater than the desired length
-        #I used to set n = J after each iteration
-        for j in range(n, len(verts)+1):
-
-            if cumulative_lengths[j] > desired_length:
-                #print('found a greater length at vert %i' % j)
-                #this was supposed to save us some iterations so that
-                #we don't have to start at the beginning each time....
-                #if j >= 1:
-                    #n = j - 1 #going one back allows us to space multiple verts on one edge
-                #else:
-                    #n = 0
-                break
-
-        extra = desired_length - cumulative_lengths[j-1]
-        if j == len(verts):
-            new_verts[i + 1 + cyclic * -1] = verts[j-1] + extra * (verts[0]-verts[j-1]).normalized()
-        else:
-            new_verts[i + 1 + cyclic * -1] = verts[j-1] + extra * (verts[j]-verts[j-1]).normalized()
-    
-    eds = []
-    
-    for i in range(0,len(new_verts)-1):
-        eds.append((i,i+1))
-    if cyclic:
-        #close the loop
-        eds.append((i+1,0))
-    if debug:
-        print(cumulative_lengths)
-        print(arch_len)
-        print(eds)
-        
-    return new_verts, eds
- 
 def list_shift(seq, n):
     n = n % len(seq)
     return seq[n:] + seq[:n]
@@ -2199,10 +2013,13 @@ def cross_section_walker(bme, pt, no, find_from, eind_from, co_from, epsilon):
 def cross_section_seed_ver1(bme, mx, 
                        point, normal, 
                        seed_index, 
-                       max_tests = 10000, debug = True):
-    
-    # data to be returned
-    verts,edges = [],[]
+                       max_tests = 10000, debug = True, warm = None):
+    '''
+    walks the mesh face by face from the seed face, using the cached adjacency lists of
+    the mesh slicer (see cross_section_walker for the equivalent walk over the BMesh).
+    warm is an optional dict kept by the caller between cuts of the same loop (ex: while
+    dragging); the previous loop stored there is updated instead of walked from scratch
+    '''
     
     # max distance a coplanar vertex can be from plane
     epsilon = 0.0000000001
@@ -2211,80 +2028,32 @@ def cross_section_seed_ver1(bme, mx,
     imx = mx.inverted()
     pt  = imx * point
     no  = (imx.to_3x3() * normal).normalized()
-
-    # get blender version
-    bver = '%03d.%03d.%03d' % (bpy.app.version[0],bpy.app.version[1],bpy.app.version[2])
-
-    if bver > '002.072.000':
-        bme.faces.ensure_lookup_table();
-
-    # make sure that plane crosses face!
-    lco = [v.co for v in bme.faces[seed_index].verts]
-    ld = [no.dot(co - pt) for co in lco]
-    if all(d > epsilon for d in ld) or all(d < -epsilon for d in ld):               # does face cross plane?
-        # shift pt so plane crosses face
-        shift_dist = (min(ld)+epsilon) if ld[0] > epsilon else (max(ld)-epsilon)
-        pt += no * shift_dist
-        print('>>> shifting')
-        print('>>> ' + str(ld))
-        print('>>> ' + str(shift_dist))
-        print('>>> ' + str(no*shift_dist))
-    
-    # find intersections of edges and cutting plane
-    bmface = bme.faces[seed_index]
-    bmedges = bmface.edges
-    ei_init = find_bmedges_crossing_plane(pt, no, bmedges, epsilon)
-    
-    if len(ei_init) < 2:
-        print('warning: it should not reach here! len(ei_init) = %d' % len(ei_init))
-        print('lengths = ' + str([(edge.verts[0].co-edge.verts[1].co).length for edge in bmedges]))
-        return (None,None)
-    elif len(ei_init) == 2:
-        # simple case
-        ei0_max, ei1_max = ei_init
-    else:
-        # convex polygon
-        # find two farthest points
-        d_max, ei0_max, ei1_max = -1.0, None, None
-        for ei0,ei1 in combinations(ei_init, 2):
-            d = (ei0[1] - ei1[1]).length
-            if d > d_max: d_max,ei0_max,ei1_max = d,ei0,ei1
-    
-    # start walking one way around bmesh
-    verts0,looped = cross_section_walker(bme, pt, no, seed_index, ei0_max[0].index, ei0_max[1], epsilon)
-    
-    if not verts0:
-        # could not walk around bmesh (non-manifold surface)
-        return (None, None)
     
-    if looped:
-        # looped around on self, so we're done!
-        verts = verts0
-        nv = len(verts)
-        edges = [(i,(i+1)%nv) for i in range(nv)]
-        
-        return (verts, edges)
-    
-    # did not loop around, so start walking the other way
-    verts1,looped = cross_section_walker(bme, pt, no, seed_index, ei1_max[0].index, ei1_max[1], epsilon)
-    
-    if not verts1:
-        # could not walk around bmesh (non-manifold surface)
+    slicer = get_mesh_slicer(bme)
+    if seed_index is None or seed_index >= slicer.counts[2]:
         return (None, None)
     
-    if looped:
-        # looped around on self!?
-        print('warning: looped one way but not the other')
-        verts = verts1
-        nv = len(verts)
-        edges = [(i,(i+1)%nv) for i in range(nv)]
-        
-        return (verts, edges)
+    # previous loop is only valid for the slicer (mesh) it was cut from
+    prev = warm.get('chain') if warm is not None and warm.get('slicer') is slicer else None
+    verts,cyclic,chain = slicer.walk(pt, no, seed_index, epsilon, prev=prev)
+    if warm is not None:
+        warm['slicer'] = slicer
+        warm['chain'] = chain
+    return walk_result(verts, cyclic)
+
+def walk_result(verts, cyclic):
+    '''
+    returns (verts, edges) of a loop found by MeshSlicer walk
+    '''
+    if not verts:
+        # could not walk around mesh (non-manifold surface)
+        return (None, None)
     
-    # combine two walks
-    verts = list(reversed(verts0)) + verts1
     nv = len(verts)
-    edges = [(i,i+1) for i in range(nv-1)]
+    if cyclic:
+        edges = [(i,(i+1)%nv) for i in range(nv)]
+    else:
+        edges = [(i,i+1) for i in range(nv-1)]
     
     return (verts, edges)
 
@@ -2293,7 +2062,7 @@ def cross_section_seed_ver1(bme, mx,
 def cross_section_seed(bme, mx, 
                        point, normal, 
                        seed_index, 
-                       max_tests = 10000, debug = True, method = False):
+                       max_tests = 10000, debug = True, method = False, warm = None):
     '''
     Takes a mesh and associated world matrix of the object and returns a cross secion in local
     space.
@@ -2307,6 +2076,7 @@ def cross_section_seed(bme, mx,
         self_stop: a normal vector which defines a plane to stop cutting
         direction: Vector which the cut should start traveling.
         exclude_edges: list of edge indices (usually already tested from previous iterations)
+        warm: dict that keeps the previous loop of this cut, to warm start the next cut (new method only)
     '''
     
     start = time.time()
@@ -2315,7 +2085,7 @@ def cross_section_seed(bme, mx,
         ret = cross_section_seed_ver0(bme, mx, point, normal, seed_index, max_tests, debug)
 
     else:
-        ret = cross_section_seed_ver1(bme, mx, point, normal, seed_index, max_tests, debug)
+        ret = cross_section_seed_ver1(bme, mx, point, normal, seed_index, max_tests, debug, warm = warm)
     
     calc_time = time.time()
     
@@ -346,6 +346,7 @@ class  CGC_Contours(ModalOperator, Contours_UI_Draw):
         elif eventd['release'] in self.keymap['action'] | self.keymap['modal confirm']:
             self.contours.cut_line_widget = None
             self.contours.sel_path.update_backbone(context, mesh_cache['bme'], mesh_cache['bvh'], self.contours.mx, self.contours.sel_loop, insert = False)
+            self.contours.sel_path.changed()
             return 'main'
         
         elif eventd['press'] in self.keymap['modal cancel']:
@@ -46,6 +46,9 @@ from ..lib.common_utilities import point_inside_loop2d, get_object_length_scale,
 from ..lib.common_utilities import closest_t_and_distance_point_to_line_segment, ray_cast_point_bvh
 from ..lib.classes.profiler.profiler import Profiler
 from ..lib.classes.bmeshcache.bmeshcache import BMeshCache
+from ..lib.classes.visibility.visibility import VisibilityCache
+from ..lib.classes.spatialindex.spatialindex import BMeshSpatialIndex
+from ..lib.classes.bmeshundolog.bmeshundolog import BMeshUndoLog
 from ..cache import mesh_cache, polypen_undo_cache, object_validation, is_object_valid, write_mesh_cache, clear_mesh_cache
 
 from ..lib.common_drawing_bmesh import BMeshRender
@@ -60,6 +63,8 @@ class CGC_Polypen(ModalOperator):
     bl_space_type  = 'VIEW_3D'
     bl_region_type = 'TOOLS'
     
+    redraw_on_mousemove = False     # hover code below reports changes of nearest element
+    
     def __init__(self):
         FSM = {}
         FSM['move vert'] = self.modal_move_vert
@@ -119,7 +124,6 @@ class CGC_Polypen(ModalOperator):
         
         if not is_valid:
             clear_mesh_cache()
-            polypen_undo_cache = []
             me = self.src_object.to_mesh(scene=context.scene, apply_modifiers=True, settings='PREVIEW')
             me.update()
         
@@ -146,6 +150,16 @@ class CGC_Polypen(ModalOperator):
         #self.tar_object.matrix_world
         self.tar_bmeshrender = BMeshRender(self.tar_bmesh, Matrix(), mesh_cache['bvh'], self.tar_mx)
         
+        # occlusion tests of target geometry against source, reused while view is unchanged
+        self.visibility = VisibilityCache(mesh_cache['bvh'], self.mx)
+        
+        # proximity queries for hovering and snapping
+        self.tar_index = BMeshSpatialIndex(self.tar_bmesh)
+        
+        # undo steps record only the edited elements of target
+        polypen_undo_cache.clear()
+        self.tar_undo = BMeshUndoLog(self.tar_bmesh, polypen_undo_cache)
+        
         color_mesh = self.settings.theme_colors_mesh[self.settings.theme]
         color_selection = self.settings.theme_colors_selection[self.settings.theme]
         color_active = self.settings.theme_colors_active[self.settings.theme]
@@ -243,6 +257,7 @@ class CGC_Polypen(ModalOperator):
         ''' Called when tool is committing '''
         
         bme = self.tar_bmesh.copy()
+        self.tar_undo.remove_layer(bme)
         for bmv in bme.verts:
             bmv.co = self.tar_imx * bmv.co
         
@@ -302,6 +317,7 @@ class CGC_Polypen(ModalOperator):
         
         if eventd['type'] == 'MOUSEMOVE':
             #mouse movement/hovering
+            nearest = (self.nearest_bmvert, self.nearest_bmedge, self.nearest_bmface)
             if not self.over_source:
                 self.clear_nearest()
             else:
@@ -315,12 +331,14 @@ class CGC_Polypen(ModalOperator):
                 self.nearest_bmvert = min_bmv
                 self.nearest_bmedge = min_bme
                 self.nearest_bmface = min_bmf
+            if (self.nearest_bmvert, self.nearest_bmedge, self.nearest_bmface) != nearest:
+                self.tag_redraw()
         
         # SELECTION
         
         if eventd['press'] in selection_mouse():
             # Select element
-            self.create_undo()
+            self.create_undo('move')
             self.select(self.nearest_bmvert, self.nearest_bmedge, self.nearest_bmface)
             return 'move vert'
         
@@ -332,43 +350,36 @@ class CGC_Polypen(ModalOperator):
         # COMMANDS
         
         if eventd['press'] in self.keymap['translate']:
-            self.create_undo()
+            self.create_undo('move')
             self.mouse_downp2d = self.mouse_curp2d
             return 'move vert'
         
         if eventd['press'] in self.keymap['delete']:
             self.create_undo()
             if self.selected_bmfaces:
-                for bmf in self.selected_bmfaces:
-                    self.tar_bmesh.faces.remove(bmf)
+                self.delete_faces(self.selected_bmfaces)
                 self.set_selection()
                 self.clear_nearest()
-                self.tar_bmeshrender.dirty()
             elif self.selected_bmedges:
                 try:
-                    for bme in self.selected_bmedges:
-                        self.tar_bmesh.edges.remove(bme)
+                    self.delete_edges(self.selected_bmedges)
                 except:
                     pass
                 self.set_selection()
                 self.clear_nearest()
-                self.tar_bmeshrender.dirty()
             elif self.selected_bmverts:
-                for bmv in self.selected_bmverts:
-                    self.tar_bmesh.verts.remove(bmv)
+                self.delete_verts(self.selected_bmverts)
                 self.set_selection()
                 self.clear_nearest()
-                self.tar_bmeshrender.dirty()
             return ''
         
         if eventd['press'] in self.keymap['dissolve']:
             if self.selected_bmedges:
                 if len(self.selected_bmedges[0].link_faces) == 2:
                     self.create_undo()
-                    bmesh.utils.face_join(self.selected_bmedges[0].link_faces)
+                    self.join_faces(self.selected_bmedges[0].link_faces)
                     self.set_selection()
                     self.clear_nearest()
-                    self.tar_bmeshrender.dirty()
             elif self.selected_bmverts:
                 bmv = self.selected_bmverts[0]
                 if len(bmv.link_edges) == 2: # and len(bmv.link_faces) == 0:
@@ -377,7 +388,6 @@ class CGC_Polypen(ModalOperator):
                     self.handle_collapse_edge(bmv.link_edges[0])
                     self.set_selection()
                     self.clear_nearest()
-                    self.tar_bmeshrender.dirty()
             return ''
         
         # if eventd['press'] == 'TAB':
@@ -429,9 +439,11 @@ class CGC_Polypen(ModalOperator):
                     # merge-able!
                     p3d = Vector(min_bmv.co)
                 nbmvco[bmv] = p3d
+            self.tar_undo.moved(nbmvco.keys())
             for bmv,co in nbmvco.items():
                 bmv.co = co
-            self.tar_bmeshrender.dirty()
+            self.tar_bmeshrender.dirty_verts(nbmvco.keys())
+            self.tar_index.update_verts(nbmvco.keys())
             return ''
         
         if eventd['release']:
@@ -460,19 +472,18 @@ class CGC_Polypen(ModalOperator):
                         if not share_edge and share_face:
                             # create an edge
                             bmf = share_face[0]
-                            bmesh.utils.face_split(bmf, bmv0, bmv1)
+                            self.split_face(bmf, bmv0, bmv1)
                             share_edge = [bme for bme in bmv1.link_edges if bmv0 in bme.verts]
                         if share_edge:
                             # collapse edge
                             self.handle_collapse_edge(share_edge[0])
                         if not share_edge and not share_face:
                             # merge!!!
-                            bmesh.utils.vert_splice(bmv0, bmv1)
+                            self.splice_verts(bmv0, bmv1)
                             self.clean_duplicate_bmedges(bmv1)
                             self.set_selection(lbmv=[bmv1])
                             self.clear_nearest()
                             self.clean_bmesh()
-                            self.tar_bmeshrender.dirty()
                 
                 self.vert_pos = None
                 context.area.header_text_set('Polypen')
@@ -481,7 +492,8 @@ class CGC_Polypen(ModalOperator):
             if cancel:
                 for bmv in self.vert_pos:
                     bmv.co = self.vert_pos[bmv]
-                self.tar_bmeshrender.dirty()
+                self.tar_bmeshrender.dirty_verts(self.vert_pos.keys())
+                self.tar_index.update_verts(self.vert_pos.keys())
                 self.vert_pos = None
                 context.area.header_text_set('Polypen')
                 return 'main'
@@ -503,15 +515,14 @@ class CGC_Polypen(ModalOperator):
         if edges_rem:
             lfvadd = []
             for e in edges_rem:
-                lfvadd += [f.verts for f in e.link_faces]
-                self.tar_bmesh.edges.remove(e)
+                lfvadd += [list(f.verts) for f in e.link_faces]
+                self.delete_edges([e])
             faces_seen = set(frozenset(v.index for v in bmf.verts) for bmf in self.tar_bmesh.faces)
             for fv in lfvadd:
                 spi = frozenset(v.index for v in fv)
                 if spi not in faces_seen:
                     faces_seen.add(spi)
-                    self.tar_bmesh.faces.new(fv)
-            self.tar_bmeshrender.dirty()
+                    self.new_face(fv)
     
     def update_mouse(self, eventd):
         hit = ray_cast_point_bvh(eventd['context'], mesh_cache['bvh'], self.mx, eventd['mouse'])
@@ -570,43 +581,56 @@ class CGC_Polypen(ModalOperator):
     #########################
     # undo
     
-    def create_undo(self):
-        liv = [v.index for v in self.selected_bmverts]
-        lie = [e.index for e in self.selected_bmedges]
-        lif = [f.index for f in self.selected_bmfaces]
-        polypen_undo_cache.append((self.tar_bmesh.copy(),liv,lie,lif))
-        if len(polypen_undo_cache) > self.settings.undo_depth:
-            polypen_undo_cache.pop(0)
+    def create_undo(self, kind='edit'):
+        '''
+        opens undo step.  edits made through the helper functions below are recorded into it
+        (see BMeshUndoLog).  kind 'move' marks actions that only move verts; with an undo memory
+        limit set, consecutive moves are coalesced into one step.
+        '''
+        sel = (self.selected_bmverts, self.selected_bmedges, self.selected_bmfaces)
+        max_size = self.settings.undo_memory * 1024 * 1024
+        self.tar_undo.push(kind, sel, self.settings.undo_depth, max_size=max_size)
     
     def undo(self, context):
-        if not polypen_undo_cache: return
-        bme,liv,lie,lif = polypen_undo_cache.pop()
-        bme = bme.copy()
-        bme.verts.ensure_lookup_table()
-        bme.edges.ensure_lookup_table()
-        bme.faces.ensure_lookup_table()
-        self.tar_bmesh = bme
-        self.tar_bmeshrender.replace_target_bmesh(bme)
-        self.selected_bmverts = [bme.verts[i] for i in liv]
-        self.selected_bmedges = [bme.edges[i] for i in lie]
-        self.selected_bmfaces = [bme.faces[i] for i in lif]
+        undone = self.tar_undo.undo()
+        if not undone: return
+        lbmv,(lbmv_sel,lbme_sel,lbmf_sel) = undone
+        self.tar_bmeshrender.dirty()
+        self.tar_index.update_verts(lbmv)
+        self.set_selection(lbmv=lbmv_sel, lbme=lbme_sel, lbmf=lbmf_sel)
         self.clear_nearest()
     
     
+    def tar_touch(self, lbmv):
+        '''
+        call before creating, splitting, or removing elements around verts in lbmv.  every target
+        edit goes through the helper functions below, which call this
+        '''
+        self.tar_undo.touch(lbmv)
+        self.tar_bmeshrender.dirty()
+        self.tar_index.update_verts(lbmv)
+    
+    def tar_created(self, bmv):
+        ''' call after creating vert bmv '''
+        self.tar_undo.created(bmv)
+        self.tar_bmeshrender.dirty()
+        self.tar_index.update_verts([bmv])
+    
+    
     ###############################################################
     # creation, modifying, and  deletion helper functions
     
     def create_vert(self, co, normal):
         bmv = self.tar_bmesh.verts.new(co)
         bmv.normal = normal
+        self.tar_created(bmv)
         self.select(bmv)
-        self.tar_bmeshrender.dirty()
         return bmv
     
     def create_edge(self, lbmv):
+        self.tar_touch(lbmv)
         bme = self.tar_bmesh.edges.new(lbmv)
         self.select(bme)
-        self.tar_bmeshrender.dirty()
         return bme
     
     def create_face(self, lbmv):
@@ -627,11 +651,45 @@ class CGC_Polypen(ModalOperator):
                     lbmv[i1],lbmv[i2] = lbmv[i2],lbmv[i1]
                     repeat = True
                     break
-        bmf = self.tar_bmesh.faces.new(lbmv)
+        bmf = self.new_face(lbmv)
         self.select(bmf)
-        self.tar_bmeshrender.dirty()
         return bmf
     
+    def new_face(self, lbmv):
+        self.tar_touch(lbmv)
+        return self.tar_bmesh.faces.new(lbmv)
+    
+    def split_edge(self, bme, bmv, fac):
+        self.tar_touch(bme.verts)
+        bme_new,bmv_new = bmesh.utils.edge_split(bme, bmv, fac)
+        self.tar_created(bmv_new)
+        return (bme_new, bmv_new)
+    
+    def split_face(self, bmf, bmv0, bmv1):
+        self.tar_touch([bmv0, bmv1])
+        return bmesh.utils.face_split(bmf, bmv0, bmv1)
+    
+    def splice_verts(self, bmv0, bmv1):
+        ''' merges bmv0 into bmv1 '''
+        self.tar_touch([bmv0, bmv1])
+        bmesh.utils.vert_splice(bmv0, bmv1)
+    
+    def join_faces(self, lbmf):
+        self.tar_touch({bmv for bmf in lbmf for bmv in bmf.verts})
+        return bmesh.utils.face_join(lbmf)
+    
+    def delete_verts(self, lbmv):
+        self.tar_touch(lbmv)
+        for bmv in lbmv: self.tar_bmesh.verts.remove(bmv)
+    
+    def delete_edges(self, lbme):
+        self.tar_touch({bmv for bme in lbme for bmv in bme.verts})
+        for bme in lbme: self.tar_bmesh.edges.remove(bme)
+    
+    def delete_faces(self, lbmf):
+        self.tar_touch({bmv for bmf in lbmf for bmv in bmf.verts})
+        for bmf in lbmf: self.tar_bmesh.faces.remove(bmf)
+    
     
     
     ########################################
@@ -642,9 +700,8 @@ class CGC_Polypen(ModalOperator):
         min_bmv = None
         min_dist2d = 0
         min_dist3d = 0
-        bvh_raycast = mesh_cache['bvh'].ray_cast
-        viewloc = self.imx * region_2d_to_origin_3d(rgn, r3d, p2d)
-        for bmv in self.tar_bmesh.verts:
+        self.visibility.update_view(r3d)
+        for bmv in self.tar_index.verts_near(p3d, max_dist3d):
             if exclude and bmv in exclude: continue
             d3d = (bmv.co - p3d).length
             if d3d > max_dist3d: continue
@@ -653,12 +710,7 @@ class CGC_Polypen(ModalOperator):
             d2d = (p2d - bmv2d).length
             if d2d > max_dist2d: continue
             if min_bmv and (d2d >= min_dist2d or d3d >= min_dist3d): continue
-            if onlyVisible:
-                v = self.imx * bmv.co
-                v2v = viewloc - v
-                v2vl = v2v.length
-                v2v /= v2vl
-                if bvh_raycast(v + v2v*0.01, v2v, v2vl-0.01)[0]: continue
+            if onlyVisible and not self.visibility.is_visible(bmv.co): continue
             min_bmv = bmv
             min_dist2d = d2d
             min_dist3d = d3d
@@ -668,20 +720,12 @@ class CGC_Polypen(ModalOperator):
     def closest_bmedge(self, context, p2d, p3d, max_dist2d, max_dist3d, lbme=None, onlyVisible=True):
         rgn = context.region
         r3d = context.space_data.region_3d
-        if not lbme: lbme = self.tar_bmesh.edges
+        if not lbme: lbme = self.tar_index.edges_near(p3d, max_dist3d)
         lmin_bme = []
         min_dist2d = 0
         min_dist3d = 0
-        bvh_raycast = mesh_cache['bvh'].ray_cast
-        viewloc = self.imx * region_2d_to_origin_3d(rgn, r3d, p2d)
-        
-        def isVisible(co):
-            v = self.imx * co
-            v2v = viewloc - v
-            v2vl = v2v.length
-            v2v /= v2vl
-            hit = bvh_raycast(v+v2v*0.01, v2v, v2vl-0.01)
-            return not hit[0]
+        self.visibility.update_view(r3d)
+        isVisible = self.visibility.is_visible
             
         for bme in lbme:
             # if len(bme.link_faces) == 2:
@@ -739,9 +783,8 @@ class CGC_Polypen(ModalOperator):
         rgn = context.region
         r3d = context.space_data.region_3d
         min_dist3d,min_bmf = max_dist3d,None
-        bvh_raycast = mesh_cache['bvh'].ray_cast
-        viewloc = self.imx * region_2d_to_origin_3d(rgn, r3d, p2d)
-        for bmf in self.tar_bmesh.faces:
+        self.visibility.update_view(r3d)
+        for bmf in self.tar_index.faces_near(p3d, max_dist3d):
             bmv0 = bmf.verts[0]
             v02d = location_3d_to_region_2d(rgn,r3d,bmv0.co)
             if not v02d: continue
@@ -754,12 +797,7 @@ class CGC_Polypen(ModalOperator):
                 if not pt: continue
                 dist = (pt-p3d).length
                 if dist >= min_dist3d: continue
-                if onlyVisible:
-                    v = self.imx * pt
-                    v2v = viewloc - v
-                    v2vl = v2v.length
-                    v2v /= v2vl
-                    if bvh_raycast(v+v2v*0.01, v2v, v2vl-0.01)[0]: continue
+                if onlyVisible and not self.visibility.is_visible(pt): continue
                 
                 min_dist3d = dist
                 min_bmf = bmf
@@ -819,12 +857,11 @@ class CGC_Polypen(ModalOperator):
         if self.hover_face():
             bmf = self.nearest_bmface
             min_bme,_,_ = self.closest_bmedge(context, p2d, p3d, float('inf'), float('inf'), lbme=bmf.edges)
-            _,bmv = bmesh.utils.edge_split(min_bme, min_bme.verts[0], 0.5)
+            _,bmv = self.split_edge(min_bme, min_bme.verts[0], 0.5)
             lbme = bmv.link_edges
             bmv.co = p3d
             self.set_selection(lbmv=[bmv],lbme=lbme)
             self.clear_nearest()
-            self.tar_bmeshrender.dirty()
             return 'move vert'
         
         return ''
@@ -854,10 +891,9 @@ class CGC_Polypen(ModalOperator):
             if bmf:
                 # verts share face
                 # split this face!
-                bmesh.utils.face_split(bmf, bmv0, bmv1)
+                self.split_face(bmf, bmv0, bmv1)
                 self.select(bmv1)
                 self.clear_nearest()
-                self.tar_bmeshrender.dirty()
                 return 'move vert'
             # create edge between verts
             bme = self.create_edge([bmv0, bmv1])
@@ -876,13 +912,12 @@ class CGC_Polypen(ModalOperator):
             if bmf:
                 # vert and edge share face
                 # insert vert and split this face!
-                _,bmv1 = bmesh.utils.edge_split(bme, bme.verts[0], 0.5)
-                bmesh.utils.face_split(bmf, bmv0, bmv1)
+                _,bmv1 = self.split_edge(bme, bme.verts[0], 0.5)
+                self.split_face(bmf, bmv0, bmv1)
                 lbme1 = bmv1.link_edges
                 bmv1.co = p3d
                 self.select(bmv1, *lbme1)
                 self.clear_nearest()
-                self.tar_bmeshrender.dirty()
                 return 'move vert'
             
             # bridge
@@ -930,13 +965,12 @@ class CGC_Polypen(ModalOperator):
                 # split this face!
                 bmv1,bmv2 = bme.verts
                 if not any(bme.other_vert(bmv0) == bmv1 for bme in bmv0.link_edges):
-                    bmesh.utils.face_split(bmf, bmv0, bmv1)
+                    self.split_face(bmf, bmv0, bmv1)
                     bmf = self.face_between_verts(bmv0, bmv2)
                 if not any(bme.other_vert(bmv0) == bmv2 for bme in bmv0.link_edges):
-                    bmesh.utils.face_split(bmf, bmv0, bmv2)
+                    self.split_face(bmf, bmv0, bmv2)
                 self.select(bmv0)
                 self.clear_nearest()
-                self.tar_bmeshrender.dirty()
                 return 'move vert'
             # bridge
             bmv1,bmv2 = bme.verts
@@ -993,17 +1027,16 @@ class CGC_Polypen(ModalOperator):
                 bme,_,_ = self.closest_bmedge(context, p2d, p3d, float('inf'), float('inf'), lbme=lbme)
                 
                 # split edge
-                _,bmv = bmesh.utils.edge_split(bme, bme.verts[0], 0.5)
+                _,bmv = self.split_edge(bme, bme.verts[0], 0.5)
                 bmv_other = [bmv_ for bme_ in bmv.link_edges for bmv_ in bme_.verts if bmv_ != bmv_shared and bmv_ != bmv][0]
                 
                 # merge new bmvert into bmv_opposite
-                bmesh.utils.vert_splice(bmv, bmv_opposite)
+                self.splice_verts(bmv, bmv_opposite)
                 #lbme = [bme for bme in bmv_opposite.link_edges if bme != self.nearest_bmedge]
                 self.clean_duplicate_bmedges(bmv_opposite)
                 lbme = [bme_ for bme_ in bmv_opposite.link_edges if bme_.other_vert(bmv_opposite) == bmv_other]
                 self.set_selection(lbmv=[bmv_opposite],lbme=lbme)
                 self.clear_nearest()
-                self.tar_bmeshrender.dirty()
                 return 'move vert'
                 
         if self.hover_face():
@@ -1029,15 +1062,15 @@ class CGC_Polypen(ModalOperator):
             l0,l1 = len(bme0.link_faces), len(bme1.link_faces)
             handled = False
             if l0 == 0:
-                self.tar_bmesh.edges.remove(bme0)
+                self.delete_edges([bme0])
                 handled = True
             if l1 == 0:
-                self.tar_bmesh.edges.remove(bme1)
+                self.delete_edges([bme1])
                 handled = True
             if l0 == 1 and l1 == 1:
                 # remove bme1 and recreate attached faces
                 lbmv = list(bme1.link_faces[0].verts)
-                self.tar_bmesh.edges.remove(bme1)
+                self.delete_edges([bme1])
                 self.create_face(lbmv)
                 handled = True
             assert handled, 'unhandled count of linked faces %d, %d' % (l0,l1)
@@ -1052,12 +1085,11 @@ class CGC_Polypen(ModalOperator):
         bme1 = self.hover_edge()
         if bme1 in self.selected_bmedges:
             # hovered edge is a selected edge
-            _,bmv = bmesh.utils.edge_split(bme1, bme1.verts[0], 0.5)
+            _,bmv = self.split_edge(bme1, bme1.verts[0], 0.5)
             lbme = bmv.link_edges
             bmv.co = p3d
             self.set_selection(lbmv=[bmv],lbme=lbme)
             self.clear_nearest()
-            self.tar_bmeshrender.dirty()
             return 'move vert'
         lbmf = [self.face_between_edges(bme0,bme1) for bme0 in self.selected_bmedges]
         lbmf = [bmf for bmf in lbmf if bmf]
@@ -1068,13 +1100,12 @@ class CGC_Polypen(ModalOperator):
             if self.selected_bmverts:
                 # insert new vert in clicked edge, split face by adding edge between selected and new verts
                 bmv0 = self.selected_bmverts[0]
-                _,bmv1 = bmesh.utils.edge_split(bme1, bme1.verts[0], 0.5)
-                bmesh.utils.face_split(bmf, bmv0, bmv1)
+                _,bmv1 = self.split_edge(bme1, bme1.verts[0], 0.5)
+                self.split_face(bmf, bmv0, bmv1)
                 lbme1 = bmv1.link_edges
                 bmv1.co = p3d
                 self.select(bmv1, *lbme1)
                 self.clear_nearest()
-                self.tar_bmeshrender.dirty()
                 return 'move vert'
             # split face by adding edges between verts of two edges
             bme0 = self.selected_bmedges[0]
@@ -1085,18 +1116,17 @@ class CGC_Polypen(ModalOperator):
             if bmv00 != bmv10:
                 bmeA = self.edge_between_verts(bmv00, bmv10)
                 if not bmeA:
-                    bmesh.utils.face_split(bmf, bmv00, bmv10)
+                    self.split_face(bmf, bmv00, bmv10)
                     bmeA = self.edge_between_verts(bmv00, bmv10)
                     bmf = [bmf for bmf in bmeA.link_faces if bmv01 in bmf.verts][0]
             if bmv01 != bmv11:
                 bmeB = self.edge_between_verts(bmv01, bmv11)
                 if not bmeB:
-                    bmesh.utils.face_split(bmf, bmv01, bmv11)
+                    self.split_face(bmf, bmv01, bmv11)
                     bmeB = self.edge_between_verts(bmv01, bmv11)
                     bmf = [bmf for bmf in bmeB.link_faces if bmv00 in bmf.verts][0]
             self.select(bme1)
             self.clear_nearest()
-            self.tar_bmeshrender.dirty()
             return 'move vert'
         lbmv = [self.vert_between_edges(bme0,bme1) for bme0 in self.selected_bmedges]
         lbmv = [bmv for bmv in lbmv if bmv]
@@ -1203,15 +1233,14 @@ class CGC_Polypen(ModalOperator):
             bme = self.nearest_bmedge
             if bmv0 in bme.verts:
                 # vert belongs to edge. insert new vert into edge
-                _,bmv1 = bmesh.utils.edge_split(bme, bmv0, 0.5)
+                _,bmv1 = self.split_edge(bme, bmv0, 0.5)
                 # find newly created edge
                 lbme = [bme for bme in bmv1.link_edges if bmv0 in bme.verts if len(bme.link_faces)==1]
                 self.select(bmv1, *lbme)
                 self.clear_nearest()
                 self.clean_bmesh()
-                self.tar_bmeshrender.dirty()
                 return 'move vert'
-            _,bmv1 = bmesh.utils.edge_split(bme, bme.verts[0], 0.5)
+            _,bmv1 = self.split_edge(bme, bme.verts[0], 0.5)
             bmv1.co = self.mouse_downp3d
         elif self.hover_face():
             # find closest edge to selected vert
@@ -1219,7 +1248,7 @@ class CGC_Polypen(ModalOperator):
             p2d = location_3d_to_region_2d(rgn, r3d, p3d)
             lbme = self.nearest_bmface.edges
             bme,_,_ = self.closest_bmedge(context, p2d, p3d, float('inf'), float('inf'), lbme=lbme)
-            _,bmv1 = bmesh.utils.edge_split(bme, bme.verts[0], 0.5)
+            _,bmv1 = self.split_edge(bme, bme.verts[0], 0.5)
         elif self.hover_vert():
             bmv1 = self.nearest_bmvert
         else:
@@ -1235,17 +1264,15 @@ class CGC_Polypen(ModalOperator):
         lbmf = [bmf for bmf in bmv1.link_faces if bmv0 in bmf.verts]
         if lbmf:
             # verts share a face, so split face!
-            bmesh.utils.face_split(lbmf[0], bmv0, bmv1)
+            self.split_face(lbmf[0], bmv0, bmv1)
             self.select(bmv1)
             self.clear_nearest()
-            self.tar_bmeshrender.dirty()
             return 'move vert'
-        bme = self.tar_bmesh.edges.new([bmv0,bmv1])
+        bme = self.create_edge([bmv0,bmv1])
         if eventd['press'] in self.keymap['polypen alt action']:
             self.select(bmv1)
         else:
             self.select(bmv1,bme)
-        self.tar_bmeshrender.dirty()
         return 'move vert'
     
     def handle_insert_vert_p3d(self, context, eventd):
@@ -1258,11 +1285,10 @@ class CGC_Polypen(ModalOperator):
         else:
             return ''
         bme,_,_ = self.closest_bmedge(context, p2d, p3d, float('inf'), float('inf'), lbme=lbme)
-        bme,bmv = bmesh.utils.edge_split(bme, bme.verts[0], 0.5)
+        bme,bmv = self.split_edge(bme, bme.verts[0], 0.5)
         lbme = bmv.link_edges
         bmv.co = p3d
         self.set_selection(lbmv=[bmv],lbme=lbme)
-        self.tar_bmeshrender.dirty()
         return 'move vert'
     
     def handle_insert_vert_nearest(self, context, eventd):
@@ -1280,29 +1306,27 @@ class CGC_Polypen(ModalOperator):
         else:
             return ''
         bme,_,_ = self.closest_bmedge(context, p2d, p3d, float('inf'), float('inf'), lbme=lbme)
-        bme,bmv = bmesh.utils.edge_split(bme, bme.verts[0], 0.5)
-        bmesh.utils.vert_splice(bmv, self.nearest_bmvert)
+        bme,bmv = self.split_edge(bme, bme.verts[0], 0.5)
+        self.splice_verts(bmv, self.nearest_bmvert)
         self.clean_duplicate_bmedges(self.nearest_bmvert)
         lbme = [bme for bme in self.nearest_bmvert.link_edges if len(bme.link_faces) == 1 and self.selected_bmfaces[0] in bme.link_faces]
         self.set_selection(lbmv=[self.nearest_bmvert],lbme=lbme)
         self.clear_nearest()
         self.clean_bmesh()
-        self.tar_bmeshrender.dirty()
         return 'move vert'
     
     def handle_collapse_edge(self, bme):
         bmv0,bmv1 = bme.verts
         llbmv = [[bmv for bmv in bmf.verts if bmv != bmv0] for bmf in bme.link_faces]
-        self.tar_bmesh.edges.remove(bme)
-        bmesh.utils.vert_splice(bmv0, bmv1)
+        self.delete_edges([bme])
+        self.splice_verts(bmv0, bmv1)
         #self.clean_duplicate_bmedges(bmv1)
         for lbmv in llbmv:
             if len(lbmv) > 2:
-                self.tar_bmesh.faces.new(lbmv)
+                self.new_face(lbmv)
         self.clean_bmesh()
         self.clear_nearest()
         self.set_selection(lbmv=[bmv1])
-        self.tar_bmeshrender.dirty()
         return ''
 
 
@@ -36,6 +36,8 @@ from ..lib.common_utilities import bversion, iter_running_sum, dprint, get_objec
 from ..lib.common_utilities import zip_pairs, closest_t_of_s, invert_matrix
 from ..lib.common_utilities import sort_objects_by_angles, vector_angle_between
 from ..lib.classes.profiler.profiler import Profiler
+from ..lib.classes.viewfrustum.viewfrustum import points_bbox
+from ..lib.classes.undosnapshot.undosnapshot import UndoTracked, undo_touch
 
 from ..lib.common_bezier import cubic_bezier_blend_t, cubic_bezier_derivative, cubic_bezier_fit_points, cubic_bezier_split, cubic_bezier_t_of_s_dynamic
 from ..cache import mesh_cache
@@ -46,7 +48,7 @@ from ..cache import mesh_cache
 ###############################################################################################################
 # GVert
 
-class GVert:
+class GVert(UndoTracked):
     def __init__(self, obj, tar_obj, length_scale, position, radius, normal, tangent_x, tangent_y, from_mesh = False):
         
         # store info
@@ -257,6 +259,7 @@ class GVert:
         mx3x3 = mx.to_3x3()
         imx = invert_matrix(mx)
         bvh = mesh_cache['bvh']  #any reason not to grab this from our cache, which should always be current.
+        Polystrips.generation += 1
         
         if Polystrips.settings.symmetry_plane == 'x':
             self.corner0.x = max(0.0, self.corner0.x)
@@ -292,6 +295,7 @@ class GVert:
             return
         
         pr = Profiler().start()
+        Polystrips.generation += 1
         
         bvh = mesh_cache['bvh']
         mx = self.mx
@@ -582,7 +586,7 @@ class GVert:
 ###############################################################################################################
 # GEdge between GVerts
 
-class GEdge:
+class GEdge(UndoTracked):
     '''
     Graph Edge (GEdge) stores end points and "way points" (cubic bezier)
     '''
@@ -618,6 +622,7 @@ class GEdge:
         self.cache_igverts = []             # cached interval gverts
                                             # even-indexed igverts are poly "centers"
                                             #  odd-indexed igverts are poly "edges"
+        self.bbox = None                    # world space bounding box, for view culling
         
         gvert0.connect_gedge(self)
         gvert1.connect_gedge_inner(self)
@@ -816,10 +821,12 @@ class GEdge:
             print('Cannot attach more than two gpatches')
             return False
         self.gedgeseries.append(gedgeseries)
+        undo_touch(self)
         return True
     
     def detach_gedgeseries(self, gedgeseries):
         self.gedgeseries.remove(gedgeseries)
+        undo_touch(self)
         for ges in self.gedgeseries:
             ges.update()
     
@@ -1206,6 +1213,8 @@ class GEdge:
         note: approx => not snapped to surface
         '''
         
+        Polystrips.generation += 1
+        
         # update inner gverts so they can be selectable
         self.gvert1.radius = self.gvert0.radius*0.7 + self.gvert3.radius*0.3
         self.gvert2.radius = self.gvert0.radius*0.3 + self.gvert3.radius*0.7
@@ -1248,11 +1257,21 @@ class GEdge:
                     igv.snap_tany = igv.tangent_y
                 self.from_build = False
         
+        self.update_bbox()
+        
         for zgedge in self.zip_attached:
             zgedge.update(debug=debug)
 
         for ges in self.gedgeseries:
             ges.update()
+    
+    def update_bbox(self):
+        '''
+        recomputes world space bounding box of gedge, padded by its largest radius
+        '''
+        gverts = [self.gvert0, self.gvert1, self.gvert2, self.gvert3] + self.cache_igverts
+        pad = max(max(gv.radius, getattr(gv, 'snap_radius', 0.0)) for gv in gverts)
+        self.bbox = points_bbox([gv.snap_pos for gv in gverts] + [gv.position for gv in gverts], pad)
         
     def snap_igverts(self):
         '''
@@ -1377,7 +1396,7 @@ class GEdge:
 ###############################################################################################################
 # GEdgeSeries: a collection of GEdges
 
-class GEdgeSeries:
+class GEdgeSeries(UndoTracked):
     def __init__(self, obj, *gedges):
         self.o_name = obj.name
         self.mx = obj.matrix_world
@@ -1540,7 +1559,7 @@ class GEdgeSeries:
 ###############################################################################################################
 # GPatch for handling simple fill
 
-class GPatch:
+class GPatch(UndoTracked):
     def __init__(self, obj, *gedgeseries):
         # TODO: allow multiple gedges per side!!
         
@@ -1554,6 +1573,7 @@ class GPatch:
         self.nsides = len(gedgeseries)
         
         self.count_error = False
+        self.bbox = None        # world space bounding box, for view culling
         
         # attach gedge to gpatch
         for ges in self.gedgeseries: ges.attach_gpatch(self)
@@ -1693,6 +1713,8 @@ class GPatch:
             self._update_quad()
         elif self.nsides == 5:
             self._update_pent()
+        
+        self.bbox = points_bbox(p for p,_,_ in self.pts)
     
     def _snap_pt(self, pt, idx=None):
         thinSurface_maxDist = 0.05
@@ -2088,6 +2110,7 @@ class GPatch:
 class Polystrips(object):
     # class/static variable (shared across all instances)
     settings = None
+    generation = 0      # incremented whenever gvert/gedge geometry changes (see ProjectionCache)
     
     def __init__(self, context, obj, tar_obj):
         Polystrips.settings = common_utilities.get_settings()
@@ -2127,6 +2150,7 @@ class Polystrips(object):
             self.disconnect_gedgeseries(ges)
         gedge.disconnect()
         self.gedges = [ge for ge in self.gedges if ge != gedge]
+        Polystrips.generation += 1
     
     def disconnect_gvert(self, gvert):
         assert gvert in self.gverts
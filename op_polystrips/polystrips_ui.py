@@ -42,10 +42,12 @@ from ..lib.common_drawing_bmesh import BMeshRender
 from ..lib.classes.profiler.profiler import Profiler
 from ..lib.classes.sketchbrush.sketchbrush import SketchBrush
 from ..lib.classes.bmeshcache.bmeshcache import BMeshCache
+from ..lib.classes.visibility.visibility import VisibilityCache
+from ..lib.classes.undosnapshot.undosnapshot import UndoSnapshots, snapshots_size
 from .. import key_maps
 from ..cache import mesh_cache, polystrips_undo_cache, object_validation, is_object_valid, write_mesh_cache, clear_mesh_cache
 
-from .polystrips_datastructure import Polystrips, GVert
+from .polystrips_datastructure import Polystrips, GVert, GEdge, GEdgeSeries, GPatch
 
 
 class Polystrips_UI:
@@ -82,6 +84,8 @@ class Polystrips_UI:
         self.tweak_data = None
 
         self.post_update = True
+        
+        self.undo_snapshots = UndoSnapshots((Polystrips, GVert, GEdge, GEdgeSeries, GPatch))
 
         if context.mode == 'OBJECT':
 
@@ -147,7 +151,10 @@ class Polystrips_UI:
             rv3d = context.space_data.region_3d
             
             #TODO snap_eds_vis?  #careful with the 2 matrices. One is the source object mx, the other is the target object mx
-            self.snap_eds_vis = [False not in common_utilities.ray_cast_visible_bvh([dest_mx * ed.verts[0].co, dest_mx * ed.verts[1].co], mesh_cache['bvh'], self.mx, rv3d) for ed in self.snap_eds]
+            visibility = VisibilityCache(mesh_cache['bvh'], self.mx)
+            visibility.update_view(rv3d)
+            lvis = visibility.visible_many([dest_mx * bmv.co for ed in self.snap_eds for bmv in ed.verts])
+            self.snap_eds_vis = [v0 and v1 for v0,v1 in zip(lvis[0::2], lvis[1::2])]
             self.hover_ed = None
 
             # Hide any existng geometry so as to draw nicely via BmeshRender
@@ -219,9 +226,10 @@ class Polystrips_UI:
     
     def create_undo_snapshot(self, action):
         '''
-        unsure about all the _timers get deep copied
-        and if sel_gedges and verts get copied as references
-        or also duplicated, making them no longer valid.
+        snapshots share the records of gverts, gedges, etc. that did not change
+        since the previous snapshot (see UndoSnapshots), so only elements
+        touched by an action take up new memory.  gverts, gedges, etc. are undo
+        units that mark themselves changed, so unchanged ones are not walked
         '''
 
         repeated_actions = {'count', 'zip count'}
@@ -233,7 +241,7 @@ class Polystrips_UI:
 
         polystrips_undo_cache.append({
             'action': action,
-            'polystrips data': copy.deepcopy(self.polystrips),
+            'polystrips data': self.undo_snapshots.take(self.polystrips),
             'act_gvert': self.polystrips.gverts.index(self.act_gvert) if self.act_gvert else None,
             'act_gedge': self.polystrips.gedges.index(self.act_gedge) if self.act_gedge else None,
             'act_gpatch': self.polystrips.gpatches.index(self.act_gpatch) if self.act_gpatch else None,
@@ -243,12 +251,22 @@ class Polystrips_UI:
 
         if len(polystrips_undo_cache) > self.settings.undo_depth:
             polystrips_undo_cache.pop(0)
+        
+        if self.settings.debug >= 2:
+            dprint('polystrips undo: %d snapshots, %d bytes' % (len(polystrips_undo_cache), self.undo_memory()))
+    
+    def undo_memory(self):
+        '''
+        returns approximate memory (bytes) used by undo snapshots
+        '''
+        return snapshots_size([data['polystrips data'] for data in polystrips_undo_cache])
 
     def undo_action(self):
         if len(polystrips_undo_cache) == 0:
             return
         data = polystrips_undo_cache.pop()
-        self.polystrips = data['polystrips data']
+        self.polystrips = self.undo_snapshots.restore(data['polystrips data'])
+        Polystrips.generation += 1
         self.act_gvert = self.polystrips.gverts[data['act_gvert']] if data['act_gvert'] is not None else None
         self.act_gedge = self.polystrips.gedges[data['act_gedge']] if data['act_gedge'] is not None else None
         self.act_gpatch = self.polystrips.gpatches[data['act_gpatch']] if data['act_gpatch'] is not None else None
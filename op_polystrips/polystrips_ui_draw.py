@@ -45,18 +45,25 @@ from ..lib.common_utilities import iter_running_sum, dprint, get_object_length_s
 from ..lib.common_bezier import cubic_bezier_blend_t, cubic_bezier_derivative
 from ..lib.common_drawing_view import draw3d_arrow
 from ..lib.classes.profiler import profiler
+from ..lib.classes.viewfrustum.viewfrustum import view_frustum
 
 from ..cache import mesh_cache
+from .polystrips_datastructure import Polystrips
 
 def vector_mirror_0(v): return v
 def vector_mirror_x(v): return Vector((-v.x,v.y,v.z))
 
+# gedges spanning fewer pixels than this are drawn simplified in level-of-detail mode
+lod_gedge_pixels = 24.0
+
 class Polystrips_UI_Draw():
     def initialize_draw(self):
-        pass
+        self.draw_time = 0.0        # smoothed time (seconds) spent in draw_3d
+        self.draw_lod = False       # True when drawing with reduced level of detail
     
     def draw_postview(self, context):
         ''' Place post view drawing code in here '''
+        tstart = time.time()
         try:
             bmeshShader.enable()
             self.draw_3d(context)
@@ -64,6 +71,49 @@ class Polystrips_UI_Draw():
             pass
         finally:
             bmeshShader.disable()
+        self.update_draw_lod(time.time() - tstart)
+    
+    def update_draw_lod(self, dt):
+        '''
+        switches level-of-detail mode based on smoothed draw time and draw budget (preferences).
+        LOD mode is left only once the reduced drawing is well within budget, so it does not
+        flip every frame
+        '''
+        budget = self.settings.draw_budget / 1000.0
+        self.draw_time = dt if not self.draw_time else (self.draw_time * 0.8 + dt * 0.2)
+        if budget <= 0.0:
+            lod = False
+        elif self.draw_lod:
+            lod = self.draw_time > budget * 0.25
+        else:
+            lod = self.draw_time > budget
+        if lod != self.draw_lod:
+            dprint('Polystrips LOD %s (draw time %0.1fms)' % ('on' if lod else 'off', self.draw_time * 1000.0))
+            self.draw_lod = lod
+            self.draw_time = 0.0
+    
+    def simplified_gedges(self, context, gedges):
+        '''
+        returns set of gedges that span fewer than lod_gedge_pixels on screen (or are behind the
+        view) and so can be drawn as a simple polyline.  active and selected gedges are not included
+        '''
+        if not gedges: return set()
+        # gedges (culled against the view) only change with the view or with Polystrips.generation,
+        # so the projection is reused until one of them changes
+        pts = (gv.snap_pos for ge in gedges for gv in (ge.gvert0, ge.gvert1, ge.gvert2, ge.gvert3))
+        version = (Polystrips.generation, len(gedges), self.settings.symmetry_plane)
+        pts2d = common_drawing_px.project_3dpoints(context, pts, key='polystrips lod', version=version)
+        simple = set()
+        for i,ge in enumerate(gedges):
+            if ge == self.act_gedge or ge in self.sel_gedges: continue
+            lp = pts2d[i*4:i*4+4]
+            if any(p is None for p in lp):
+                simple.add(ge)
+                continue
+            xs,ys = [p.x for p in lp],[p.y for p in lp]
+            if max(max(xs)-min(xs), max(ys)-min(ys)) < lod_gedge_pixels:
+                simple.add(ge)
+        return simple
     
     def draw_postpixel(self, context):
         ''' Place post pixel drawing code in here '''
@@ -79,7 +129,8 @@ class Polystrips_UI_Draw():
         rs = (gedge.gvert0.radius+gedge.gvert3.radius) * 0.35
         rl = rs * 0.75
         p3d = [pm-px*rs,pm+px*rs,pm+px*(rs-rl)+py*rl,pm+px*rs,pm+px*(rs-rl)-py*rl]
-        common_drawing_px.draw_polyline_from_3dpoints(context, p3d, color, 5, "GL_LINE_SMOOTH")
+        key,version = ('polystrips direction', id(gedge)),Polystrips.generation
+        common_drawing_px.draw_polyline_from_3dpoints(context, p3d, color, 5, "GL_LINE_SMOOTH", key=key, version=version)
 
 
     def draw_gedge_text(self, gedge,context, text):
@@ -147,6 +198,17 @@ class Polystrips_UI_Draw():
         color_warning = settings.theme_colors_warning[settings.theme]
 
         bgl.glEnable(bgl.GL_POINT_SMOOTH)
+        
+        # cull elements that are entirely off-screen (including their mirror, if any)
+        mirror = settings.symmetry_plane == 'x'
+        view_frustum.update_view(r3d)
+        def in_view(elem): return view_frustum.bbox_visible(elem.bbox)
+        def in_view_mirror(elem): return mirror and view_frustum.bbox_visible(elem.bbox, mirror_x=True)
+        gpatches = [gp for gp in self.polystrips.gpatches if in_view(gp) or in_view_mirror(gp)]
+        gedges = [ge for ge in self.polystrips.gedges if in_view(ge) or in_view_mirror(ge)]
+        
+        lod = self.draw_lod
+        lod_gedges = self.simplified_gedges(context, gedges) if lod else set()
 
         color_handle = (color_inactive[0], color_inactive[1], color_inactive[2], 1.00)
         color_border = (color_inactive[0], color_inactive[1], color_inactive[2], 1.00)
@@ -300,7 +362,7 @@ class Polystrips_UI_Draw():
         self.tar_bmeshrender.draw(opts=opts)
 
         ### Patches ###
-        for gpatch in self.polystrips.gpatches:
+        for gpatch in gpatches:
             if gpatch == self.act_gpatch:
                 color_border = (color_active[0], color_active[1], color_active[2], 0.50)
                 color_fill = (color_active[0], color_active[1], color_active[2], 0.20)
@@ -320,17 +382,19 @@ class Polystrips_UI_Draw():
                 color_border = (color_warning[0], color_warning[1], color_warning[2], 0.50)
                 color_fill   = (color_warning[0], color_warning[1], color_warning[2], 0.10)
             
-            draw3d_quads(context, gpatch.iter_segments(view_loc), color_fill, vector_mirror_0)
-            draw3d_closed_polylines(context, gpatch.iter_segments(view_loc), color_border, 1, "GL_LINE_STIPPLE", vector_mirror_0)
-            draw3d_points(context, gpatch.iter_pts(view_loc), color_border, 3, vector_mirror_0)
-            if settings.symmetry_plane == 'x':
+            if in_view(gpatch):
+                draw3d_quads(context, gpatch.iter_segments(view_loc), color_fill, vector_mirror_0)
+                draw3d_closed_polylines(context, gpatch.iter_segments(view_loc), color_border, 1, "GL_LINE_STIPPLE", vector_mirror_0)
+                if not lod:
+                    draw3d_points(context, gpatch.iter_pts(view_loc), color_border, 3, vector_mirror_0)
+            if in_view_mirror(gpatch):
                 draw3d_quads(context, gpatch.iter_segments(view_loc_x), color_mirror, vector_mirror_x)
                 draw3d_closed_polylines(context, gpatch.iter_segments(view_loc_x), color_mirror, 1, "GL_LINE_STIPPLE", vector_mirror_x)
                 #draw3d_points(context, gpatch.iter_pts(view_loc_x), color_border, 3, vector_mirror_x)
             
 
         ### Edges ###
-        for gedge in self.polystrips.gedges:
+        for gedge in gedges:
             # Color active strip
             if gedge == self.act_gedge:
                 color_border = (color_active[0], color_active[1], color_active[2], 1.00)
@@ -351,9 +415,19 @@ class Polystrips_UI_Draw():
                 color_border = (color_frozen[0], color_frozen[1], color_frozen[2], 1.00)
                 color_fill   = (color_frozen[0], color_frozen[1], color_frozen[2], 0.20)
             
-            draw3d_quads(context, gedge.iter_segments(view_loc), color_fill, vector_mirror_0)
-            draw3d_closed_polylines(context, gedge.iter_segments(view_loc), color_border, 1, "GL_LINE_STIPPLE", vector_mirror_0)
-            if settings.symmetry_plane == 'x':
+            if gedge in lod_gedges:
+                # small or distant: draw as polyline through every other igvert
+                p3d = [gedge.gvert0.snap_pos] + [gv.snap_pos for gv in gedge.cache_igverts[1::2]] + [gedge.gvert3.snap_pos]
+                if in_view(gedge):
+                    draw3d_polyline(context, p3d, color_border, 1, "", vector_mirror_0)
+                if in_view_mirror(gedge):
+                    draw3d_polyline(context, p3d, color_mirror, 1, "", vector_mirror_x)
+                continue
+            
+            if in_view(gedge):
+                draw3d_quads(context, gedge.iter_segments(view_loc), color_fill, vector_mirror_0)
+                draw3d_closed_polylines(context, gedge.iter_segments(view_loc), color_border, 1, "GL_LINE_STIPPLE", vector_mirror_0)
+            if in_view_mirror(gedge):
                 draw3d_quads(context, gedge.iter_segments(view_loc_x), color_mirror, vector_mirror_x)
                 draw3d_closed_polylines(context, gedge.iter_segments(view_loc_x), color_mirror, 1, "GL_LINE_STIPPLE", vector_mirror_x)
 
@@ -553,12 +627,14 @@ class Polystrips_UI_Draw():
             color = (color_selection[0], color_selection[1], color_selection[2], 1.00)
             common_drawing_px.draw_bmedge(context, self.hover_ed, self.dest_obj.matrix_world, 2, color)
 
-        if self.act_gedge:
+        view_frustum.update_view(r3d)
+        
+        if self.act_gedge and not self.draw_lod and view_frustum.bbox_visible(self.act_gedge.bbox):
             if settings.show_segment_count:
                 bgl.glColor4f(*color_active)
                 self.draw_gedge_info(self.act_gedge, context)
         
-        if self.act_gpatch:
+        if self.act_gpatch and not self.draw_lod and view_frustum.bbox_visible(self.act_gpatch.bbox):
             if settings.show_segment_count:
                 bgl.glColor4f(*color_active)
                 self.draw_gpatch_info(self.act_gpatch, context)
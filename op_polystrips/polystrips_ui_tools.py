@@ -31,6 +31,7 @@ from ..lib import common_utilities
 from ..lib.common_utilities import bversion, get_object_length_scale, dprint, frange, selection_mouse, showErrorMessage
 from ..lib.common_utilities import invert_matrix, matrix_normal
 from ..lib.classes.profiler import profiler
+from ..lib.classes.undosnapshot.undosnapshot import undo_touch
 from ..cache import mesh_cache
 
 class Polystrips_UI_Tools():
@@ -308,8 +309,9 @@ class Polystrips_UI_Tools():
                 p,v,k = gp.pts[i_pt]
                 nc = update(c,d)
                 gp.pts[i_pt] = (nc,v,k)
+                undo_touch(gp)
             
-            self.tar_bmeshrender.dirty()
+            self.tar_bmeshrender.dirty_verts(vertices[i_v] for i_v,_,_ in self.tweak_data['lmverts'])
             
             if eventd['release'] == 'LEFTMOUSE':
                 for u in self.tweak_data['supdate']:
@@ -392,8 +394,9 @@ class Polystrips_UI_Tools():
                 nc = update(c,d)
                 gp.pts = [(_0,_1,_p) if _0!=i0 or _1!=i1 else (_0,_1,nc) for _0,_1,_p in gp.pts]
                 gp.map_pts[(i0,i1)] = nc
+                undo_touch(gp)
             
-            self.tar_bmeshrender.dirty()
+            self.tar_bmeshrender.dirty_verts(vertices[i_v] for i_v,_,_ in self.tweak_data['lmverts'])
             
             if eventd['release'] == 'LEFTMOUSE':
                 for u in self.tweak_data['supdate']:
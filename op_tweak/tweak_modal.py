@@ -198,6 +198,11 @@ class CGC_Tweak(ModalOperator, Tweak_UI, Tweak_UI_Tools):
         #####################################
         # General
 
+        if not self.src_bmc.is_ready():
+            # source BVH still building in background
+            self.update_src_build(eventd['context'])
+            return ''
+
         if eventd['type'] == 'MOUSEMOVE':  #mouse movement/hovering
             #update brush and brush size
             x,y = eventd['mouse']
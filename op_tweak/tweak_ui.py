@@ -63,23 +63,11 @@ class Tweak_UI:
         self.post_update = True
 
         self.obj_orig = get_source_object()
-        self.src_bmc = BMeshCache(self.obj_orig)
-        
-        is_valid = is_object_valid(self.obj_orig)
-        
-        if is_valid:
-                pass
-                #self.bme = mesh_cache['bme']            
-                #self.bvh = mesh_cache['bvh']
-                
-        else:
-            clear_mesh_cache()           
-            me = self.obj_orig.to_mesh(scene=context.scene, apply_modifiers=True, settings='PREVIEW')
-            me.update()
-            bme = bmesh.new()
-            bme.from_mesh(me)
-            bvh = BVHTree.FromBMesh(bme)
-            write_mesh_cache(self.obj_orig, bme, bvh)
+        # source BVH is built in background if not cached; see update_src_build
+        self.src_bmc = BMeshCache(self.obj_orig, background=True)
+        self.build_timer = None
+        if not self.src_bmc.is_ready():
+            self.build_timer = context.window_manager.event_timer_add(0.1, context.window)
         
         self.dest_obj = context.object
         self.dest_bme = bmesh.from_edit_mesh(context.object.data)
@@ -95,16 +83,31 @@ class Tweak_UI:
                                         self.settings,
                                         0, 0, #event.mouse_region_x, event.mouse_region_y,
                                         15,  # settings.quad_prev_radius,
-                                        mesh_cache['bvh'], self.mx,
+                                        self.src_bmc.bvh, self.mx,
                                         self.obj_orig.dimensions.length)
 
         tweak_undo_cache.clear()        # Clear the cache in case any is left over
         
-        
+        self.update_src_build(context)
+    
+    def update_src_build(self, context):
+        '''
+        swaps in source BVH when background build is done, otherwise reports progress in header
+        '''
+        if not self.src_bmc.update_build():
+            context.area.header_text_set('Tweak - building source BVH: %d%%' % int(100 * self.src_bmc.build_progress))
+            return False
+        if self.build_timer:
+            context.window_manager.event_timer_remove(self.build_timer)
+            self.build_timer = None
+        self.sketch_brush.bvh = self.src_bmc.bvh
         context.area.header_text_set('Tweak')
+        return True
     
     def end_ui(self, context):
-        pass
+        if self.build_timer:
+            context.window_manager.event_timer_remove(self.build_timer)
+            self.build_timer = None
         
     def cleanup(self, context):
         '''
@@ -69,21 +69,21 @@ class Tweak_UI_Tools():
             
             imx = self.imx
             
-            def update(p3d, d):
-                if d >= 1.0: return p3d
-                p2d = location_3d_to_region_2d(rgn, r3d, p3d)
-                p2d += dv * (1.0-d)
-                hit_p3d,_ = self.src_bmc.raycast_screen(p2d, rgn, r3d)
-                return hit_p3d or p3d
+            # project all moving verts in one batch
+            lmoving = [(i_v,c,d) for i_v,c,d in self.tweak_data['lmverts'] if d < 1.0]
+            lp2d = [location_3d_to_region_2d(rgn, r3d, c) for _,c,_ in lmoving]
+            lp2d = [p2d + dv * (1.0-d) if p2d is not None else None for p2d,(_,_,d) in zip(lp2d, lmoving)]
+            lhits,_,_ = self.src_bmc.raycast_screen_many([p2d for p2d in lp2d if p2d is not None], rgn, r3d)
+            lhits = iter(lhits)
             
             vertices = self.dest_bme.verts
-            for i_v,c,d in self.tweak_data['lmverts']:
-                nc = update(c,d)
-                vertices[i_v].co = imx * nc
+            for (i_v,c,d),p2d in zip(lmoving, lp2d):
+                hit_p3d = next(lhits) if p2d is not None else None
+                vertices[i_v].co = imx * (hit_p3d or c)
                 
             
             bmesh.update_edit_mesh(self.dest_obj.data, tessface=True, destructive=False)
-            self.tar_bmeshrender.dirty()
+            self.tar_bmeshrender.dirty_verts(vertices[i_v] for i_v,_,_ in lmoving)
              
         return ''
     
@@ -149,7 +149,7 @@ class Tweak_UI_Tools():
             bmverts[i].co = imx * self.src_bmc.find_nearest(mx * co)[0]
 
         bmesh.update_edit_mesh(self.dest_obj.data, tessface=True, destructive=False)
-        self.tar_bmeshrender.dirty()
+        self.tar_bmeshrender.dirty_verts(bmverts[i] for i in divco)
         
 
     
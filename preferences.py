@@ -81,6 +81,13 @@ class RetopoFlowPreferences(AddonPreferences):
         description='Show segment count on selection',
         default=True
         )
+    draw_budget = IntProperty(
+        name='Draw Budget (ms)',
+        description='When drawing the Polystrips overlay takes longer than this, small and distant strips are drawn simplified and patch points and labels are skipped. 0 always draws full detail',
+        min=0,
+        max=1000,
+        default=33,
+        )
 
     # Tool settings
     retopoflow_panel_settings = BoolProperty(
@@ -96,6 +103,45 @@ class RetopoFlowPreferences(AddonPreferences):
         default=15,
         )
 
+    validation_mode = EnumProperty(
+        items=[
+            ('FAST', 'Fast', 'Validate cached source mesh with counts, modifiers, update tags, and a sampled vertex checksum'),
+            ('STRICT', 'Strict', 'Validate cached source mesh against every vertex (slow on dense meshes)'),
+            ],
+        name='Cache Validation',
+        description='How the cached source mesh and BVH are checked for changes',
+        default='FAST'
+        )
+
+    mesh_cache_size = IntProperty(
+        name='Mesh Cache Size (MB)',
+        description='Approximate memory limit for cached source meshes and BVH trees. Least recently used sources are freed first',
+        default=2048,
+        min=64,
+        )
+
+    disk_cache = BoolProperty(
+        name='Disk Cache',
+        description='Store evaluated source mesh buffers on disk so BVH trees can be rebuilt quickly in later sessions',
+        default=False,
+        )
+
+    disk_cache_location = EnumProperty(
+        items=[
+            ('USER', 'User', 'Store disk cache in user data directory'),
+            ('BLEND', 'Blend File', 'Store disk cache next to the saved .blend file'),
+            ],
+        name='Disk Cache Location',
+        default='USER'
+        )
+
+    disk_cache_size = IntProperty(
+        name='Disk Cache Size (MB)',
+        description='Maximum size of disk cache. Least recently used files are removed first',
+        default=4096,
+        min=16,
+        )
+
     show_edges = BoolProperty(
             name="Show Span Edges",
             description = "Display the extracted mesh edges. Usually only turned off for debugging",
@@ -326,6 +372,14 @@ class RetopoFlowPreferences(AddonPreferences):
             max=100,
             )
 
+    redraw_fps = IntProperty(
+        name="Max Redraw Rate",
+        description="Max number of times per second the 3D view is redrawn while a tool is running. 0 redraws on every event",
+        min = 0,
+        max = 240,
+        default=60,
+        )
+
     undo_depth = IntProperty(
         name="Undo Depth",
         description="Max number of undo steps",
@@ -334,6 +388,13 @@ class RetopoFlowPreferences(AddonPreferences):
         default=15,
         )
     
+    undo_memory = IntProperty(
+        name="Undo Memory Limit (MB)",
+        description="Approximate memory limit of undo steps; oldest steps are dropped first and consecutive vertex moves are merged into one step. 0 means no limit",
+        min = 0,
+        default=0,
+        )
+    
     smooth_method = EnumProperty(
         items=[
             ('ENDPOINT', 'ENDPOINT', 'Blend Between Endpoints'),
@@ -478,6 +539,7 @@ class RetopoFlowPreferences(AddonPreferences):
 
         row = layout.row(align=True)
         row.prop(self, "show_segment_count")
+        row.prop(self, "draw_budget")
 
         ##Contours
         row = layout.row(align=True)
@@ -504,6 +566,13 @@ class RetopoFlowPreferences(AddonPreferences):
             row = box.row()
             row.prop(self, "new_method")
             row.prop(self, "debug")
+            row.prop(self, "validation_mode")
+            row.prop(self, "mesh_cache_size")
+
+            row = box.row()
+            row.prop(self, "disk_cache")
+            row.prop(self, "disk_cache_location", text="")
+            row.prop(self, "disk_cache_size")
             
             
             row = box.row()
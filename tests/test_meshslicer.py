@@ -0,0 +1,113 @@
+'''
+Copyright (C) 2017 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning and Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Tests of MeshSlicer walking.  The meshes are given as index lists (the arrays MeshSlicer
+builds from a BMesh), so faces can have any number of crossing edges.
+
+Run from Blender:
+    blender --background --factory-startup --python tests/test_meshslicer.py
+'''
+
+import os
+import sys
+import importlib
+import unittest
+
+from mathutils import Vector
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(root))
+MeshSlicer = importlib.import_module(os.path.basename(root) + '.lib.classes.meshslicer.meshslicer').MeshSlicer
+
+
+def make_slicer(vert_cos, edge_verts, face_edges):
+    slicer = MeshSlicer.__new__(MeshSlicer)
+    slicer.vert_cos = vert_cos
+    slicer.edge_verts = edge_verts
+    slicer.face_edges = face_edges
+    slicer.edge_faces = [tuple(fi for fi,lei in enumerate(face_edges) if ei in lei) for ei in range(len(edge_verts))]
+    slicer.counts = (len(vert_cos), len(edge_verts), len(face_edges))
+    return slicer
+
+def check_chain(test, slicer, chain):
+    edges,faces,cyclic = chain
+    n = len(edges)
+    test.assertEqual(len(faces), n if cyclic else n - 1)
+    for i,fi in enumerate(faces):
+        test.assertIn(edges[i], slicer.face_edges[fi])
+        test.assertIn(edges[(i+1) % n], slicer.face_edges[fi])
+
+
+class TestWalk(unittest.TestCase):
+    def test_p_shaped_loop(self):
+        '''
+        plane z=0 crosses edges 0-6 (each has one vert above and one below).  walking from
+        seed face S goes S -e0- A -e1- J -e2- L1 -e3- L2 -e4- J, so loop closes in J (which has
+        four crossing edges) and the tail S,e0,A,e1 must be clipped off
+        '''
+        vert_cos = []
+        def crossing_edge(x, y):
+            vert_cos.extend([(x, y, 1.0), (x, y, -1.0)])
+            return (len(vert_cos) - 2, len(vert_cos) - 1)
+        edge_verts = [
+            crossing_edge(0, 0),        # e0: S|A
+            crossing_edge(0, 1),        # e1: A|J
+            crossing_edge(-1, 4),       # e2: J|L1 (farthest from e1 in J)
+            crossing_edge(1, 5),        # e3: L1|L2
+            crossing_edge(1, 3),        # e4: L2|J
+            crossing_edge(0, 2),        # e5: J|boundary
+            crossing_edge(0, -1),       # e6: S|boundary
+            ]
+        S,A,J,L1,L2 = range(5)
+        face_edges = [(0, 6), (0, 1), (1, 2, 4, 5), (2, 3), (3, 4)]
+        slicer = make_slicer(vert_cos, edge_verts, face_edges)
+
+        verts,cyclic,chain = slicer.walk(Vector((0,0,0)), Vector((0,0,1)), S)
+        edges,faces,_ = chain
+        self.assertTrue(cyclic)
+        self.assertEqual(edges, [2, 3, 4])
+        self.assertEqual(faces, [L1, L2, J])
+        self.assertEqual(len(verts), 3)
+        check_chain(self, slicer, chain)
+
+    def test_seed_face_in_front_of_plane(self):
+        '''
+        band of four quads around z axis, all verts in front of plane z=0.  with the default
+        epsilon of 0, the plane must still be shifted to cross the seed face
+        '''
+        vert_cos = [(x, y, z) for z in (0.5, 1.0) for x,y in ((1,0), (0,1), (-1,0), (0,-1))]
+        edge_verts = [(i, i + 4) for i in range(4)]                     # vertical edges
+        edge_verts += [(i, (i + 1) % 4) for i in range(4)]              # bottom ring
+        edge_verts += [(i + 4, (i + 1) % 4 + 4) for i in range(4)]      # top ring
+        face_edges = [(i, (i + 1) % 4, i + 4, i + 8) for i in range(4)]
+        slicer = make_slicer(vert_cos, edge_verts, face_edges)
+
+        verts,cyclic,chain = slicer.walk(Vector((0,0,0)), Vector((0,0,1)), 0)
+        self.assertIsNotNone(chain)
+        self.assertTrue(cyclic)
+        self.assertEqual(sorted(chain[0]), [0, 1, 2, 3])
+        self.assertIn(0, chain[1])
+        check_chain(self, slicer, chain)
+
+
+if __name__ == '__main__':
+    unittest.main(argv=[sys.argv[0]], exit=False)
@@ -0,0 +1,134 @@
+'''
+Copyright (C) 2017 CG Cookie
+http://cgcookie.com
+hello@cgcookie.com
+
+Created by Jonathan Denning and Jonathan Williamson
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Times space_evenly_on_path (pure Python) against a NumPy version of the same resampling
+on closed loops of mathutils.Vector, and reports the smallest loop size from which NumPy
+is faster for every segment count.
+
+Measured with standalone mathutils 3.3 and NumPy 2.4, NumPy did not win at any loop size
+(16 to 10000 verts, 8 to 256 segments).  At 10000 verts it was about 2x slower, because
+converting the Vectors to an array costs more than the whole pure-Python resample.  So
+space_evenly_on_path has no NumPy path.
+
+Run from Blender (Blender's Python must have NumPy):
+    blender --background --python tools/benchmark_space_evenly.py
+'''
+
+import os
+import sys
+import math
+import time
+import itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lib'))
+
+from mathutils import Vector
+from common_utilities import space_evenly_on_path, numpy
+
+
+lnverts = [16, 32, 64, 96, 128, 192, 256, 384, 512, 1024, 2048, 10000]
+lsegments = [8, 16, 32, 64, 128, 256]
+
+
+def make_loop(nverts):
+    '''
+    returns closed, wobbly loop of nverts Vectors (so edge lengths vary) and its edges
+    '''
+    def co(t):
+        r = 1.0 + 0.2 * math.sin(7 * t)
+        return Vector((r * math.cos(t), r * math.sin(t), 0.1 * math.sin(3 * t)))
+    verts = [co(2 * math.pi * i / nverts) for i in range(nverts)]
+    edges = [(i, (i + 1) % nverts) for i in range(nverts)]
+    return (verts, edges)
+
+def space_evenly_numpy(verts, edges, segments, shift=0):
+    '''
+    NumPy version of space_evenly_on_path (new verts only), for comparison
+    '''
+    nverts = len(verts)
+    cyclic = 0 in edges[-1]
+    if cyclic: fractions = numpy.arange(segments, dtype=numpy.float64) + shift
+    else:      fractions = numpy.arange(1, segments, dtype=numpy.float64)
+    fractions /= segments
+    cos = numpy.fromiter(itertools.chain.from_iterable(verts), numpy.float64, count=3*nverts).reshape((-1,3))
+    if cyclic: segs = numpy.roll(cos, -1, axis=0) - cos
+    else:      segs = cos[1:] - cos[:-1]
+    cumulative_lengths = numpy.zeros(len(segs) + 1)
+    numpy.cumsum(numpy.sqrt((segs * segs).sum(axis=1)), out=cumulative_lengths[1:])
+    arch_len = cumulative_lengths[-1]
+    desired = fractions * arch_len
+    desired[desired > arch_len] -= arch_len
+    desired[desired < 0] += arch_len
+    j = numpy.minimum(numpy.searchsorted(cumulative_lengths, desired, side='right'), nverts)
+    d = cos[j % nverts] - cos[j - 1]
+    l = numpy.sqrt((d * d).sum(axis=1))
+    l[l == 0] = numpy.inf
+    pts = cos[j - 1] + d * ((desired - cumulative_lengths[j - 1]) / l)[:,None]
+    return [Vector(pt) for pt in pts.tolist()]
+
+def time_call(fn, verts, edges, segments, min_time=0.05):
+    '''
+    returns best time (seconds) of one call of fn
+    '''
+    repeat,best = 1,float('inf')
+    while True:
+        start = time.perf_counter()
+        for _ in range(repeat): fn(verts, edges, segments)
+        if time.perf_counter() - start >= min_time: break
+        repeat *= 2
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat): fn(verts, edges, segments)
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best
+
+def benchmark():
+    if not numpy:
+        print('NumPy is not available')
+        return None
+
+    numpy_faster = {}
+    print('%8s %8s %12s %12s' % ('verts', 'segments', 'python ms', 'numpy ms'))
+    for nverts in lnverts:
+        verts,edges = make_loop(nverts)
+        numpy_faster[nverts] = True
+        for segments in lsegments:
+            if segments >= nverts: continue
+            vp,vn = space_evenly_on_path(verts, edges, segments)[0],space_evenly_numpy(verts, edges, segments)
+            assert all((a - b).length < 1e-6 for a,b in zip(vp, vn)), 'results differ'
+            tp = time_call(space_evenly_on_path, verts, edges, segments)
+            tn = time_call(space_evenly_numpy, verts, edges, segments)
+            numpy_faster[nverts] &= tn < tp
+            print('%8d %8d %12.4f %12.4f' % (nverts, segments, tp * 1000, tn * 1000))
+
+    # smallest loop size from which NumPy wins at every size and segment count
+    crossover = None
+    for nverts in reversed(lnverts):
+        if not numpy_faster[nverts]: break
+        crossover = nverts
+    if crossover is None: print('NumPy is not faster at any tested size')
+    else: print('NumPy is faster from %d verts' % crossover)
+    return crossover
+
+
+if __name__ == '__main__':
+    benchmark()